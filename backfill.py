@@ -0,0 +1,26 @@
+import argparse
+from datetime import datetime, timedelta
+
+from core.mt5_connector import connect_to_mt5, backfill, backfill_ticks
+from core.symbols import RESEARCH_SYMBOLS
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download years of history into the local bar store")
+    parser.add_argument('--symbols', nargs='+', default=RESEARCH_SYMBOLS)
+    parser.add_argument('--timeframes', nargs='+', default=['D1', 'H4', 'H1'],
+                        help="add M1 for intrabar exits (main.py/optimize.py --intrabar M1)")
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--tick-days', type=float, default=0, help="also store this many days of ticks (main.py/optimize.py --intrabar ticks)")
+    args = parser.parse_args()
+
+    if not connect_to_mt5():
+        raise Exception("❌ Could not connect to MetaTrader 5. Please ensure it's open and logged in.")
+
+    date_from = datetime.now() - timedelta(days=365 * args.years)
+    for symbol in args.symbols:
+        for timeframe in args.timeframes:
+            stored = backfill(symbol, timeframe, date_from)
+            print(f"💾 {symbol} {timeframe}: {stored} bars stored")
+        if args.tick_days:
+            stored = backfill_ticks(symbol, datetime.now() - timedelta(days=args.tick_days))
+            print(f"💾 {symbol} ticks: {stored} ticks stored")
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.backtest_engine import backtest_signals
+from core.memory_tracker import MemoryTracker
+from core.portfolio_risk import PortfolioRisk
+from core.signal_engine import SignalEngine, atr_feature, generate_signals
+from core.synthetic import synthetic_bars, synthetic_mtf
+from indicators.candlestick import scan_patterns
+from indicators.structure import detect_double_bottom, detect_double_top, detect_triple_bottom, detect_triple_top
+from indicators.zones import cluster_levels, get_support_resistance
+
+BENCH_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+BENCH_SEED = 42
+BENCH_OUTPUT_DIR = "reports/benchmarks"
+REGRESSION_THRESHOLD = 1.25  # flag cases that got this much slower
+
+
+# === Cases ===
+# Each case prepares its inputs for n bars (untimed) and returns the timed call.
+def case_support_resistance(n):
+    bars = synthetic_bars(n, 'H4', BENCH_SEED)
+    return lambda: cluster_levels(get_support_resistance(bars))
+
+
+def case_structure(n):
+    bars = synthetic_bars(n, 'H1', BENCH_SEED)
+    detectors = (detect_double_bottom, detect_double_top, detect_triple_bottom, detect_triple_top)
+    return lambda: [detect(bars) for detect in detectors]
+
+
+def case_candlesticks(n):
+    bars = synthetic_bars(n, 'H1', BENCH_SEED)
+    return lambda: scan_patterns(bars)
+
+
+def case_generate_signals(n):
+    d1, h4, h1 = synthetic_mtf(n, BENCH_SEED)
+    return lambda: generate_signals(d1, h4, h1, point_in_time=True)
+
+
+def case_backtest(n):
+    d1, h4, h1 = synthetic_mtf(n, BENCH_SEED)
+    signals = generate_signals(d1, h4, h1, point_in_time=True)
+    atr_series = atr_feature(h1)
+    return lambda: backtest_signals(signals, h1, 'XAUUSDm', atr_series)
+
+
+def case_signal_engine(n):
+    # Live-style replay: one update per new H1 bar over a 1000-bar window
+    d1, h4, h1 = synthetic_mtf(n, BENCH_SEED)
+    h4_closed = np.searchsorted((h4['time'] + pd.Timedelta(hours=4)).to_numpy(), h1['time'].to_numpy(), side='right')
+
+    def run():
+        engine = SignalEngine()
+        for end in range(1, n + 1):
+            h4_end = h4_closed[end - 1]
+            engine.update(h1.iloc[max(end - 1000, 0):end], h4.iloc[max(h4_end - 500, 0):h4_end])
+    return run
+
+
+def case_memory_tracker(n):
+    # n signals across 50 symbols, flushed once per 100 (one scan cycle)
+    times = pd.date_range('2024-01-01', periods=n, freq='15min')
+    symbols = [f"SYM{i % 50}" for i in range(n)]
+
+    def run():
+        root = tempfile.mkdtemp()
+        try:
+            tracker = MemoryTracker(os.path.join(root, 'memory.jsonl'), now=lambda: times[-1])
+            for i, (symbol, signal_time) in enumerate(zip(symbols, times)):
+                direction = 'long' if i % 2 else 'short'
+                if not tracker.already_traded(symbol, signal_time, direction):
+                    tracker.mark_traded(symbol, signal_time, direction)
+                if i % 100 == 99:
+                    tracker.flush()
+            tracker.flush()
+        finally:
+            shutil.rmtree(root)
+    return run
+
+
+def case_portfolio_risk(n):
+    # n bar closes across 50 symbols, each followed by a batch of 5 signals sized together
+    rng = np.random.default_rng(BENCH_SEED)
+    symbols = [f"SYM{i}" for i in range(50)]
+    closes = 100 * np.exp(np.cumsum(0.001 * rng.standard_normal((n, len(symbols))), axis=0))
+    picks = rng.integers(0, len(symbols), size=(n, 5))
+
+    def run():
+        risk = PortfolioRisk(symbols)
+        for row, pick in zip(closes, picks):
+            risk.update(row)
+            entry = row[pick]
+            risk.size([symbols[i] for i in pick], ['long'] * 5, entry, entry * 0.99)
+    return run
+
+
+# name -> (setup, largest size worth running)
+CASES = {
+    'support_resistance': (case_support_resistance, None),
+    'structure_detectors': (case_structure, None),
+    'candlestick_scan': (case_candlesticks, None),
+    'generate_signals': (case_generate_signals, None),
+    'backtest_signals': (case_backtest, None),
+    'memory_tracker': (case_memory_tracker, None),
+    'signal_engine_stream': (case_signal_engine, 10_000),
+    'portfolio_risk': (case_portfolio_risk, 10_000),
+}
+
+
+# === Runner ===
+def measure(run, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    # Separate pass: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+
+def run_benchmarks(cases, sizes, repeats):
+    results = []
+    for name in cases:
+        setup, max_size = CASES[name]
+        for n in sizes:
+            if max_size is not None and n > max_size:
+                continue
+            run = setup(n)
+            timings, peak = measure(run, repeats if n < 100_000 else 1)
+            result = {
+                'case': name,
+                'bars': n,
+                'repeats': len(timings),
+                'seconds_min': min(timings),
+                'seconds_median': float(np.median(timings)),
+                'peak_mb': peak / 1024 ** 2,
+            }
+            results.append(result)
+            print(f"⏱ {name:<22} {n:>9,} bars | {result['seconds_min']:.4f}s | peak {result['peak_mb']:.1f} MB")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': BENCH_SEED,
+    }
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # Ratio of current to baseline best time per (case, bars); > threshold is a regression
+    old = {(r['case'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        before = old.get((r['case'], r['bars']))
+        if before is None:
+            continue
+        ratio = r['seconds_min'] / before['seconds_min'] if before['seconds_min'] else float('inf')
+        flag = "⚠️" if ratio > threshold else "✅"
+        print(f"{flag} {r['case']:<22} {r['bars']:>9,} bars | {before['seconds_min']:.4f}s → "
+              f"{r['seconds_min']:.4f}s ({ratio:.2f}x)")
+        if ratio > threshold:
+            regressions.append((r['case'], r['bars'], ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the hot paths on synthetic OHLCV data")
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=BENCH_SIZES)
+    parser.add_argument('--repeats', type=int, default=3, help="timed runs per case below 100k bars")
+    parser.add_argument('--output', default=None, help="results JSON (default: reports/benchmarks/<timestamp>.json)")
+    parser.add_argument('--compare', default=None, help="baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cases, args.sizes, args.repeats)
+    report = {'environment': environment(), 'results': results}
+
+    output = args.output or os.path.join(BENCH_OUTPUT_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📤 Benchmark results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            raise SystemExit(f"❌ {len(regressions)} benchmark regression(s) above {args.threshold:.2f}x")
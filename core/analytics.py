@@ -0,0 +1,144 @@
+# core/analytics.py
+
+import numpy as np
+import pandas as pd
+
+from core.backtest_engine import ACCOUNT_BALANCE
+
+PNL_COLUMN = 'PnL_$'
+TRADING_DAYS = 252
+
+METRIC_COLUMNS = [
+    'trades', 'wins', 'losses', 'win_rate', 'net_pnl', 'gross_profit', 'gross_loss',
+    'profit_factor', 'expectancy', 'avg_win', 'avg_loss', 'final_equity',
+    'max_drawdown', 'max_drawdown_pct', 'sharpe'
+]
+
+
+def _group_codes(trades, by):
+    if by is None:
+        return np.zeros(len(trades), dtype=np.int64), None
+    grouped = trades.groupby(by, sort=True, dropna=False)  # NaN keys get a group of their own, never code -1
+    return grouped.ngroup().to_numpy(dtype=np.int64), grouped.size().index
+
+
+def _ratio(num, den):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+
+# === Trade Metrics ===
+# trades may hold one run or many (e.g. every sweep run with a run_id
+# column); by picks the grouping and every metric is computed for all
+# groups at once. Trades are ordered by exit time within each group, so
+# equity and drawdown follow the order in which results were realised.
+def trade_metrics(trades, by=None, pnl_col=PNL_COLUMN, initial_balance=ACCOUNT_BALANCE):
+    codes, keys = _group_codes(trades, by)
+    n_groups = len(keys) if keys is not None else int(len(trades) > 0)
+    if n_groups == 0:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    exit_ns = trades['exit_time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.lexsort((exit_ns, codes))
+    codes = codes[order]
+    exit_ns = exit_ns[order]
+    pnl = trades[pnl_col].to_numpy(dtype=np.float64)[order]
+    if 'result' in trades:
+        is_win = trades['result'].to_numpy()[order] == 'win'
+    else:
+        is_win = pnl > 0
+
+    count = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    wins = np.bincount(codes, weights=is_win, minlength=n_groups)
+    gross_profit = np.bincount(codes, weights=np.where(pnl > 0, pnl, 0.0), minlength=n_groups)
+    gross_loss = np.bincount(codes, weights=np.where(pnl < 0, -pnl, 0.0), minlength=n_groups)
+    n_profit = np.bincount(codes, weights=pnl > 0, minlength=n_groups)
+    n_loss = np.bincount(codes, weights=pnl < 0, minlength=n_groups)
+    net = gross_profit - gross_loss
+
+    # Equity and drawdown: cumulative sums restart at each group's first row
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    cumulative = np.cumsum(pnl)
+    offset = np.r_[0.0, cumulative[starts[1:] - 1]]
+    equity = initial_balance + cumulative - np.repeat(offset, np.diff(np.r_[starts, len(pnl)]))
+    peak = np.maximum(pd.Series(equity).groupby(codes).cummax().to_numpy(), initial_balance)
+    drawdown = peak - equity
+    max_drawdown = np.maximum.reduceat(drawdown, starts)
+    max_drawdown_pct = np.maximum.reduceat(drawdown / peak, starts)
+
+    metrics = pd.DataFrame({
+        'trades': count.astype(np.int64),
+        'wins': wins.astype(np.int64),
+        'losses': (count - wins).astype(np.int64),
+        'win_rate': _ratio(wins, count),
+        'net_pnl': net,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': np.where(gross_loss > 0, _ratio(gross_profit, gross_loss),
+                                  np.where(gross_profit > 0, np.inf, np.nan)),
+        'expectancy': _ratio(net, count),
+        'avg_win': _ratio(gross_profit, n_profit),
+        'avg_loss': -_ratio(gross_loss, n_loss),
+        'final_equity': initial_balance + net,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_pct': max_drawdown_pct,
+        'sharpe': _daily_sharpe(codes, exit_ns, pnl, starts, initial_balance, n_groups),
+    }, index=keys)
+    return metrics
+
+
+def _daily_sharpe(codes, exit_ns, pnl, starts, initial_balance, n_groups):
+    # Annualised Sharpe of daily returns, counting business days without
+    # exits as flat days (closed form, so no per-group calendar is built)
+    day = exit_ns // 86_400_000_000_000
+    returns = pnl / initial_balance
+    key_change = np.r_[True, (codes[1:] != codes[:-1]) | (day[1:] != day[:-1])]
+    day_starts = np.flatnonzero(key_change)
+    day_sums = np.add.reduceat(returns, day_starts)
+    day_codes = codes[day_starts]
+
+    total = np.bincount(day_codes, weights=day_sums, minlength=n_groups)
+    squares = np.bincount(day_codes, weights=day_sums ** 2, minlength=n_groups)
+    active_days = np.bincount(day_codes, minlength=n_groups)
+
+    ends = np.r_[starts[1:], len(pnl)] - 1
+    first_day = day[starts].astype('datetime64[D]')
+    last_day = day[ends].astype('datetime64[D]')
+    span = np.maximum(np.busday_count(first_day, last_day + 1), active_days).astype(np.float64)
+
+    mean = _ratio(total, span)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (squares - span * mean ** 2) / (span - 1)
+        sharpe = mean / np.sqrt(variance) * np.sqrt(TRADING_DAYS)
+    return np.where((span > 1) & (variance > 0), sharpe, np.nan)
+
+
+# === Breakdowns ===
+def equity_curve(trades, pnl_col=PNL_COLUMN, initial_balance=ACCOUNT_BALANCE):
+    curve = trades.sort_values('exit_time', kind='stable')[['exit_time', pnl_col]].reset_index(drop=True)
+    curve['equity'] = initial_balance + curve[pnl_col].cumsum()
+    curve['peak'] = curve['equity'].cummax().clip(lower=initial_balance)
+    curve['drawdown'] = curve['peak'] - curve['equity']
+    curve['drawdown_pct'] = curve['drawdown'] / curve['peak']
+    return curve
+
+
+def symbol_breakdown(trades, run_col=None, **kwargs):
+    return trade_metrics(trades, by=[run_col, 'symbol'] if run_col else 'symbol', **kwargs)
+
+
+def direction_breakdown(trades, run_col=None, **kwargs):
+    return trade_metrics(trades, by=[run_col, 'direction'] if run_col else 'direction', **kwargs)
+
+
+def time_buckets(trades, freq='M', by=None, pnl_col=PNL_COLUMN):
+    # Realised PnL per period (rows) and group (columns)
+    period = trades['exit_time'].dt.to_period(freq).rename('period')
+    if by is None:
+        return trades.groupby(period)[pnl_col].sum().to_frame()
+    return trades.groupby([period, *np.atleast_1d(by)])[pnl_col].sum().unstack(fill_value=0.0)
+
+
+def rank_metrics(metrics, rank_by='sharpe', ascending=False, min_trades=1):
+    eligible = metrics[metrics['trades'] >= min_trades]
+    return eligible.sort_values(rank_by, ascending=ascending, na_position='last')
@@ -1,5 +1,7 @@
 import pandas as pd
-import os
+import numpy as np
+
+from core.exit_engine import resolve_exits, resolve_exits_intrabar, to_ns
 
 # Define pip settings per instrument
 pip_settings = {
@@ -19,104 +21,98 @@ ACCOUNT_BALANCE = 5000
 RISK_PCT = 0.005  # 0.5%
 COOLDOWN_BARS = 10  
 
-def backtest_signals(signals, price_data, symbol, atr_series, rr_ratio=2, stop_atr=1.0, output_path='reports/'):
-    trades = []
+TRADE_COLUMNS = [
+    'symbol', 'entry_time', 'exit_time', 'direction', 'entry_price', 'stop_loss',
+    'take_profit', 'exit_price', 'lot_size', 'sl_pips', 'PnL_pips', 'PnL_$', 'result'
+]
+
+def backtest_signals(signals, price_data, symbol, atr_series, rr_ratio=2, stop_atr=1.0, journal=None, price_tables=None, run_id='', intrabar=None):
     pip_info = pip_settings.get(symbol, {'pip_size': 0.0001, 'pip_value': 10.0})
     pip_size = pip_info['pip_size']
     pip_value = pip_info['pip_value']
     risk_amount = ACCOUNT_BALANCE * RISK_PCT
 
-    last_loss_index = {'long': -COOLDOWN_BARS - 1, 'short': -COOLDOWN_BARS - 1}
-
-    for idx, row in signals.iterrows():
-        direction = row['direction']
-        entry_time = row['time']
-        entry_price = row['close']
-        atr = atr_series.at[idx] if idx in atr_series.index else None
-        if pd.isna(atr):
-            continue
-
-        # ✅ Contextual memory filter
-        if idx - last_loss_index[direction] <= COOLDOWN_BARS:
-            continue
+    directions = signals['direction'].to_numpy()
+    is_long = directions == 'long'
+    entry_price = signals['close'].to_numpy(dtype=np.float64)
+    atr = atr_series.reindex(signals.index).to_numpy(dtype=np.float64)
 
-        # Calculate SL/TP
-        sl = entry_price - atr * stop_atr if direction == 'long' else entry_price + atr * stop_atr
-        tp = entry_price + (entry_price - sl) * rr_ratio if direction == 'long' else entry_price - (sl - entry_price) * rr_ratio
+    # Calculate SL/TP for every signal at once
+    sl = np.where(is_long, entry_price - atr * stop_atr, entry_price + atr * stop_atr)
+    tp = np.where(is_long, entry_price + (entry_price - sl) * rr_ratio, entry_price - (sl - entry_price) * rr_ratio)
 
-        # SL in pips
-        sl_pips = abs(entry_price - sl) / pip_size
+    # SL in pips
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sl_pips = np.abs(entry_price - sl) / pip_size
         raw_lot = risk_amount / (sl_pips * pip_value)
-        lot_size = max(int(raw_lot * 100) / 100.0, 0.01)
-
-        # Candle-by-candle simulation
-        post_entry = price_data[price_data['time'] > entry_time].copy()
-        if post_entry.empty:
+    lot_size = np.maximum(np.floor(raw_lot * 100) / 100.0, 0.01)
+
+    if intrabar is None:
+        # First-touch exits for the whole batch (SL checked before TP on each bar)
+        exit_idx, is_loss = resolve_exits(
+            price_data['time'], price_data['low'], price_data['high'],
+            signals['time'], sl, tp, is_long, tables=price_tables
+        )
+        has_exit = exit_idx >= 0
+        fill_price = entry_price
+        exit_fill = np.where(is_loss, sl, tp)
+    else:
+        # M1/tick exits (core/exit_engine.IntrabarSeries): the trade opens when
+        # the next bar opens, at the ask for longs and the bid for shorts
+        bar_times = to_ns(price_data['time'])
+        next_bar = np.searchsorted(bar_times, to_ns(signals['time']), side='right')
+        has_next = next_bar < len(bar_times)
+        entry_at = bar_times[np.minimum(next_bar, max(len(bar_times) - 1, 0))] if len(bar_times) else to_ns(signals['time'])
+        fill_price, intrabar_exit_time, exit_fill, is_loss, has_exit = resolve_exits_intrabar(
+            intrabar, entry_at, sl, tp, is_long
+        )
+        has_exit &= has_next
+
+    # ✅ Contextual memory filter (sequential: a loss blocks the next COOLDOWN_BARS)
+    last_loss_index = {'long': -COOLDOWN_BARS - 1, 'short': -COOLDOWN_BARS - 1}
+    has_exit = ~np.isnan(atr) & has_exit
+    taken = []
+    for i, (idx, direction) in enumerate(zip(signals.index, directions)):
+        if not has_exit[i]:
             continue
-
-        result = 'open'
-        exit_time = None
-        exit_price = None
-
-        for _, bar in post_entry.iterrows():
-            if direction == 'long':
-                if bar['low'] <= sl:
-                    result = 'loss'
-                    exit_price = sl
-                    exit_time = bar['time']
-                    break
-                elif bar['high'] >= tp:
-                    result = 'win'
-                    exit_price = tp
-                    exit_time = bar['time']
-                    break
-            elif direction == 'short':
-                if bar['high'] >= sl:
-                    result = 'loss'
-                    exit_price = sl
-                    exit_time = bar['time']
-                    break
-                elif bar['low'] <= tp:
-                    result = 'win'
-                    exit_price = tp
-                    exit_time = bar['time']
-                    break
-
-        if exit_price is None:
+        if idx - last_loss_index[direction] <= COOLDOWN_BARS:
             continue
-
-        profit_pips = (exit_price - entry_price) / pip_size
-        if direction == 'short':
-            profit_pips = -profit_pips
-        profit_dollars = profit_pips * pip_value * lot_size
-
-        if result == 'loss':
+        taken.append(i)
+        if is_loss[i]:
             last_loss_index[direction] = idx
 
-        trades.append({
-            'symbol': symbol,
-            'entry_time': entry_time,
-            'exit_time': exit_time,
-            'direction': direction,
-            'entry_price': entry_price,
-            'stop_loss': sl,
-            'take_profit': tp,
-            'exit_price': exit_price,
-            'lot_size': lot_size,
-            'sl_pips': round(sl_pips, 2),
-            'PnL_pips': round(profit_pips, 2),
-            'PnL_$': round(profit_dollars, 2),
-            'result': result
-        })
-
-    df_trades = pd.DataFrame(trades)
-
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
-
-    csv_file = os.path.join(output_path, f"{symbol}_trades.csv")
-    df_trades.to_csv(csv_file, index=False)
-    print(f"📤 Exported trades to {csv_file}")
+    taken = np.asarray(taken, dtype=np.int64)
+    trade_loss = is_loss[taken]
+    exit_price = exit_fill[taken]
+    if intrabar is None:
+        exit_time = price_data['time'].iloc[exit_idx[taken]].to_numpy()
+    else:
+        exit_time = intrabar_exit_time[taken]
+
+    profit_pips = (exit_price - fill_price[taken]) / pip_size
+    profit_pips = np.where(is_long[taken], profit_pips, -profit_pips)
+    profit_dollars = profit_pips * pip_value * lot_size[taken]
+
+    df_trades = pd.DataFrame({
+        'symbol': symbol,
+        'entry_time': signals['time'].iloc[taken].to_numpy(),
+        'exit_time': exit_time,
+        'direction': directions[taken],
+        'entry_price': fill_price[taken],
+        'stop_loss': sl[taken],
+        'take_profit': tp[taken],
+        'exit_price': exit_price,
+        'lot_size': lot_size[taken],
+        'sl_pips': [round(v, 2) for v in sl_pips[taken].tolist()],
+        'PnL_pips': [round(v, 2) for v in profit_pips.tolist()],
+        'PnL_$': [round(v, 2) for v in profit_dollars.tolist()],
+        'result': np.where(trade_loss, 'loss', 'win')
+    }, columns=TRADE_COLUMNS)
+
+    # Trades are appended to the journal (buffered; see core/trade_journal.py).
+    # Without one nothing is exported, which is what the parameter sweep wants.
+    if journal is not None:
+        journal.append_backtest(df_trades, run_id=run_id)
+        print(f"📤 Journaled {len(df_trades)} trades for {symbol}")
 
     return df_trades
-
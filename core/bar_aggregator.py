@@ -0,0 +1,292 @@
+# core/bar_aggregator.py
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from core.bar_store import BAR_DTYPE, TIMEFRAME_SECONDS
+
+AGG_TIMEFRAMES = ('D1', 'H4', 'H1')
+RING_BARS = 2048  # completed bars kept per symbol/timeframe
+TICK_POLL_SECONDS = 1.0
+TICK_BATCH = 100_000  # copy_ticks_from count per request
+CLOSE_GRACE_SECONDS = 2  # wait this long past a bar's end for late ticks before closing it on time
+
+BarClose = namedtuple('BarClose', ['symbol', 'timeframe', 'time', 'bar'])
+
+
+def frame_to_records(df):
+    # get_data frame (datetime 'time') -> BAR_DTYPE records
+    records = np.zeros(len(df), dtype=BAR_DTYPE)
+    records['time'] = df['time'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    for name in BAR_DTYPE.names[1:]:
+        if name in df:
+            records[name] = df[name].to_numpy()
+    return records
+
+
+# === Ring Buffer ===
+# Fixed-capacity BAR_DTYPE array; appends overwrite the oldest bar, so the
+# memory per symbol/timeframe never grows.
+class BarRing:
+    def __init__(self, capacity=RING_BARS):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=BAR_DTYPE)
+        self._count = 0  # bars ever appended
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def extend(self, records):
+        records = records[-self.capacity:]
+        idx = (self._count + np.arange(len(records))) % self.capacity
+        self._data[idx] = records
+        self._count += len(records)
+
+    def records(self, n=None):
+        # Newest n bars, oldest first (a copy)
+        n = len(self) if n is None else min(n, len(self))
+        return self._data[(self._count - n + np.arange(n)) % self.capacity]
+
+    def last_time(self):
+        return int(self._data[(self._count - 1) % self.capacity]['time']) if self._count else None
+
+
+class _TimeframeState:
+    def __init__(self, capacity):
+        self.ring = BarRing(capacity)
+        self.forming = None  # 1-element BAR_DTYPE array
+
+
+# === Tick -> Bar Aggregation ===
+# Builds bid-price OHLC bars (the MT5 convention) for several timeframes at
+# once. Each tick batch is bucketed with one floor division and reduced per
+# bucket with ufunc.reduceat; every bucket but the newest is a completed bar
+# and is published as a BarClose to the subscribers. Tick times are broker
+# server time, so the buckets line up with the terminal's own bars.
+class TickBarAggregator:
+    def __init__(self, timeframes=AGG_TIMEFRAMES, capacity=RING_BARS, points=None):
+        self.timeframes = tuple(timeframes)
+        self.capacity = capacity
+        self.points = points or {}  # symbol -> point size, for spreads in points
+        self._states = {}
+        self._last_tick = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        # callback(BarClose); runs on whichever thread feeds the ticks
+        self._subscribers.append(callback)
+
+    def _state(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._states:
+            self._states[key] = _TimeframeState(self.capacity)
+        return self._states[key]
+
+    def seed(self, symbol, timeframe, records, forming=True):
+        # History from get_data/the bar store; with forming=True the last bar
+        # is still open and keeps absorbing ticks. Its tick_volume restarts
+        # from zero: the feed re-reads that bar's ticks from its open.
+        records = np.asarray(records, dtype=BAR_DTYPE)
+        with self._lock:
+            state = self._states[(symbol, timeframe)] = _TimeframeState(self.capacity)
+            if forming and len(records):
+                state.ring.extend(records[:-1])
+                state.forming = records[-1:].copy()
+                state.forming['tick_volume'] = 0
+            else:
+                state.ring.extend(records)
+
+    def forming_time(self, symbol, timeframe):
+        with self._lock:
+            state = self._states.get((symbol, timeframe))
+            return int(state.forming['time'][0]) if state is not None and state.forming is not None else None
+
+    def on_ticks(self, symbol, ticks):
+        ticks = ticks[ticks['bid'] > 0]
+        if len(ticks) == 0:
+            return []
+        seconds = ticks['time_msc'] // 1000
+        bid = np.asarray(ticks['bid'], dtype=np.float64)
+        point = self.points.get(symbol)
+        spread = (np.rint((ticks['ask'] - bid) / point).astype(np.int64) if point
+                  else np.zeros(len(ticks), dtype=np.int64))
+
+        events = []
+        with self._lock:
+            self._last_tick[symbol] = ticks[-1].copy()
+            for timeframe in self.timeframes:
+                events += self._apply(symbol, timeframe, seconds, bid, spread)
+        self._publish(events)
+        return events
+
+    def _apply(self, symbol, timeframe, seconds, bid, spread):
+        period = TIMEFRAME_SECONDS[timeframe]
+        state = self._state(symbol, timeframe)
+        bucket = seconds // period * period
+
+        # Ticks for bars that already closed are dropped
+        floor = state.ring.last_time()
+        if floor is not None:
+            keep = bucket > floor
+            bucket, bid, spread = bucket[keep], bid[keep], spread[keep]
+            if len(bucket) == 0:
+                return []
+
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(bucket)]
+        bars = np.zeros(len(starts), dtype=BAR_DTYPE)
+        bars['time'] = bucket[starts]
+        bars['open'] = bid[starts]
+        bars['high'] = np.maximum.reduceat(bid, starts)
+        bars['low'] = np.minimum.reduceat(bid, starts)
+        bars['close'] = bid[ends - 1]
+        bars['tick_volume'] = ends - starts
+        bars['spread'] = np.minimum.reduceat(spread, starts)
+
+        closed = []
+        forming = state.forming
+        if forming is not None:
+            if forming['time'][0] == bars['time'][0]:
+                first = bars[:1]
+                first['open'] = forming['open']
+                first['high'] = np.maximum(first['high'], forming['high'])
+                first['low'] = np.minimum(first['low'], forming['low'])
+                first['tick_volume'] += forming['tick_volume']
+                first['spread'] = np.minimum(first['spread'], forming['spread'])
+            else:
+                closed.append(forming)
+        closed.append(bars[:-1])
+        state.forming = bars[-1:].copy()
+        return self._close(symbol, timeframe, state, np.concatenate(closed))
+
+    def _close(self, symbol, timeframe, state, closed):
+        if len(closed) == 0:
+            return []
+        state.ring.extend(closed)
+        return [BarClose(symbol, timeframe, pd.to_datetime(int(bar['time']), unit='s'), bar.copy()) for bar in closed]
+
+    def close_elapsed(self, server_now, grace=CLOSE_GRACE_SECONDS):
+        # Closes forming bars whose period ended (no tick of the next bar needed)
+        events = []
+        with self._lock:
+            for (symbol, timeframe), state in self._states.items():
+                forming = state.forming
+                if forming is None or forming['time'][0] + TIMEFRAME_SECONDS[timeframe] + grace > server_now:
+                    continue
+                state.forming = None
+                events += self._close(symbol, timeframe, state, forming)
+        self._publish(events)
+        return events
+
+    def _publish(self, events):
+        for event in events:
+            for callback in self._subscribers:
+                callback(event)
+
+    def window(self, symbol, timeframe, bars, include_forming=True):
+        # Newest `bars` records oldest first, ending with the forming bar like copy_rates_from_pos
+        with self._lock:
+            state = self._states.get((symbol, timeframe))
+            if state is None:
+                return np.zeros(0, dtype=BAR_DTYPE)
+            if include_forming and state.forming is not None:
+                return np.concatenate([state.ring.records(bars - 1), state.forming])
+            return state.ring.records(bars)
+
+    def last_tick(self, symbol):
+        with self._lock:
+            return self._last_tick.get(symbol)
+
+
+# === Tick Feed ===
+# Polls copy_ticks_from per symbol from the last tick seen and feeds the
+# aggregator. copy_ticks_from takes whole seconds, so the ticks already seen
+# at the last millisecond are skipped by count. The server clock is tracked
+# from the newest tick plus local elapsed time, which closes bars on time in
+# quiet markets without knowing the broker's UTC offset.
+class TickFeed:
+    def __init__(self, aggregator, symbols, copy_ticks, poll_interval=TICK_POLL_SECONDS, batch=TICK_BATCH,
+                 lock=None):
+        self.aggregator = aggregator
+        self.symbols = list(symbols)
+        self.copy_ticks = copy_ticks  # (symbol, from_seconds, count) -> tick array or None
+        self.poll_interval = poll_interval
+        self.batch = batch
+        self.lock = lock or threading.Lock()  # share with any other thread calling the terminal
+        self._last_msc = {}
+        self._seen_at_last = {}
+        self._server_anchor = None  # (server seconds, local monotonic)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def server_now(self):
+        if self._server_anchor is None:
+            return None
+        server, local = self._server_anchor
+        return server + time.monotonic() - local
+
+    def _start_seconds(self, symbol):
+        if symbol in self._last_msc:
+            return self._last_msc[symbol] // 1000
+        # First poll: rebuild the seeded forming bar from its open
+        opens = [self.aggregator.forming_time(symbol, tf) for tf in self.aggregator.timeframes]
+        opens = [t for t in opens if t is not None]
+        return max(opens) if opens else int(time.time())
+
+    def _new_ticks(self, symbol, ticks):
+        last = self._last_msc.get(symbol)
+        if last is not None:
+            ticks = ticks[ticks['time_msc'] >= last]
+            at_last = np.flatnonzero(ticks['time_msc'] == last)
+            ticks = np.delete(ticks, at_last[:self._seen_at_last.get(symbol, 0)])
+        if len(ticks) == 0:
+            return ticks
+        newest = int(ticks['time_msc'][-1])
+        seen = int(np.count_nonzero(ticks['time_msc'] == newest))
+        self._seen_at_last[symbol] = seen + (self._seen_at_last.get(symbol, 0) if newest == last else 0)
+        self._last_msc[symbol] = newest
+        return ticks
+
+    def poll(self):
+        events = []
+        for symbol in self.symbols:
+            while True:
+                with self.lock:
+                    ticks = self.copy_ticks(symbol, self._start_seconds(symbol), self.batch)
+                if ticks is None or len(ticks) == 0:
+                    break
+                fresh = self._new_ticks(symbol, ticks)
+                if len(fresh):
+                    newest = int(fresh['time_msc'][-1]) / 1000
+                    if self._server_anchor is None or newest > self.server_now():
+                        self._server_anchor = (newest, time.monotonic())
+                    events += self.aggregator.on_ticks(symbol, fresh)
+                if len(fresh) == 0 or len(ticks) < self.batch:
+                    break
+
+        server_now = self.server_now()
+        if server_now is not None:
+            events += self.aggregator.close_elapsed(server_now)
+        return events
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ Tick poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='tick-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,159 @@
+# core/bar_store.py
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BAR_STORE_DIR = "data/bars"
+
+# Same layout as the structured arrays returned by MT5 copy_rates_*
+BAR_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8'),
+])
+
+# Same layout as copy_ticks_range / copy_ticks_from results
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('last', '<f8'),
+    ('volume', '<u8'),
+    ('time_msc', '<i8'),
+    ('flags', '<u4'),
+    ('volume_real', '<f8'),
+])
+TICKS = 'ticks'
+
+TIMEFRAME_SECONDS = {
+    'M1': 60,
+    'M5': 300,
+    'M15': 900,
+    'M30': 1800,
+    'H1': 3600,
+    'H4': 4 * 3600,
+    'D1': 24 * 3600,
+}
+
+
+def to_bar_records(rates, dtype=BAR_DTYPE):
+    # Copy field by field: structured astype would match fields by position
+    rates = np.asarray(rates)
+    records = np.zeros(len(rates), dtype=dtype)
+    for name in dtype.names:
+        if rates.dtype.names and name in rates.dtype.names:
+            records[name] = rates[name]
+    return records
+
+
+def records_to_frame(records):
+    df = pd.DataFrame(np.array(records, dtype=BAR_DTYPE))
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df
+
+
+# === Bar Store ===
+# One append-only binary file of BAR_DTYPE records per symbol/timeframe,
+# read back through np.memmap so history is served without parsing. The
+# newest stored bar may still be forming; appends overwrite every stored
+# bar at or after the first incoming timestamp. Files never shrink in
+# place, since replay and intrabar readers hold memmaps on them.
+class BarStore:
+    def __init__(self, root=BAR_STORE_DIR):
+        self.root = root
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, symbol, f"{timeframe}.bin")
+
+    def load(self, symbol, timeframe, dtype=BAR_DTYPE):
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.zeros(0, dtype=dtype)
+        count = os.path.getsize(path) // dtype.itemsize
+        return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+    def count(self, symbol, timeframe):
+        path = self.path(symbol, timeframe)
+        return os.path.getsize(path) // BAR_DTYPE.itemsize if os.path.exists(path) else 0
+
+    def last_time(self, symbol, timeframe):
+        bars = self.load(symbol, timeframe)
+        return int(bars['time'][-1]) if len(bars) else None
+
+    def append(self, symbol, timeframe, rates, dtype=BAR_DTYPE, time_field='time'):
+        records = to_bar_records(rates, dtype)
+        if len(records) == 0:
+            return 0
+        records = records[np.argsort(records[time_field], kind='stable')]
+
+        path = self.path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existing = self.load(symbol, timeframe, dtype)
+        count = len(existing)
+        cut = int(np.searchsorted(existing[time_field], records[time_field][0], side='left'))
+
+        if cut == count:
+            del existing
+            # Pure append. Readers may have the file memmapped, so it never
+            # shrinks below its full records; only a trailing partial record
+            # left by an interrupted write (outside any mapping) is dropped.
+            with open(path, 'ab') as f:
+                if f.tell() != count * dtype.itemsize:
+                    f.truncate(count * dtype.itemsize)
+                f.write(records.tobytes())
+            return len(records)
+
+        # Stored bars from the first incoming timestamp on are replaced: the
+        # kept head and the new records go to a temp file that atomically
+        # replaces the store, so open memmaps keep reading the old file and a
+        # crash mid-write leaves the old file intact
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.asarray(existing[:cut]).tobytes())
+            f.write(records.tobytes())
+        del existing
+        os.replace(tmp_path, path)
+        return len(records)
+
+    # Ticks live next to the bars as <symbol>/ticks.bin, ordered by time_msc
+    def load_ticks(self, symbol):
+        return self.load(symbol, TICKS, TICK_DTYPE)
+
+    def append_ticks(self, symbol, ticks):
+        return self.append(symbol, TICKS, ticks, TICK_DTYPE, 'time_msc')
+
+    def merge(self, symbol, timeframe, rates):
+        records = to_bar_records(rates)
+        existing = np.array(self.load(symbol, timeframe))
+        combined = np.concatenate([records, existing])
+        # Keep the freshly fetched copy of any duplicated bar
+        _, first = np.unique(combined['time'], return_index=True)
+        combined = combined[first]
+
+        path = self.path(symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(combined.tobytes())
+        os.replace(tmp_path, path)
+        return len(combined)
+
+    def read(self, symbol, timeframe, bars=None, start=None, end=None):
+        records = self.load(symbol, timeframe)
+        times = records['time']
+        lo = 0 if start is None else int(np.searchsorted(times, _to_epoch(start), side='left'))
+        hi = len(records) if end is None else int(np.searchsorted(times, _to_epoch(end), side='right'))
+        if bars is not None:
+            lo = max(lo, hi - bars)
+        return records_to_frame(records[lo:hi])
+
+
+def _to_epoch(value):
+    return int(pd.Timestamp(value).timestamp())
@@ -0,0 +1,28 @@
+# core/clock.py
+
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    def now(self):
+        return datetime.utcnow()
+
+    def sleep(self, seconds, wake=None):
+        # wake: optional threading.Event that ends the sleep early
+        if wake is None:
+            time.sleep(seconds)
+        else:
+            wake.wait(seconds)
+
+
+# Replay clock: sleeping just moves simulated time forward
+class SimulatedClock:
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds, wake=None):
+        self.current += timedelta(seconds=seconds)
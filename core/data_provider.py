@@ -0,0 +1,153 @@
+# core/data_provider.py
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from core.bar_aggregator import AGG_TIMEFRAMES, RING_BARS, TickBarAggregator, TickFeed, frame_to_records
+from core.bar_store import BarStore, TIMEFRAME_SECONDS, records_to_frame
+
+Tick = namedtuple('Tick', ['time', 'bid', 'ask'])
+
+
+# === Data Provider Interface ===
+# Everything the live loop needs from the terminal goes through one of these,
+# so the same pipeline can run against MT5 or against stored history.
+class DataProvider:
+    def connect(self):
+        return True
+
+    def get_data(self, symbol, timeframe, bars=1000):
+        raise NotImplementedError
+
+    def symbol_info_tick(self, symbol):
+        raise NotImplementedError
+
+    def copy_ticks_from(self, symbol, date_from, count):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MT5DataProvider(DataProvider):
+    def __init__(self):
+        # MetaTrader5 only exists on Windows; import it only when used
+        from core import mt5_connector
+        self._connector = mt5_connector
+
+    def connect(self):
+        return self._connector.connect_to_mt5()
+
+    def get_data(self, symbol, timeframe, bars=1000):
+        return self._connector.get_data(symbol, timeframe, bars)
+
+    def symbol_info_tick(self, symbol):
+        return self._connector.SESSION.call('symbol_info_tick', symbol)
+
+    def copy_ticks_from(self, symbol, date_from, count):
+        return self._connector.SESSION.call('copy_ticks_from', symbol, date_from, count,
+                                            self._connector.mt5.COPY_TICKS_ALL)
+
+    def close(self):
+        self._connector.SESSION.shutdown()
+
+
+# === Historical Replay ===
+# Serves bar-store history as of clock.now(). Only bars that have fully
+# closed are returned: the stored OHLC of a bar that would still be forming
+# would leak its future high/low into the replay. History is static during a
+# replay, so windows are cached until a new bar closes.
+class ReplayDataProvider(DataProvider):
+    def __init__(self, clock, store=None, tick_timeframes=('M1', 'H1')):
+        self.clock = clock
+        self.store = store or BarStore()
+        self.tick_timeframes = tick_timeframes
+        self._records = {}
+        self._windows = {}
+
+    def _closed_count(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._records:
+            self._records[key] = self.store.load(symbol, timeframe)
+        records = self._records[key]
+        cutoff = pd.Timestamp(self.clock.now()) - pd.Timedelta(seconds=TIMEFRAME_SECONDS[timeframe])
+        return records, int(np.searchsorted(records['time'], int(cutoff.timestamp()), side='right'))
+
+    def get_data(self, symbol, timeframe, bars=1000):
+        records, end = self._closed_count(symbol, timeframe)
+        if end == 0:
+            print(f"⚠️ No data returned for {symbol} on {timeframe}")
+            return pd.DataFrame()
+
+        key = (symbol, timeframe, bars)
+        cached = self._windows.get(key)
+        if cached is None or cached[0] != end:
+            cached = (end, records_to_frame(records[max(end - bars, 0):end]))
+            self._windows[key] = cached
+        return cached[1]
+
+    def symbol_info_tick(self, symbol):
+        # Last close of the finest stored timeframe stands in for the tick
+        for timeframe in self.tick_timeframes:
+            records, end = self._closed_count(symbol, timeframe)
+            if len(records) == 0:
+                continue
+            if end == 0:
+                return None
+            bar = records[end - 1]
+            return Tick(pd.to_datetime(int(bar['time']), unit='s'), float(bar['close']), float(bar['close']))
+        return None
+
+
+# === Streaming Bars ===
+# Seeds one ring buffer per symbol/timeframe from the wrapped provider, then
+# keeps them current from ticks (see core/bar_aggregator.py). get_data and
+# symbol_info_tick are served from memory, and once connected the tick feed
+# thread is the only one talking to the terminal.
+class TickDataProvider(DataProvider):
+    def __init__(self, source, symbols, timeframes=AGG_TIMEFRAMES, history=RING_BARS, points=None):
+        self.source = source
+        self.symbols = list(symbols)
+        self.history = history
+        self.aggregator = TickBarAggregator(timeframes, history, points)
+        self.feed = TickFeed(self.aggregator, self.symbols, source.copy_ticks_from)
+
+    def subscribe(self, callback):
+        self.aggregator.subscribe(callback)
+
+    def connect(self):
+        if not self.source.connect():
+            return False
+        for symbol in self.symbols:
+            for timeframe in self.aggregator.timeframes:
+                df = self.source.get_data(symbol, timeframe, self.history)
+                if not df.empty:
+                    self.aggregator.seed(symbol, timeframe, frame_to_records(df))
+        self.feed.start()
+        return True
+
+    def get_data(self, symbol, timeframe, bars=1000):
+        if timeframe not in self.aggregator.timeframes:
+            with self.feed.lock:
+                return self.source.get_data(symbol, timeframe, bars)
+        records = self.aggregator.window(symbol, timeframe, bars)
+        if len(records) == 0:
+            print(f"⚠️ No data returned for {symbol} on {timeframe}")
+            return pd.DataFrame()
+        return records_to_frame(records)
+
+    def symbol_info_tick(self, symbol):
+        tick = self.aggregator.last_tick(symbol)
+        if tick is None:
+            return None
+        return Tick(pd.to_datetime(int(tick['time_msc']), unit='ms'), float(tick['bid']), float(tick['ask']))
+
+    def copy_ticks_from(self, symbol, date_from, count):
+        with self.feed.lock:
+            return self.source.copy_ticks_from(symbol, date_from, count)
+
+    def close(self):
+        self.feed.stop()
+        self.source.close()
@@ -0,0 +1,252 @@
+# core/exit_engine.py
+
+import numpy as np
+import pandas as pd
+
+
+# === Range Extreme Tables ===
+# table[k][i] holds the min (or max) of values[i:i + 2**k]. Built once per
+# price series, they let us jump forward from any entry bar in O(log M)
+# steps instead of walking the bars one by one.
+def build_extreme_table(values, op):
+    values = np.asarray(values, dtype=np.float64)
+    table = [values]
+    step = 1
+    while step * 2 <= len(values):
+        prev = table[-1]
+        table.append(op(prev[:-step], prev[step:]))
+        step *= 2
+    return table
+
+
+def build_price_tables(low, high):
+    return build_extreme_table(low, np.minimum), build_extreme_table(high, np.maximum)
+
+
+def _first_touch(table, start, level, below):
+    # Binary lifting: advance each position by 2**k bars whenever that whole
+    # block stays on the safe side of its level. What remains is the first
+    # bar that touches the level (or len(values) if it never does).
+    n = len(table[0])
+    pos = np.asarray(start, dtype=np.int64).copy()
+    level = np.asarray(level, dtype=np.float64)
+    for k in range(len(table) - 1, -1, -1):
+        block = table[k]
+        step = 1 << k
+        can_jump = pos + step <= n
+        if not can_jump.any():
+            continue
+        vals = block[np.minimum(pos, len(block) - 1)]
+        safe = vals > level if below else vals < level
+        pos = np.where(can_jump & safe, pos + step, pos)
+    return pos
+
+
+def first_index_at_or_below(min_table, start, level):
+    return _first_touch(min_table, start, level, below=True)
+
+
+def first_index_at_or_above(max_table, start, level):
+    return _first_touch(max_table, start, level, below=False)
+
+
+def to_ns(times):
+    return pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]')
+
+
+# === Batched First-Touch Exits ===
+# Mirrors the candle-by-candle rule of backtest_signals: scan bars strictly
+# after the entry time, SL is checked before TP on the same bar.
+def resolve_exits(bar_times, low, high, entry_times, sl, tp, is_long, tables=None):
+    bar_times = to_ns(bar_times)
+    entry_times = to_ns(entry_times)
+    is_long = np.asarray(is_long, dtype=bool)
+    sl = np.asarray(sl, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+    n_bars = len(bar_times)
+
+    if tables is None:
+        tables = build_price_tables(low, high)
+    min_table, max_table = tables
+
+    start = np.searchsorted(bar_times, entry_times, side='right')
+    if n_bars == 0:
+        none = np.full(len(start), -1, dtype=np.int64)
+        return none, np.zeros(len(start), dtype=bool)
+
+    # Longs: SL hit when low <= sl, TP hit when high >= tp (shorts mirrored)
+    below_level = np.where(is_long, sl, tp)
+    above_level = np.where(is_long, tp, sl)
+    hit_below = first_index_at_or_below(min_table, start, below_level)
+    hit_above = first_index_at_or_above(max_table, start, above_level)
+
+    sl_idx = np.where(is_long, hit_below, hit_above)
+    tp_idx = np.where(is_long, hit_above, hit_below)
+
+    exit_idx = np.minimum(sl_idx, tp_idx)
+    is_loss = sl_idx <= tp_idx
+    exit_idx = np.where(exit_idx >= n_bars, -1, exit_idx)
+    return exit_idx, is_loss
+
+
+# === Intrabar Series ===
+# Bid/ask extremes at M1 or tick resolution, usually views into the bar
+# store memmaps. Per-block minima/maxima (INTRABAR_BLOCK rows each) are the
+# only arrays built up front: a first touch is located block by block with
+# the same binary lifting as above, then inside a single block with a
+# first-true scan, so tens of millions of ticks never sit in memory at once.
+INTRABAR_BLOCK = 4096
+SCAN_BATCH = 256  # trades per gathered (trades x block) window
+
+
+def _block_extreme(values, block, op):
+    n = len(values)
+    out = np.empty((n + block - 1) // block)
+    step = block * 1024
+    for lo in range(0, n, step):
+        chunk = np.asarray(values[lo:lo + step], dtype=np.float64)
+        out[lo // block:lo // block + (len(chunk) + block - 1) // block] = op.reduceat(chunk, np.arange(0, len(chunk), block))
+    return out
+
+
+class IntrabarSeries:
+    def __init__(self, times, time_scale, bid_open, ask_open, bid_low, bid_high, ask_low, ask_high,
+                 gap_fills=False, block=INTRABAR_BLOCK):
+        # times are in units of time_scale nanoseconds (seconds for bars, ms for ticks)
+        self.times = times
+        self.time_scale = time_scale
+        self.bid_open, self.ask_open = bid_open, ask_open
+        self.bid_low, self.bid_high = bid_low, bid_high
+        self.ask_low, self.ask_high = ask_low, ask_high
+        self.gap_fills = gap_fills
+        self.block = block
+        self.tables = {
+            'bid_low': build_extreme_table(_block_extreme(bid_low, block, np.minimum), np.minimum),
+            'bid_high': build_extreme_table(_block_extreme(bid_high, block, np.maximum), np.maximum),
+            'ask_low': build_extreme_table(_block_extreme(ask_low, block, np.minimum), np.minimum),
+            'ask_high': build_extreme_table(_block_extreme(ask_high, block, np.maximum), np.maximum),
+        }
+
+    @classmethod
+    def from_ticks(cls, ticks, block=INTRABAR_BLOCK):
+        # A stop that gaps through its level fills at the first tick beyond it
+        bid, ask = ticks['bid'], ticks['ask']
+        return cls(ticks['time_msc'], 1_000_000, bid, ask, bid, bid, ask, ask, gap_fills=True, block=block)
+
+    @classmethod
+    def from_m1(cls, bars, point, block=INTRABAR_BLOCK):
+        # MT5 bars are bid prices; ask = bid + spread (in points) per bar
+        spread = np.asarray(bars['spread'], dtype=np.float64) * point
+        low, high, open_ = (np.asarray(bars[f], dtype=np.float64) for f in ('low', 'high', 'open'))
+        return cls(bars['time'], 1_000_000_000, open_, open_ + spread, low, high, low + spread, high + spread,
+                   block=block)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _scan(self, field, begin, end, level, below):
+        # First row in [begin, end) at/through level (end when none), end - begin <= block
+        values = getattr(self, field)
+        n = len(values)
+        out = end.copy()
+        offsets = np.arange(self.block)
+        for lo in range(0, len(begin), SCAN_BATCH):
+            b, e, lv = begin[lo:lo + SCAN_BATCH], end[lo:lo + SCAN_BATCH], level[lo:lo + SCAN_BATCH]
+            idx = b[:, None] + offsets
+            vals = values[np.minimum(idx, n - 1)]
+            hit = (idx < e[:, None]) & (vals <= lv[:, None] if below else vals >= lv[:, None])
+            found = hit.any(axis=1)
+            out[lo:lo + SCAN_BATCH] = np.where(found, b + hit.argmax(axis=1), e)
+        return out
+
+    def first_touch(self, field, start, level, below):
+        # Row index of the first touch at or after start (len(self) when never)
+        n = len(self)
+        block = self.block
+        start = np.asarray(start, dtype=np.int64)
+        level = np.asarray(level, dtype=np.float64)
+
+        # Rest of the block the entry falls in
+        block_end = np.minimum((start // block + 1) * block, n)
+        hit = self._scan(field, np.minimum(start, n), np.maximum(block_end, np.minimum(start, n)), level, below)
+        pending = (hit >= block_end) & (block_end < n)
+        if not pending.any():
+            return np.where(hit >= block_end, n, hit)
+
+        # Later blocks: find the first block whose extreme reaches the level, then scan it
+        first_block = _first_touch(self.tables[field], block_end[pending] // block, level[pending], below)
+        begin = np.minimum(first_block * block, n)
+        later = self._scan(field, begin, np.minimum(begin + block, n), level[pending], below)
+        hit = np.where(hit >= block_end, n, hit)
+        hit[pending] = later
+        return hit
+
+    def price(self, field, idx):
+        return np.asarray(getattr(self, field)[idx], dtype=np.float64)
+
+
+# === Intrabar Exits ===
+# Entries fill at the first row at/after entry_times (longs at the ask,
+# shorts at the bid). Longs exit on the bid, shorts on the ask, so the
+# spread is paid on both sides. SL wins a tie on the same row.
+def resolve_exits_intrabar(series, entry_times, sl, tp, is_long):
+    is_long = np.asarray(is_long, dtype=bool)
+    sl = np.asarray(sl, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+    n = len(series)
+
+    entry_keys = to_ns(entry_times).astype(np.int64) // series.time_scale
+    start = np.searchsorted(series.times, entry_keys, side='left')
+    has_entry = start < n
+    if n:
+        # Entries before the stored M1/ticks begin have no intrabar path to follow
+        has_entry &= entry_keys >= series.times[0]
+    if not has_entry.any():
+        nan = np.full(len(start), np.nan)
+        return nan, nan.astype('datetime64[ns]'), nan.copy(), np.zeros(len(start), dtype=bool), has_entry
+
+    sl_idx = np.full(len(start), n, dtype=np.int64)
+    tp_idx = np.full(len(start), n, dtype=np.int64)
+    longs, shorts = is_long & has_entry, ~is_long & has_entry
+    if longs.any():
+        sl_idx[longs] = series.first_touch('bid_low', start[longs], sl[longs], below=True)
+        tp_idx[longs] = series.first_touch('bid_high', start[longs], tp[longs], below=False)
+    if shorts.any():
+        sl_idx[shorts] = series.first_touch('ask_high', start[shorts], sl[shorts], below=False)
+        tp_idx[shorts] = series.first_touch('ask_low', start[shorts], tp[shorts], below=True)
+
+    exit_idx = np.minimum(sl_idx, tp_idx)
+    found = has_entry & (exit_idx < n)
+    is_loss = found & (sl_idx <= tp_idx)
+    row = np.minimum(exit_idx, n - 1)
+    entry_row = np.minimum(start, n - 1)
+
+    entry_price = np.where(is_long, series.price('ask_open', entry_row), series.price('bid_open', entry_row))
+    exit_price = np.where(is_loss, sl, tp)
+    if series.gap_fills:
+        stop_fill = np.where(is_long, np.minimum(sl, series.price('bid_low', row)),
+                             np.maximum(sl, series.price('ask_high', row)))
+        exit_price = np.where(is_loss, stop_fill, exit_price)
+    exit_time = (np.asarray(series.times[row], dtype=np.int64) * series.time_scale).astype('datetime64[ns]')
+
+    entry_price = np.where(has_entry, entry_price, np.nan)
+    exit_price = np.where(found, exit_price, np.nan)
+    exit_time = np.where(found, exit_time, np.datetime64('NaT'))
+    return entry_price, exit_time, exit_price, is_loss, found
+
+
+INTRABAR_SOURCES = ('ticks', 'M1')
+
+
+def load_intrabar(store, symbol, source='ticks', point=None, block=INTRABAR_BLOCK):
+    # IntrabarSeries over a BarStore's memmapped ticks or M1 bars (see
+    # backfill.py --tick-days / --timeframes M1); None when nothing is stored
+    if source not in INTRABAR_SOURCES:
+        raise ValueError(f"Unknown intrabar source: {source}")
+    if source == 'ticks':
+        ticks = store.load_ticks(symbol)
+        return IntrabarSeries.from_ticks(ticks, block=block) if len(ticks) else None
+    if point is None:
+        raise ValueError("M1 intrabar exits need the symbol's point size for the spread")
+    bars = store.load(symbol, 'M1')
+    return IntrabarSeries.from_m1(bars, point, block=block) if len(bars) else None
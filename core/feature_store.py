@@ -0,0 +1,92 @@
+# core/feature_store.py
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def _encode(values):
+    values = np.asarray(values)
+    if values.dtype == bool:
+        return ('bits', np.packbits(values), len(values))
+    return ('raw', values.copy(), len(values))
+
+
+def _decode(encoded):
+    kind, data, n = encoded
+    if kind == 'bits':
+        return np.unpackbits(data, count=n).astype(bool)
+    return data.copy()
+
+
+def bars_key(bars):
+    # Identifies a bar window: same length, first and last bar time
+    if len(bars) == 0:
+        return (0, None, None)
+    times = bars['time']
+    return (len(bars), times.iloc[0], times.iloc[-1])
+
+
+# === Compact Feature Store ===
+# Memoizes feature columns per (symbol, timeframe, bar window, name, params).
+# Bools are held as packed bits (1 bit per bar); floats keep their dtype, so
+# a cached column is bit-identical to a fresh one (ATR sets stop distances,
+# distances are compared against tolerances). Least recently used entries
+# are evicted once the encoded arrays exceed max_bytes. Safe to share
+# between the scan worker threads.
+class FeatureStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(symbol, timeframe, bars, name, params=()):
+        return (symbol, timeframe, *bars_key(bars), name, tuple(params))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {name: _decode(encoded) for name, encoded in entry[0].items()}
+
+    def put(self, key, columns):
+        encoded = {name: _encode(values) for name, values in columns.items()}
+        size = sum(data.nbytes for _, data, _ in encoded.values())
+        if size > self.max_bytes:
+            return encoded
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (encoded, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return encoded
+
+    def get_or_compute(self, key, compute):
+        # compute() returns {name: array}
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        encoded = self.put(key, compute())
+        return {name: _decode(values) for name, values in encoded.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+FEATURE_STORE = FeatureStore()
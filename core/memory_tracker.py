@@ -4,52 +4,162 @@ import json
 import os
 from datetime import datetime, timedelta
 
-MEMORY_FILE = "live_trading/trade_memory.json"
+MEMORY_FILE = "live_trading/trade_memory.jsonl"
+LEGACY_MEMORY_FILE = "live_trading/trade_memory.json"
 EXPIRY_HOURS = 48  # forget signal after 2 days
+COMPACT_MIN_RECORDS = 1000  # rewrite the journal once it holds this many stale records
 
+# === Journaled Memory ===
+# The journal is append-only JSON lines: {"key", "signal_time", "marked_at"}
+# for a mark and {"key", "expired": true} for a removal. Marks are kept in
+# an in-memory index with parsed timestamps and written in one append per
+# flush() (once per scan cycle). On load a torn last line from a crash is
+# cut off, a complete one missing its newline gets it back, and any other
+# line that does not parse is skipped. Compaction rewrites the live entries
+# to a temp file that atomically replaces the journal.
 class MemoryTracker:
-    def __init__(self):
+    def __init__(self, path=MEMORY_FILE, now=datetime.now):
+        # now is swapped for the simulated clock during historical replay
+        self.path = path
+        self.now = now
         self.memory = {}
+        self._pending = []
+        self._records = 0
         self.load()
 
     def load(self):
-        if os.path.exists(MEMORY_FILE):
-            with open(MEMORY_FILE, 'r') as f:
-                try:
-                    self.memory = json.load(f)
-                except json.JSONDecodeError:
-                    self.memory = {}
-        else:
-            self.memory = {}
+        self.memory = {}
+        self._pending = []
+        self._records = 0
+        if not os.path.exists(self.path):
+            self._import_legacy()
+            return
+
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            lines = data.split(b'\n')
+            tail = lines.pop()  # bytes after the last newline (empty when the file ends cleanly)
+            for line in lines:
+                self._apply(line)
+            if tail:
+                if self._apply(tail):
+                    # Complete record that lost its newline: terminate it so the next append starts a new line
+                    f.write(b'\n')
+                else:
+                    # Torn write from a crash: drop it so later appends start on a clean line
+                    f.truncate(len(data) - len(tail))
+
+    def _apply(self, line):
+        # Replays one journal line; a line that does not parse is skipped
+        if not line.strip():
+            return False
+        try:
+            record = json.loads(line)
+            key = record['key']
+            if record.get('expired'):
+                self.memory.pop(key, None)
+            else:
+                self.memory[key] = {
+                    'signal_time': datetime.fromisoformat(record['signal_time']),
+                    'marked_at': datetime.fromisoformat(record['marked_at']),
+                }
+        except (ValueError, KeyError, TypeError):
+            return False
+        self._records += 1
+        return True
+
+    def _import_legacy(self):
+        legacy = LEGACY_MEMORY_FILE if self.path == MEMORY_FILE else None
+        if not legacy or not os.path.exists(legacy):
+            return
+        with open(legacy, 'r') as f:
+            try:
+                entries = json.load(f)
+            except json.JSONDecodeError:
+                return
+        for key, entry in entries.items():
+            self.memory[key] = {
+                'signal_time': datetime.fromisoformat(entry['signal_time']),
+                'marked_at': datetime.fromisoformat(entry['marked_at']),
+            }
+        self.compact()
+
+    # === Writes ===
+    def flush(self):
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in self._pending))
+            f.flush()
+            os.fsync(f.fileno())
+        self._records += len(self._pending)
+        self._pending = []
+
+        if self._records >= COMPACT_MIN_RECORDS and self._records > 2 * len(self.memory):
+            self.compact()
+
+    def compact(self):
+        self._pending = []
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for key, entry in self.memory.items():
+                f.write(json.dumps(self._mark_record(key, entry)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._records = len(self.memory)
 
     def save(self):
-        with open(MEMORY_FILE, 'w') as f:
-            json.dump(self.memory, f, indent=2, default=str)
+        self.flush()
+
+    @staticmethod
+    def _mark_record(key, entry):
+        return {'key': key, 'signal_time': str(entry['signal_time']), 'marked_at': str(entry['marked_at'])}
+
+    def _remove(self, key):
+        if self.memory.pop(key, None) is not None:
+            self._pending.append({'key': key, 'expired': True})
 
-    def already_traded(self, symbol, signal_time, direction):
-        key = f"{symbol}_{direction}"
-        signal_time_str = str(signal_time)
+    @staticmethod
+    def _key(symbol, direction, strategy=None):
+        return f"{symbol}_{direction}" if strategy is None else f"{symbol}_{direction}_{strategy}"
+
+    # === Lookups ===
+    def already_traded(self, symbol, signal_time, direction, strategy=None):
+        key = self._key(symbol, direction, strategy)
         if key in self.memory:
-            existing = self.memory[key]
             # Check time + expiry window
-            last_time = datetime.fromisoformat(existing['signal_time'])
-            now = datetime.now()
+            last_time = self.memory[key]['signal_time']
+            now = self.now()
             if last_time >= signal_time:
                 return True
             if now - last_time > timedelta(hours=EXPIRY_HOURS):
                 # Expire it
-                self.memory.pop(key, None)
-                self.save()
+                self._remove(key)
         return False
 
-    def mark_traded(self, symbol, signal_time, direction):
-        key = f"{symbol}_{direction}"
-        self.memory[key] = {
-            "signal_time": str(signal_time),
-            "marked_at": str(datetime.now())
+    def expire(self, hours=EXPIRY_HOURS):
+        # Bulk removal of every entry whose signal is older than the window.
+        # Unlike the lookup above this also forgets a signal that is still
+        # the latest one for its key, so it is meant for maintenance runs.
+        cutoff = self.now() - timedelta(hours=hours)
+        stale = [key for key, entry in self.memory.items() if entry['signal_time'] < cutoff]
+        for key in stale:
+            self._remove(key)
+        self.flush()
+        return len(stale)
+
+    def mark_traded(self, symbol, signal_time, direction, strategy=None):
+        key = self._key(symbol, direction, strategy)
+        entry = {
+            "signal_time": datetime.fromisoformat(str(signal_time)),
+            "marked_at": self.now()
         }
-        self.save()
+        self.memory[key] = entry
+        self._pending.append(self._mark_record(key, entry))
 
     def clear(self):
         self.memory = {}
-        self.save()
+        self.compact()
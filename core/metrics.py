@@ -0,0 +1,201 @@
+# core/metrics.py
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_NAMESPACE = "forex_bot"
+METRICS_HOST = "127.0.0.1"  # local only; put a proxy in front to scrape remotely
+METRICS_FILE = "logs/metrics.prom"
+METRICS_FILE_MAX_BYTES = 5 * 1024 ** 2
+METRICS_FILE_BACKUPS = 3
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# === Registry ===
+# Counters, gauges and histograms keyed by (name, sorted labels). Updates are
+# a dict lookup under one lock, cheap enough to wrap every stage of every
+# symbol; render() produces the Prometheus text exposition format.
+class Metrics:
+    def __init__(self, namespace=METRICS_NAMESPACE):
+        self.namespace = namespace
+        self._meta = {}  # name -> (kind, help, buckets)
+        self._values = {}  # name -> {label tuple: value or [bucket counts, sum, count]}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        if kind not in ('counter', 'gauge', 'histogram'):
+            raise ValueError(f"Unknown metric type: {kind}")
+        with self._lock:
+            self._meta[name] = (kind, help_text, tuple(buckets or LATENCY_BUCKETS))
+            self._values.setdefault(name, {})
+
+    def _series(self, name, kind):
+        meta = self._meta.get(name)
+        if meta is None:
+            self._meta[name] = meta = (kind, '', LATENCY_BUCKETS)
+            self._values[name] = {}
+        elif meta[0] != kind:
+            raise ValueError(f"{name} is a {meta[0]}, not a {kind}")
+        return meta, self._values[name]
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._series(name, 'counter')
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._series(name, 'gauge')
+            series[key] = value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            (_, _, buckets), series = self._series(name, 'histogram')
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            state[0][bisect_left(buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        # Current value (counter/gauge) or (sum, count) of a histogram series
+        with self._lock:
+            state = self._values.get(name, {}).get(tuple(sorted(labels.items())))
+        if isinstance(state, list):
+            return state[1], state[2]
+        return state
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                full = f"{self.namespace}_{name}" if self.namespace else name
+                if help_text:
+                    lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                for key, state in self._values[name].items():
+                    if kind != 'histogram':
+                        lines.append(f"{full}{_labels(key)} {_number(state)}")
+                        continue
+                    counts, total, count = state
+                    cumulative = 0
+                    for bound, hits in zip(buckets + (float('inf'),), counts):
+                        cumulative += hits
+                        lines.append(f"{full}_bucket{_labels(key, (('le', _number(bound)),))} {cumulative}")
+                    lines.append(f"{full}_sum{_labels(key)} {_number(total)}")
+                    lines.append(f"{full}_count{_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+# === Exporters ===
+def serve_metrics(metrics, port, host=METRICS_HOST):
+    # Background HTTP endpoint for Prometheus scrapes: GET /metrics
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes would flood the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"📈 Metrics served on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+class MetricsFile:
+    # Appends one timestamped snapshot per write; rolls path -> path.1 -> ...
+    # once it passes max_bytes, keeping `backups` old files.
+    def __init__(self, path=METRICS_FILE, max_bytes=METRICS_FILE_MAX_BYTES, backups=METRICS_FILE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, metrics):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"# snapshot {datetime.utcnow().isoformat(timespec='seconds')}Z\n")
+            f.write(metrics.render())
+
+
+# === Live Loop Metrics ===
+# Shared registry for the live runner and the notifier.
+METRICS = Metrics()
+METRICS.describe('stage_seconds', 'histogram', "Duration of a live loop stage per symbol")
+METRICS.describe('get_data_seconds', 'histogram', "Duration of one get_data call per symbol and timeframe")
+METRICS.describe('cycle_seconds', 'histogram', "Duration of a full scan over all symbols")
+METRICS.describe('telegram_post_seconds', 'histogram', "Duration of one Telegram sendMessage attempt")
+METRICS.describe('wake_delay_seconds', 'histogram', "Scheduler wake-up time past the planned bar close or timer")
+METRICS.describe('alert_lag_seconds', 'histogram', "Signal bar close to alert dispatch", LAG_BUCKETS)
+METRICS.describe('last_alert_lag_seconds', 'gauge', "Bar close to alert lag of the latest alert per symbol")
+METRICS.describe('last_cycle_timestamp_seconds', 'gauge', "Unix time the last scan cycle finished")
+METRICS.describe('telegram_queue_depth', 'gauge', "Messages waiting in the Telegram queue")
+METRICS.describe('cycles_total', 'counter', "Scan cycles completed")
+METRICS.describe('signals_total', 'counter', "Latest-bar signals seen per symbol and direction")
+METRICS.describe('alerts_total', 'counter', "Signal alerts dispatched per symbol")
+METRICS.describe('duplicate_signals_total', 'counter', "Signals suppressed as already alerted")
+METRICS.describe('skipped_symbols_total', 'counter', "Symbols skipped in a cycle, by reason")
+METRICS.describe('bar_closes_total', 'counter', "Bars closed by the tick aggregator")
+METRICS.describe('order_queue_seconds', 'histogram', "Order wait in the pipeline queue before order_send")
+METRICS.describe('order_send_seconds', 'histogram', "order_send round-trip per order")
+METRICS.describe('last_slippage_points', 'gauge', "Fill vs signal price of the latest fill (positive = adverse)")
+METRICS.describe('orders_total', 'counter', "Orders by symbol and outcome")
+METRICS.describe('telegram_messages_total', 'counter', "Telegram posts by outcome")
@@ -0,0 +1,103 @@
+# core/monte_carlo.py
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.backtest_engine import ACCOUNT_BALANCE
+
+DEFAULT_RISK_PCTS = (0.0025, 0.005, 0.01, 0.02)
+N_PATHS = 100_000
+CHUNK_PATHS = 10_000  # paths per block; bounds memory at CHUNK_PATHS x n_trades
+RUIN_PCT = 0.5  # ruined once equity falls to half the starting balance
+
+
+def r_multiples(trades):
+    # Each trade's PnL in units of its own stop distance, so the same sequence
+    # can be replayed at any risk percentage. Pips rather than dollars: lots
+    # are floored to 0.01 steps with a 0.01 minimum, so the dollars a trade
+    # actually risked can be far from balance * risk_pct on wide stops.
+    pnl = trades['PnL_pips'].to_numpy(dtype=np.float64)
+    stop = trades['sl_pips'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = pnl / stop
+    return r[np.isfinite(r)]
+
+
+def _simulate_block(r, risk_pcts, n_paths, n_trades, method, ruin_pct, seed):
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        samples = r[rng.integers(0, len(r), size=(n_paths, n_trades))]
+    elif method == 'permute':
+        samples = rng.permuted(np.broadcast_to(r, (n_paths, len(r))), axis=1)[:, :n_trades]
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    out = {}
+    for risk in risk_pcts:
+        # Fixed-fractional sizing compounds, so equity is a cumulative product
+        growth = np.maximum(1.0 + risk * samples, 0.0)
+        equity = np.cumprod(growth, axis=1)
+        peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+        out[risk] = {
+            'final_equity': equity[:, -1],
+            'max_drawdown_pct': ((peak - equity) / peak).max(axis=1),
+            'ruined': equity.min(axis=1) <= 1.0 - ruin_pct,
+        }
+    return out
+
+
+def _simulate_worker(job):
+    return _simulate_block(*job)
+
+
+# === Batched Resampling ===
+# Paths are simulated in blocks of CHUNK_PATHS as 2-D arrays (paths x trades).
+# Every block draws from its own child seed, so results for a given seed do
+# not depend on how many processes the blocks are spread over. All risk
+# levels reuse the same sampled sequences.
+def simulate(trades, risk_pcts=DEFAULT_RISK_PCTS, n_paths=N_PATHS, n_trades=None, method='bootstrap',
+             ruin_pct=RUIN_PCT, balance=ACCOUNT_BALANCE, seed=None, processes=1, chunk_paths=CHUNK_PATHS):
+    r = r_multiples(trades)
+    if len(r) == 0:
+        return {}
+    n_trades = len(r) if n_trades is None or method == 'permute' else n_trades
+
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(r, tuple(risk_pcts), size, n_trades, method, ruin_pct, child) for size, child in zip(sizes, seeds)]
+
+    if processes == 1:
+        blocks = [_simulate_worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            blocks = list(pool.map(_simulate_worker, jobs))
+
+    results = {}
+    for risk in risk_pcts:
+        results[risk] = {
+            'final_equity': np.concatenate([b[risk]['final_equity'] for b in blocks]) * balance,
+            'max_drawdown_pct': np.concatenate([b[risk]['max_drawdown_pct'] for b in blocks]),
+            'ruined': np.concatenate([b[risk]['ruined'] for b in blocks]),
+        }
+    return results
+
+
+def summarize(results, balance=ACCOUNT_BALANCE):
+    rows = []
+    for risk, dist in results.items():
+        final = dist['final_equity']
+        drawdown = dist['max_drawdown_pct']
+        rows.append({
+            'risk_pct': risk,
+            'risk_of_ruin': dist['ruined'].mean(),
+            'final_p05': np.percentile(final, 5),
+            'final_median': np.median(final),
+            'final_p95': np.percentile(final, 95),
+            'prob_loss': (final < balance).mean(),
+            'dd_median': np.median(drawdown),
+            'dd_p95': np.percentile(drawdown, 95),
+            'dd_p99': np.percentile(drawdown, 99),
+        })
+    return pd.DataFrame(rows)
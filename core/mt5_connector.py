@@ -1,29 +1,100 @@
 # core/mt5_connector.py
 
+import time
+from datetime import datetime, timedelta
+
 import MetaTrader5 as mt5
 import pandas as pd
 
+from core.bar_store import BarStore, TIMEFRAME_SECONDS
+from core.mt5_session import SESSION
+
+TIMEFRAMES = {
+    "M1": mt5.TIMEFRAME_M1,
+    "M30": mt5.TIMEFRAME_M30,
+    "H1": mt5.TIMEFRAME_H1,
+    "H4": mt5.TIMEFRAME_H4,
+    "D1": mt5.TIMEFRAME_D1
+}
+
+TICK_CHUNK = timedelta(days=1)  # copy_ticks_range request size during tick backfill
+
+# Extra history re-requested on each delta fetch; covers the broker's
+# server-time offset and refreshes the bar that was still forming.
+DELTA_MARGIN_SECONDS = 24 * 3600
+
+bar_store = BarStore()
+
 def connect_to_mt5():
-    if not mt5.initialize():
-        print("❌ MT5 initialization failed:", mt5.last_error())
-        return False
-    print("✅ Connected to MetaTrader 5")
-    return True
+    # Idempotent: the shared session initializes once and reconnects by itself
+    return SESSION.ensure()
 
-def get_data(symbol, timeframe, bars=1000):
-    tf_map = {
-        "M30": mt5.TIMEFRAME_M30,
-        "H1": mt5.TIMEFRAME_H1,
-        "H4": mt5.TIMEFRAME_H4,
-        "D1": mt5.TIMEFRAME_D1
-    }
+def fetch_rates(symbol, timeframe, bars):
+    return SESSION.call('copy_rates_from_pos', symbol, TIMEFRAMES[timeframe], 0, bars)
 
-    rates = mt5.copy_rates_from_pos(symbol, tf_map[timeframe], 0, bars)
+def sync_bars(symbol, timeframe, bars=1000):
+    # Fetch only what the local store is missing
+    last_time = bar_store.last_time(symbol, timeframe)
+    if last_time is None or bar_store.count(symbol, timeframe) < bars:
+        rates = fetch_rates(symbol, timeframe, bars)
+        if rates is not None and len(rates) > 0:
+            bar_store.merge(symbol, timeframe, rates)
+        return rates is not None and len(rates) > 0
 
+    elapsed = time.time() - last_time + DELTA_MARGIN_SECONDS
+    rates = fetch_rates(symbol, timeframe, int(elapsed // TIMEFRAME_SECONDS[timeframe]) + 2)
     if rates is None or len(rates) == 0:
+        return False
+
+    rates = rates[rates['time'] >= last_time]
+    if len(rates) and rates['time'][0] > last_time:
+        print(f"⚠️ Gap in stored {symbol} {timeframe} history after {pd.to_datetime(last_time, unit='s')}")
+    bar_store.append(symbol, timeframe, rates)
+    return True
+
+def get_data(symbol, timeframe, bars=1000, use_store=True):
+    if not use_store:
+        rates = fetch_rates(symbol, timeframe, bars)
+        if rates is None or len(rates) == 0:
+            print(f"⚠️ No data returned for {symbol} on {timeframe}")
+            return pd.DataFrame()
+        df = pd.DataFrame(rates)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df
+
+    if not sync_bars(symbol, timeframe, bars):
         print(f"⚠️ No data returned for {symbol} on {timeframe}")
-        return pd.DataFrame()
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df = bar_store.read(symbol, timeframe, bars)
+    if df.empty:
+        return pd.DataFrame()
     return df
+
+def backfill(symbol, timeframe, date_from, date_to=None):
+    # Bulk history download straight into the bar store
+    date_to = date_to or datetime.now() + timedelta(days=1)
+    rates = SESSION.call('copy_rates_range', symbol, TIMEFRAMES[timeframe], date_from, date_to)
+    if rates is None or len(rates) == 0:
+        print(f"⚠️ No history returned for {symbol} on {timeframe}: {mt5.last_error()}")
+        return 0
+    return bar_store.merge(symbol, timeframe, rates)
+
+def backfill_ticks(symbol, date_from, date_to=None):
+    # Day-sized requests appended to <store>/<symbol>/ticks.bin; resumes after the stored ticks
+    date_to = date_to or datetime.now() + timedelta(days=1)
+    stored = bar_store.load_ticks(symbol)
+    if len(stored):
+        date_from = max(date_from, datetime.utcfromtimestamp(int(stored['time'][-1])))
+    del stored
+
+    total = 0
+    start = date_from
+    while start < date_to:
+        end = min(start + TICK_CHUNK, date_to)
+        ticks = SESSION.call('copy_ticks_range', symbol, start, end, mt5.COPY_TICKS_ALL)
+        if ticks is not None and len(ticks) > 0:
+            total += bar_store.append_ticks(symbol, ticks)
+        start = end
+    if total == 0:
+        print(f"⚠️ No ticks returned for {symbol}: {mt5.last_error()}")
+    return total
@@ -0,0 +1,141 @@
+# core/mt5_session.py
+
+import threading
+import time
+from collections import namedtuple
+
+import MetaTrader5 as mt5
+
+HEALTH_CHECK_SECONDS = 30  # terminal_info() ping at most this often
+RECONNECT_BACKOFF_BASE = 1.0
+RECONNECT_BACKOFF_MAX = 60.0
+SYMBOL_CACHE_SECONDS = 3600  # symbol_info refresh interval
+
+# last_error() codes meaning the terminal IPC link is gone (not a bad request)
+IPC_ERRORS = range(-10005, -10000)
+
+# symbol_info().filling_mode bit flags (SYMBOL_FILLING_FOK / SYMBOL_FILLING_IOC)
+FILLING_FOK_FLAG = 1
+FILLING_IOC_FLAG = 2
+
+SymbolMeta = namedtuple('SymbolMeta', [
+    'symbol', 'point', 'digits', 'stops_level', 'freeze_level', 'volume_min', 'volume_max', 'volume_step',
+    'contract_size', 'filling_mode', 'execution_mode', 'loaded_at',
+])
+
+
+# === Shared Terminal Session ===
+# One initialize() for the whole process. Every terminal call goes through
+# call(), which holds a lock (the MT5 API is not thread-safe), pings the
+# terminal every HEALTH_CHECK_SECONDS and re-initializes with exponential
+# backoff when the link is lost. Symbol metadata is cached per symbol and
+# re-read after SYMBOL_CACHE_SECONDS, so an order only pays for order_send
+# plus the tick its stops are checked against.
+class MT5Session:
+    def __init__(self, health_interval=HEALTH_CHECK_SECONDS, backoff_base=RECONNECT_BACKOFF_BASE,
+                 backoff_max=RECONNECT_BACKOFF_MAX, cache_seconds=SYMBOL_CACHE_SECONDS, **initialize_kwargs):
+        self.health_interval = health_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache_seconds = cache_seconds
+        self.initialize_kwargs = initialize_kwargs  # path/login/password/server, if not the default terminal
+        self.lock = threading.RLock()
+        self.connected = False
+        self.reconnects = 0
+        self._failures = 0
+        self._next_attempt = 0.0
+        self._last_check = 0.0
+        self._symbols = {}
+
+    def connect(self):
+        with self.lock:
+            if mt5.initialize(**self.initialize_kwargs):
+                if self._failures or self.reconnects:
+                    print("✅ Reconnected to MetaTrader 5")
+                else:
+                    print("✅ Connected to MetaTrader 5")
+                self.connected = True
+                self._failures = 0
+                self._last_check = time.monotonic()
+                return True
+
+            self.connected = False
+            self._failures += 1
+            delay = min(self.backoff_base * 2 ** (self._failures - 1), self.backoff_max)
+            self._next_attempt = time.monotonic() + delay
+            print(f"❌ MT5 initialization failed: {mt5.last_error()} (next attempt in {delay:.0f}s)")
+            return False
+
+    def ensure(self):
+        # True when the terminal is usable; reconnects (respecting backoff) when not
+        with self.lock:
+            now = time.monotonic()
+            if self.connected and now - self._last_check < self.health_interval:
+                return True
+            if self.connected:
+                self._last_check = now
+                if mt5.terminal_info() is not None:
+                    return True
+                print(f"⚠️ Lost connection to MetaTrader 5: {mt5.last_error()}")
+                self.connected = False
+                self.reconnects += 1
+                mt5.shutdown()
+            if now < self._next_attempt:
+                return False
+            return self.connect()
+
+    def call(self, name, *args, **kwargs):
+        # mt5.<name>(*args, **kwargs) on a live session; None when unavailable
+        with self.lock:
+            if not self.ensure():
+                return None
+            result = getattr(mt5, name)(*args, **kwargs)
+            if result is None and mt5.last_error()[0] in IPC_ERRORS:
+                self._last_check = 0.0  # health-check before the next call
+            return result
+
+    def symbol(self, symbol):
+        # Cached SymbolMeta (None when the broker does not know the symbol)
+        meta = self._symbols.get(symbol)
+        if meta is not None and time.monotonic() - meta.loaded_at < self.cache_seconds:
+            return meta
+
+        with self.lock:
+            info = self.call('symbol_info', symbol)
+            if info is None:
+                print(f"⚠️ Symbol {symbol} not found.")
+                return None
+            if not info.visible:
+                self.call('symbol_select', symbol, True)
+            meta = SymbolMeta(
+                symbol=symbol, point=info.point, digits=info.digits, stops_level=info.trade_stops_level,
+                freeze_level=info.trade_freeze_level, volume_min=info.volume_min, volume_max=info.volume_max,
+                volume_step=info.volume_step, contract_size=info.trade_contract_size,
+                filling_mode=info.filling_mode, execution_mode=info.trade_exemode, loaded_at=time.monotonic(),
+            )
+            self._symbols[symbol] = meta
+            return meta
+
+    def invalidate(self, symbol=None):
+        if symbol is None:
+            self._symbols.clear()
+        else:
+            self._symbols.pop(symbol, None)
+
+    def shutdown(self):
+        with self.lock:
+            if self.connected:
+                mt5.shutdown()
+            self.connected = False
+
+
+def filling_type(meta):
+    # IOC when the symbol allows it (what orders always used), else FOK, else RETURN
+    if meta.filling_mode & FILLING_IOC_FLAG:
+        return mt5.ORDER_FILLING_IOC
+    if meta.filling_mode & FILLING_FOK_FLAG:
+        return mt5.ORDER_FILLING_FOK
+    return mt5.ORDER_FILLING_RETURN
+
+
+SESSION = MT5Session()
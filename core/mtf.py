@@ -0,0 +1,134 @@
+# core/mtf.py
+
+import numpy as np
+import pandas as pd
+
+from core.bar_store import TIMEFRAME_SECONDS
+from indicators.zones import SR_CLUSTER_TOLERANCE, SRLevelIndex, add_clustered_level, find_pivots
+
+
+def close_times(bars, timeframe):
+    # Bars are stamped with their open time; a bar is known once it closes
+    opened = bars['time'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return opened + TIMEFRAME_SECONDS[timeframe] * 1_000_000_000
+
+
+def asof_index(target_close, source_close):
+    # Last source bar closed at or before each target bar's close (-1: none yet)
+    return np.searchsorted(source_close, target_close, side='right') - 1
+
+
+# === Point-in-Time Alignment ===
+# merge_asof-style join of higher-timeframe columns onto lower-timeframe
+# bars: each target bar sees the values of the last source bar that had
+# closed by the time the target bar closed. Both frames are in time order.
+def align_asof(target_bars, target_tf, source_bars, source_tf, columns):
+    idx = asof_index(close_times(target_bars, target_tf), close_times(source_bars, source_tf))
+    known = idx >= 0
+    aligned = {}
+    for name in columns:
+        values = np.asarray(source_bars[name])
+        out = np.full(len(idx), np.nan) if values.dtype.kind in 'fiu' else np.full(len(idx), None, dtype=object)
+        out[known] = values[idx[known]]
+        aligned[name] = out
+    return pd.DataFrame(aligned, index=target_bars.index)
+
+
+def d1_bias(df_d1, df_h1, span=21):
+    # +1 / -1 when the last closed D1 bar was above / below its EMA, 0 before any
+    d1 = pd.DataFrame({'time': df_d1['time'],
+                       'bias': np.sign(df_d1['close'] - df_d1['close'].ewm(span=span).mean())})
+    bias = align_asof(df_h1, 'H1', d1, 'D1', ['bias'])['bias']
+    return bias.fillna(0).to_numpy(dtype=np.int8)
+
+
+# === Support/Resistance Timeline ===
+# Clustered SR levels in the order they became known. A pivot at H4 bar i is
+# confirmed when bar i + swing_window closes; levels are added in the same
+# order as cluster_levels(get_support_resistance(...)), so the timeline's
+# final state equals the whole-history levels. Lookups take the time at
+# which each price is evaluated and only use levels known by then.
+class SRTimeline:
+    def __init__(self, swing_window=5, timeframe='H4', tolerance=SR_CLUSTER_TOLERANCE):
+        self.swing_window = swing_window
+        self.timeframe = timeframe
+        self.tolerance = tolerance
+        self.levels = []
+        self.known_at = np.array([], dtype=np.int64)
+        self._kept = []
+        self._bars = pd.DataFrame(columns=['time', 'high', 'low'])
+        self._checked = swing_window
+        self._indexes = {}
+
+    def update(self, bars):
+        # Appends bars newer than the last one seen; returns True if levels were added
+        bars = bars[['time', 'high', 'low']]
+        if len(self._bars):
+            bars = bars[bars['time'] > self._bars['time'].iloc[-1]]
+        if bars.empty:
+            return False
+        self._bars = pd.concat([self._bars, bars], ignore_index=True) if len(self._bars) else bars.reset_index(drop=True)
+
+        w = self.swing_window
+        last = len(self._bars) - 1 - w  # newest bar with a full right-hand window
+        if last < self._checked:
+            return False
+        lo = self._checked - w
+        is_support, is_resistance = find_pivots(self._bars.iloc[lo:last + w + 1], w)
+        confirmed_at = close_times(self._bars, self.timeframe)
+
+        known_at = []
+        for k in np.flatnonzero(is_support | is_resistance):
+            i = lo + k
+            if i < self._checked:
+                continue
+            if is_support[k] and add_clustered_level(self.levels, self._kept, 'support', self._bars['low'].iat[i], self.tolerance):
+                known_at.append(confirmed_at[i + w])
+            if is_resistance[k] and add_clustered_level(self.levels, self._kept, 'resistance', self._bars['high'].iat[i], self.tolerance):
+                known_at.append(confirmed_at[i + w])
+        self._checked = last + 1
+
+        if not known_at:
+            return False
+        self.known_at = np.concatenate([self.known_at, np.asarray(known_at, dtype=np.int64)])
+        return True
+
+    @classmethod
+    def from_levels(cls, levels, known_at, swing_window=5, timeframe='H4'):
+        # Read-only snapshot (e.g. rebuilt from the feature store)
+        timeline = cls(swing_window, timeframe)
+        timeline.levels = list(levels)
+        timeline.known_at = np.asarray(known_at, dtype=np.int64)
+        return timeline
+
+    def version_at(self, times):
+        # Number of levels known at each time (levels[:version] is the set)
+        times = np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+        return np.searchsorted(self.known_at, times, side='right')
+
+    def index(self, version):
+        if version not in self._indexes:
+            self._indexes[version] = SRLevelIndex(self.levels[:version])
+        return self._indexes[version]
+
+    def _by_version(self, times, lookup, *arrays):
+        versions = self.version_at(times)
+        out = np.empty(len(versions))
+        if len(versions) == 0:
+            return out
+        order = np.argsort(versions, kind='stable')
+        sorted_versions = versions[order]
+        bounds = np.flatnonzero(np.r_[True, sorted_versions[1:] != sorted_versions[:-1], True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:end]
+            out[rows] = lookup(self.index(int(sorted_versions[start])), *(a[rows] for a in arrays))
+        return out
+
+    def nearest_dist(self, prices, times):
+        prices = np.asarray(prices, dtype=np.float64)
+        return self._by_version(times, SRLevelIndex.nearest_dist, prices)
+
+    def tp_levels(self, prices, is_long, times):
+        prices = np.asarray(prices, dtype=np.float64)
+        is_long = np.asarray(is_long, dtype=bool)
+        return self._by_version(times, SRLevelIndex.tp_levels, prices, is_long)
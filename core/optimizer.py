@@ -0,0 +1,149 @@
+# core/optimizer.py
+
+import itertools
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from core.signal_engine import (
+    atr_feature, build_features, score_signals,
+    SCORE_THRESHOLD, RETEST_TOLERANCE, FIB_TOLERANCE, SR_TOLERANCE
+)
+from core.backtest_engine import backtest_signals
+from core.bar_store import BAR_STORE_DIR, BarStore
+from core.exit_engine import build_price_tables, load_intrabar
+from core.analytics import trade_metrics
+from core.feature_store import FEATURE_STORE
+
+# === Search Space ===
+# Lists are sampled as choices; (low, high) tuples are sampled uniformly in random search.
+DEFAULT_GRID = {
+    'rr_ratio': [1.5, 2, 2.5, 3],
+    'stop_atr': [0.75, 1.0, 1.5, 2.0],
+    'score_threshold': [4, 5, 6],
+    'retest_tol': [0.002, 0.003, 0.005],
+    'fib_tol': [0.005, 0.01],
+    'sr_tol': [0.005, 0.01],
+}
+
+SIGNAL_DEFAULTS = {
+    'score_threshold': SCORE_THRESHOLD,
+    'retest_tol': RETEST_TOLERANCE,
+    'fib_tol': FIB_TOLERANCE,
+    'sr_tol': SR_TOLERANCE,
+}
+BACKTEST_DEFAULTS = {'rr_ratio': 2, 'stop_atr': 1.0}
+
+# Trade columns kept from every run for the portfolio-level metrics
+SWEEP_TRADE_COLUMNS = ['run_id', 'symbol', 'direction', 'exit_time', 'PnL_$', 'result']
+RUN_METRIC_COLUMNS = ['profit_factor', 'expectancy', 'max_drawdown', 'max_drawdown_pct', 'sharpe']
+
+
+def grid_params(grid=DEFAULT_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_params(space=DEFAULT_GRID, n_iter=50, seed=None):
+    rng = random.Random(seed)
+    param_sets = []
+    for _ in range(n_iter):
+        params = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                params[key] = rng.uniform(*values)
+            else:
+                params[key] = rng.choice(values)
+        param_sets.append(params)
+    return param_sets
+
+
+def summarize_trades(trades):
+    if trades.empty:
+        return {'trades': 0, 'wins': 0, 'pnl': 0.0, 'pnl_pips': 0.0}
+    return {
+        'trades': len(trades),
+        'wins': int((trades['result'] == 'win').sum()),
+        'pnl': float(trades['PnL_$'].sum()),
+        'pnl_pips': float(trades['PnL_pips'].sum()),
+    }
+
+
+# === Per-Symbol Worker ===
+# Bar features, the ATR series and the exit range tables are built once per
+# symbol; every parameter set only re-scores and re-resolves exits. SR levels
+# are point-in-time so the sweep does not rank on look-ahead. intrabar is
+# (source, point) to resolve exits on the stored ticks or M1 bars instead of
+# H1; the memmaps are opened in the worker rather than pickled into it.
+def sweep_symbol(symbol, h4, h1, param_sets, intrabar=None, store_dir=BAR_STORE_DIR):
+    features, sr_index = build_features(h4, h1, FEATURE_STORE, symbol, point_in_time=True)
+    atr_series = atr_feature(h1, FEATURE_STORE, symbol)  # store hit: the column build_features filtered on
+    price_tables = build_price_tables(h1['low'], h1['high'])
+    series = load_intrabar(BarStore(store_dir), symbol, *intrabar) if intrabar else None
+    if intrabar and series is None:
+        print(f"⚠️ No stored {intrabar[0]} for {symbol}; using H1 exits")
+
+    signal_cache = {}
+    rows = []
+    run_trades = []
+    for run_id, params in enumerate(param_sets):
+        signal_params = {k: params.get(k, v) for k, v in SIGNAL_DEFAULTS.items()}
+        backtest_params = {k: params.get(k, v) for k, v in BACKTEST_DEFAULTS.items()}
+
+        key = tuple(signal_params.values())
+        if key not in signal_cache:
+            signal_cache[key] = score_signals(features, sr_index, **signal_params)
+        signals = signal_cache[key]
+
+        trades = backtest_signals(
+            signals, h1, symbol, atr_series, price_tables=price_tables, intrabar=series, **backtest_params
+        )
+        rows.append({'run_id': run_id, 'symbol': symbol, **signal_params, **backtest_params,
+                     **summarize_trades(trades)})
+        run_trades.append(trades.assign(run_id=run_id)[SWEEP_TRADE_COLUMNS])
+    return rows, pd.concat(run_trades, ignore_index=True)
+
+
+def _sweep_worker(job):
+    return sweep_symbol(*job)
+
+
+# trades (all runs, all symbols) adds drawdown, profit factor, expectancy and
+# Sharpe of each run's combined equity curve, computed for every run at once.
+def rank_runs(per_symbol, rank_by='pnl', trades=None):
+    param_cols = list(SIGNAL_DEFAULTS) + list(BACKTEST_DEFAULTS)
+    ranked = per_symbol.groupby('run_id').agg(
+        {**{col: 'first' for col in param_cols}, 'trades': 'sum', 'wins': 'sum', 'pnl': 'sum', 'pnl_pips': 'sum'}
+    )
+    ranked['win_rate'] = (ranked['wins'] / ranked['trades']).where(ranked['trades'] > 0, 0.0)
+    ranked['symbols_positive'] = per_symbol[per_symbol['pnl'] > 0].groupby('run_id').size()
+    ranked['symbols_positive'] = ranked['symbols_positive'].fillna(0).astype(int)
+    if trades is not None:
+        ranked = ranked.join(trade_metrics(trades, by='run_id')[RUN_METRIC_COLUMNS])
+    return ranked.sort_values(rank_by, ascending=False).reset_index()
+
+
+# === Sweep Entry Point ===
+# data maps symbol -> (h4, h1) frames, loaded up front in the parent process
+# because the MT5 terminal connection cannot be shared with pool workers.
+# intrabar maps symbol -> (source, point) for intrabar exits (see sweep_symbol).
+def run_sweep(data, param_sets, processes=None, rank_by='pnl', intrabar=None, store_dir=BAR_STORE_DIR):
+    intrabar = intrabar or {}
+    jobs = [(symbol, h4, h1, param_sets, intrabar.get(symbol), store_dir) for symbol, (h4, h1) in data.items()]
+
+    if processes == 1:
+        results = [_sweep_worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_sweep_worker, jobs))
+
+    rows, trades = [], []
+    for symbol_rows, symbol_trades in results:
+        rows.extend(symbol_rows)
+        trades.append(symbol_trades)
+
+    per_symbol = pd.DataFrame(rows)
+    if per_symbol.empty:
+        return per_symbol, per_symbol
+    return rank_runs(per_symbol, rank_by, pd.concat(trades, ignore_index=True)), per_symbol
@@ -0,0 +1,297 @@
+# core/portfolio_risk.py
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from core.backtest_engine import ACCOUNT_BALANCE, RISK_PCT, pip_settings
+
+COV_WINDOW_BARS = 500  # returns kept per symbol (about a month of H1 bars)
+COV_MIN_PERIODS = 50  # shared returns needed before a pair's correlation counts
+COV_RESYNC_BARS = COV_WINDOW_BARS  # rebuild the running sums from the window this often
+MAX_TOTAL_RISK_PCT = 0.03  # risk at the stops across all open and new trades
+MAX_CORRELATED_RISK_PCT = 0.01  # risk at the stops that moves together with any one trade
+CORRELATION_THRESHOLD = 0.5  # pairs at or above this (same-way) count as one exposure
+MIN_LOT = 0.01
+LOT_STEP = 0.01
+
+DEFAULT_PIP = {'pip_size': 0.0001, 'pip_value': 10.0}
+
+# One array per field, aligned with the signals passed to PortfolioRisk.size
+Sizing = namedtuple('Sizing', ['base_lot', 'lot_size', 'risk', 'factor'])
+
+
+def _signs(directions):
+    directions = np.asarray(directions)
+    return np.where((directions == 'long') | (directions == 'buy'), 1.0, -1.0)
+
+
+def risk_per_lot(symbols, entry, stop):
+    # Account currency lost at the stop per 1.0 lot (same pip model as backtest_signals)
+    info = [pip_settings.get(s, DEFAULT_PIP) for s in symbols]
+    pip_size = np.array([i['pip_size'] for i in info], dtype=np.float64)
+    pip_value = np.array([i['pip_value'] for i in info], dtype=np.float64)
+    sl_pips = np.abs(np.asarray(entry, dtype=np.float64) - np.asarray(stop, dtype=np.float64)) / pip_size
+    return sl_pips * pip_value
+
+
+# === Rolling Covariance ===
+# Log returns of the whole universe, one row per bar, in a fixed window. The
+# pairwise sums (count, sum, sum of squares, cross products over the bars
+# both symbols traded) are updated with a few outer products per bar: add the
+# new row, subtract the one leaving the window. That is O(symbols^2) per bar
+# with no pass over the window, and a symbol missing a bar (NaN) just drops
+# out of its pairs for that row. The sums are rebuilt from the window every
+# COV_RESYNC_BARS to keep rounding from drifting.
+class RollingCovariance:
+    def __init__(self, symbols, window=COV_WINDOW_BARS, min_periods=COV_MIN_PERIODS, resync=COV_RESYNC_BARS):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.window = window
+        self.min_periods = min_periods
+        self.resync = resync
+        n = len(self.symbols)
+        self._returns = np.full((window, n), np.nan)
+        self._last_close = np.full(n, np.nan)
+        self._count = 0  # rows ever added
+        self._since_resync = 0
+        self._n = np.zeros((n, n))
+        self._sx = np.zeros((n, n))  # sum of x_i over rows where i and j both traded
+        self._sxx = np.zeros((n, n))
+        self._sxy = np.zeros((n, n))
+        self._corr = None  # cached until the next update
+
+    def __len__(self):
+        return min(self._count, self.window)
+
+    def _accumulate(self, row, sign):
+        present = ~np.isnan(row)
+        m = present.astype(np.float64)
+        x = np.where(present, row, 0.0)
+        self._n += sign * np.outer(m, m)
+        self._sx += sign * np.outer(x, m)
+        self._sxx += sign * np.outer(x * x, m)
+        self._sxy += sign * np.outer(x, x)
+
+    def _rebuild(self):
+        rows = self._returns[:len(self)]
+        m = (~np.isnan(rows)).astype(np.float64)
+        x = np.nan_to_num(rows)
+        self._n = m.T @ m
+        self._sx = x.T @ m
+        self._sxx = (x * x).T @ m
+        self._sxy = x.T @ x
+        self._since_resync = 0
+
+    def update(self, closes):
+        # closes: one price per symbol (universe order or a {symbol: close} dict), NaN = no new bar
+        if isinstance(closes, dict):
+            row = np.full(len(self.symbols), np.nan)
+            for symbol, close in closes.items():
+                if symbol in self.index:
+                    row[self.index[symbol]] = close
+            closes = row
+        closes = np.asarray(closes, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(closes / self._last_close)
+        self._last_close = np.where(np.isnan(closes), self._last_close, closes)
+
+        slot = self._count % self.window
+        if self._count >= self.window:
+            self._accumulate(self._returns[slot], -1.0)
+        self._returns[slot] = returns
+        self._accumulate(returns, 1.0)
+        self._count += 1
+        self._since_resync += 1
+        if self._since_resync >= self.resync:
+            self._rebuild()
+        self._corr = None
+
+    def covariance(self):
+        n = self._n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self._sxy - self._sx * self._sx.T / n) / (n - 1)
+        return np.where(n >= self.min_periods, cov, np.nan)
+
+    def correlation(self):
+        # Pairs without COV_MIN_PERIODS shared bars come back as 0 (1 on the diagonal)
+        if self._corr is None:
+            n = self._n
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = (self._sxy - self._sx * self._sx.T / n) / (n - 1)
+                var = (self._sxx - self._sx ** 2 / n) / (n - 1)  # x_i over the pair's rows
+                corr = cov / np.sqrt(var * var.T)
+            corr = np.where((n >= self.min_periods) & np.isfinite(corr), np.clip(corr, -1.0, 1.0), 0.0)
+            np.fill_diagonal(corr, 1.0)
+            self._corr = corr
+        return self._corr
+
+    def frame(self, kind='correlation'):
+        values = self.correlation() if kind == 'correlation' else self.covariance()
+        return pd.DataFrame(values, index=self.symbols, columns=self.symbols)
+
+
+# === Exposure Caps ===
+# Risk is money lost at the stop. Two trades count against each other when
+# they are correlated at or above CORRELATION_THRESHOLD in the same
+# direction (long/long on a positive pair, long/short on a negative one);
+# hedges get no credit. For each trade i the cap binds on
+#     open exposure_i + sum_j A_ij * new risk_j <= max correlated risk
+# and every trade in i's cluster is scaled by the same factor, so a cap is
+# shared pro rata instead of going to whichever signal came first. A trade's
+# final factor is the tightest of its clusters and of the total risk cap.
+def exposure_factors(corr, signs, risk, open_corr, open_signs, open_risk, correlated_cap, total_cap,
+                     threshold=CORRELATION_THRESHOLD):
+    # corr: new x new, open_corr: new x open; returns the scale factor (0..1) per new trade
+    same_way = corr * np.outer(signs, signs)
+    clusters = np.where(same_way >= threshold, same_way, 0.0)
+    open_same_way = open_corr * np.outer(signs, open_signs)
+    existing = np.where(open_same_way >= threshold, open_same_way, 0.0) @ open_risk
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        headroom = np.clip((correlated_cap - existing) / (clusters @ risk), 0.0, 1.0)
+        total = np.clip((total_cap - open_risk.sum()) / risk.sum(), 0.0, 1.0)
+    headroom = np.where(np.isnan(headroom), 1.0, headroom)
+    factors = np.where(clusters > 0, headroom[:, None], 1.0).min(axis=0)
+    return np.minimum(factors, 1.0 if np.isnan(total) else total)
+
+
+# === Portfolio Risk ===
+# Keeps the rolling correlation of the symbol universe and the risk of open
+# positions, and sizes a batch of simultaneous signals in one vectorized
+# pass: the usual fixed-fraction lot (RISK_PCT of the balance at the stop),
+# then scaled down under the total and correlated exposure caps. Lots are
+# floored to LOT_STEP; a trade the caps cut below MIN_LOT gets 0 (skip it).
+class PortfolioRisk:
+    def __init__(self, symbols, balance=ACCOUNT_BALANCE, risk_pct=RISK_PCT, max_total_risk=MAX_TOTAL_RISK_PCT,
+                 max_correlated_risk=MAX_CORRELATED_RISK_PCT, threshold=CORRELATION_THRESHOLD,
+                 window=COV_WINDOW_BARS, min_periods=COV_MIN_PERIODS, timeframe='H1'):
+        self.returns = RollingCovariance(symbols, window, min_periods)
+        self.balance = balance
+        self.risk_pct = risk_pct
+        self.max_total_risk = max_total_risk
+        self.max_correlated_risk = max_correlated_risk
+        self.threshold = threshold
+        self.timeframe = timeframe  # bar closes that feed the covariance
+        self.positions = {}  # key -> (symbol, sign, risk at the stop)
+        self._pending_time = None
+        self._pending = {}
+
+    # === Market Data ===
+    def update(self, closes):
+        self.returns.update(closes)
+
+    def on_bar_close(self, event):
+        # TickBarAggregator subscriber: one covariance row per bar time, once a newer bar shows up
+        if event.timeframe != self.timeframe or event.symbol not in self.returns.index:
+            return
+        if self._pending_time is not None and event.time > self._pending_time:
+            self.update(self._pending)
+            self._pending = {}
+        if self._pending_time is None or event.time >= self._pending_time:
+            self._pending_time = event.time
+            self._pending[event.symbol] = float(event.bar['close'])
+
+    # === Open Positions ===
+    def open_position(self, key, symbol, direction, risk):
+        self.positions[key] = (symbol, float(_signs([direction])[0]), float(risk))
+
+    def close_position(self, key):
+        self.positions.pop(key, None)
+
+    def on_position_event(self, event):
+        # PositionTracker callback (live_trading/position_tracker.py)
+        if event.kind == 'close':
+            self.close_position(event.ticket)
+            return
+        if event.sl:
+            risk = event.volume * risk_per_lot([event.symbol], [event.price_open], [event.sl])[0]
+        else:
+            risk = self.balance * self.risk_pct  # no stop: count it as one full-size trade
+        self.open_position(event.ticket, event.symbol, event.direction, risk)
+
+    def open_risk(self):
+        return sum(risk for _, _, risk in self.positions.values())
+
+    # === Sizing ===
+    def _corr(self, rows, cols):
+        # Correlation block; symbols outside the universe only correlate with themselves
+        corr = self.returns.correlation()
+        index = self.returns.index
+        r = np.array([index.get(s, -1) for s in rows], dtype=np.int64)
+        c = np.array([index.get(s, -1) for s in cols], dtype=np.int64)
+        block = corr[np.ix_(np.maximum(r, 0), np.maximum(c, 0))] if len(corr) else np.zeros((len(r), len(c)))
+        known = (r[:, None] >= 0) & (c[None, :] >= 0)
+        same = np.asarray(rows, dtype=object)[:, None] == np.asarray(cols, dtype=object)[None, :]
+        return np.where(known, block, same.astype(np.float64))
+
+    def size(self, symbols, directions, entry, stop):
+        # -> Sizing: base_lot, lot_size, risk (at the stop, after caps), factor
+        symbols = list(symbols)
+        signs = _signs(directions)
+        per_lot = risk_per_lot(symbols, entry, stop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raw_lot = self.balance * self.risk_pct / per_lot
+        base_lot = np.maximum(np.floor(np.nan_to_num(raw_lot) / LOT_STEP) * LOT_STEP, MIN_LOT)
+        base_risk = base_lot * per_lot
+
+        open_symbols = [s for s, _, _ in self.positions.values()]
+        open_signs = np.array([sign for _, sign, _ in self.positions.values()], dtype=np.float64)
+        open_risk = np.array([risk for _, _, risk in self.positions.values()], dtype=np.float64)
+        factors = exposure_factors(
+            self._corr(symbols, symbols), signs, base_risk, self._corr(symbols, open_symbols), open_signs, open_risk,
+            self.balance * self.max_correlated_risk, self.balance * self.max_total_risk, self.threshold,
+        )
+
+        scaled = np.floor(base_lot * factors / LOT_STEP + 1e-9) * LOT_STEP
+        lot_size = np.where(factors >= 1.0, base_lot, np.where(scaled >= MIN_LOT, scaled, 0.0))
+        lot_size = np.round(lot_size, 8)
+        return Sizing(base_lot, lot_size, lot_size * per_lot, factors)
+
+
+# === Portfolio Backtest ===
+# Re-sizes per-symbol backtest trades (backtest_signals output, concatenated)
+# as one book: closes are walked bar by bar, each bar's row updates the
+# covariance, trades that exited are released, and the trades entering on
+# that bar are sized together. PnL_$ is rescaled to the new lot; trades the
+# caps cut to zero are dropped.
+def size_portfolio(trades, closes, **kwargs):
+    # closes: wide frame of bar closes (index = bar time, one column per symbol)
+    if trades.empty:
+        return trades.assign(base_lot=pd.Series(dtype=np.float64), risk_factor=pd.Series(dtype=np.float64))
+    closes = closes.sort_index()
+    risk = PortfolioRisk(list(closes.columns), **kwargs)
+    trades = trades.reset_index(drop=True)
+    entries = trades.groupby('entry_time').indices
+    exit_time = trades['exit_time'].to_numpy()
+    symbols, directions = trades['symbol'].to_numpy(), trades['direction'].to_numpy()
+    entry, stop = trades['entry_price'].to_numpy(dtype=np.float64), trades['stop_loss'].to_numpy(dtype=np.float64)
+
+    base_lot = trades['lot_size'].to_numpy(dtype=np.float64).copy()
+    lot_size = base_lot.copy()
+    factor = np.ones(len(trades))
+    values = closes.to_numpy(dtype=np.float64)
+    for t, row in zip(closes.index, values):
+        risk.update(row)
+        if risk.positions:
+            for key in [k for k in risk.positions if exit_time[k] <= t]:
+                risk.close_position(key)
+        batch = entries.get(t)
+        if batch is None:
+            continue
+        sized = risk.size(symbols[batch], directions[batch], entry[batch], stop[batch])
+        base_lot[batch] = sized.base_lot
+        lot_size[batch] = sized.lot_size
+        factor[batch] = sized.factor
+        for key, symbol, direction, r in zip(batch, symbols[batch], directions[batch], sized.risk):
+            if r > 0:
+                risk.open_position(key, symbol, direction, r)
+
+    pip_value = np.array([pip_settings.get(s, DEFAULT_PIP)['pip_value'] for s in trades['symbol']])
+    sized = trades.assign(lot_size=lot_size, base_lot=base_lot, risk_factor=factor)
+    sized['PnL_$'] = np.round(sized['PnL_pips'].to_numpy(dtype=np.float64) * pip_value * lot_size, 2)
+    skipped = int((lot_size == 0).sum())
+    scaled = int(((factor < 1) & (lot_size > 0)).sum())
+    print(f"⚖️ Portfolio sizing: {scaled} trades scaled down, {skipped} skipped by exposure caps")
+    return sized[lot_size > 0].reset_index(drop=True)
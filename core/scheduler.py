@@ -0,0 +1,216 @@
+# core/scheduler.py
+
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+from core.bar_store import TIMEFRAME_SECONDS
+
+WEEK_SECONDS = 7 * 86400
+DAYS = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6}
+EPOCH = datetime(1970, 1, 1)
+
+SETTLE_SECONDS = 5  # wait after a bar close for the broker to publish it
+RETRY_SECONDS = 5  # re-check interval when the new bar is not there yet
+MAX_RETRIES = 12  # then give up until the next close
+
+
+def _at(day, hhmm):
+    hours, minutes = map(int, hhmm.split(':'))
+    return DAYS[day] * 86400 + hours * 3600 + minutes * 60
+
+
+def _subtract(windows, start, end):
+    out = []
+    for s, e in windows:
+        if e <= start or s >= end:
+            out.append((s, e))
+            continue
+        if s < start:
+            out.append((s, start))
+        if e > end:
+            out.append((end, e))
+    return out
+
+
+# === Trading Sessions ===
+# Weekly open windows in UTC, as [start, end) seconds from Monday 00:00. The
+# defaults below are deliberately a little wide: waking for a bar that never
+# prints only costs one cheap "no new bar" check, while missing a session
+# start would delay its first alert by a whole bar.
+class Session:
+    def __init__(self, windows):
+        self.windows = sorted((s, e) for s, e in windows if e > s)
+
+    @classmethod
+    def weekly(cls, open_at, close_at, daily_break=None):
+        start, end = _at(*open_at), _at(*close_at)
+        windows = [(start, end)] if start < end else [(start, WEEK_SECONDS), (0, end)]
+        if daily_break:
+            break_start, break_end = (_at('Mon', hhmm) for hhmm in daily_break)
+            if break_end <= break_start:
+                break_end += 86400
+            for day in range(-1, 7):
+                windows = _subtract(windows, day * 86400 + break_start, day * 86400 + break_end)
+        return cls(windows)
+
+    @classmethod
+    def always(cls):
+        return cls([(0, WEEK_SECONDS)])
+
+    @staticmethod
+    def _week_offset(t):
+        return t.weekday() * 86400 + t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+
+    def is_open(self, t):
+        offset = self._week_offset(t)
+        return any(s <= offset < e for s, e in self.windows)
+
+    def next_open(self, t):
+        # t itself when open, otherwise the start of the next window
+        offset = self._week_offset(t)
+        if any(s <= offset < e for s, e in self.windows):
+            return t
+        starts = [s for s, _ in self.windows if s > offset] or [self.windows[0][0] + WEEK_SECONDS]
+        return t + timedelta(seconds=starts[0] - offset)
+
+
+FX_SESSION = Session.weekly(('Sun', '21:00'), ('Fri', '22:00'))
+METALS_SESSION = Session.weekly(('Sun', '22:00'), ('Fri', '22:00'), daily_break=('21:00', '22:00'))
+INDEX_SESSION = Session.weekly(('Sun', '22:00'), ('Fri', '21:00'), daily_break=('21:00', '22:00'))
+CRYPTO_SESSION = Session.always()
+
+SYMBOL_SESSIONS = {
+    'XAUUSDm': METALS_SESSION,
+    'US500m': INDEX_SESSION,
+    'US30m': INDEX_SESSION,
+    'BTCUSDm': CRYPTO_SESSION,
+}
+
+
+def session_for(symbol, sessions=None):
+    sessions = SYMBOL_SESSIONS if sessions is None else sessions
+    return sessions.get(symbol, FX_SESSION)
+
+
+# === Bar-Close Scheduler ===
+# A heap of wake-ups: one per symbol at its next bar close (+ settle delay)
+# while its session is open, plus an independent price timer. wait() sleeps
+# on the clock until the earliest one and returns everything due. After a
+# symbol's scan the runner reports complete() (or retry() when the broker
+# has not published the bar yet), which schedules that symbol's next wake.
+# Fed with streamed bars (on_bar_close), a symbol is due as soon as its bar
+# closes; its timed wake-up then only serves as a fallback if ticks stall.
+class BarCloseScheduler:
+    def __init__(self, clock, symbols, timeframe='H1', price_interval=None, settle=SETTLE_SECONDS,
+                 retry_seconds=RETRY_SECONDS, max_retries=MAX_RETRIES, sessions=None, server_offset_hours=0):
+        self.clock = clock
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.period = TIMEFRAME_SECONDS[timeframe]
+        self.price_interval = price_interval
+        self.settle = timedelta(seconds=settle)
+        self.retry_seconds = timedelta(seconds=retry_seconds)
+        self.max_retries = max_retries
+        self.sessions = {symbol: session_for(symbol, sessions) for symbol in self.symbols}
+        self.server_offset = server_offset_hours * 3600  # bar boundaries are aligned in server time
+        self._events = []
+        self._seq = itertools.count()
+        self._retries = {}
+        self._last_bar = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = {}  # symbol -> close time of a streamed bar not yet handed out
+
+        # Scan everything once at start-up so the engines are warm
+        now = clock.now()
+        for symbol in self.symbols:
+            self._push(now, 'bar', symbol)
+        if price_interval:
+            self._push(self._next_price_time(now, immediate=True), 'prices', None)
+
+    def _push(self, when, kind, symbol):
+        heapq.heappush(self._events, (when, next(self._seq), kind, symbol))
+
+    def next_close(self, symbol, after):
+        # First bar close after `after` whose bar overlaps the symbol's session
+        session = self.sessions[symbol]
+        seconds = (after - EPOCH).total_seconds() + self.server_offset
+        close = (int(seconds // self.period) + 1) * self.period - self.server_offset
+        while True:
+            bar_close = EPOCH + timedelta(seconds=close)
+            opens = session.next_open(bar_close - timedelta(seconds=self.period))
+            if opens < bar_close:
+                return bar_close
+            seconds = (opens - EPOCH).total_seconds() + self.server_offset
+            close = (int(seconds // self.period) + 1) * self.period - self.server_offset
+
+    def _next_price_time(self, now, immediate=False):
+        when = now if immediate else now + timedelta(seconds=self.price_interval)
+        return min(session.next_open(when) for session in self.sessions.values())
+
+    def last_bar(self, symbol):
+        return self._last_bar.get(symbol)
+
+    def complete(self, symbol, bar_time=None):
+        if bar_time is not None:
+            self._last_bar[symbol] = bar_time
+        self._retries.pop(symbol, None)
+        self._push(self.next_close(symbol, self.clock.now()) + self.settle, 'bar', symbol)
+
+    def retry(self, symbol):
+        # Returns False once the retries are used up (next wake is then the following close)
+        tries = self._retries.get(symbol, 0) + 1
+        if tries > self.max_retries:
+            self.complete(symbol)
+            return False
+        self._retries[symbol] = tries
+        self._push(self.clock.now() + self.retry_seconds, 'bar', symbol)
+        return True
+
+    # === Streamed Bar Closes ===
+    def on_bar_close(self, event):
+        # BarClose subscriber (core/bar_aggregator.py); runs on the tick feed thread
+        if event.timeframe != self.timeframe or event.symbol not in self.sessions:
+            return
+        bar_close = event.time.to_pydatetime() + timedelta(seconds=self.period - self.server_offset)
+        with self._lock:
+            self._closed[event.symbol] = bar_close
+            self._wake.set()
+
+    def _take_closed(self):
+        # Symbols whose bar closed replace their queued timed wake-ups
+        with self._lock:
+            self._wake.clear()
+            closed, self._closed = self._closed, {}
+        if closed:
+            self._events = [e for e in self._events if not (e[2] == 'bar' and e[3] in closed)]
+            heapq.heapify(self._events)
+            for symbol in closed:
+                self._retries.pop(symbol, None)
+        return [('bar', symbol, planned) for symbol, planned in closed.items()]
+
+    def wait(self, until=None):
+        # -> [(kind, symbol, planned time)] due now; [] when `until` comes first
+        if not self._events and not self._wake.is_set():
+            return []
+        now = self.clock.now()
+        when = self._events[0][0] if self._events else now
+        if until is not None and when > until and not self._wake.is_set():
+            if until > now:
+                self.clock.sleep((until - now).total_seconds(), self._wake)
+            return self._take_closed()
+        if when > now and not self._wake.is_set():
+            kind, symbol = self._events[0][2:]
+            print(f"\n⏳ Sleeping until {when:%Y-%m-%d %H:%M:%S} ({symbol or kind})")
+            self.clock.sleep((when - now).total_seconds(), self._wake)
+            now = self.clock.now()
+
+        due = self._take_closed()
+        while self._events and self._events[0][0] <= now:
+            planned, _, kind, symbol = heapq.heappop(self._events)
+            due.append((kind, symbol, planned))
+            if kind == 'prices':
+                self._push(self._next_price_time(now), 'prices', None)
+        return due
@@ -1,11 +1,77 @@
 import pandas as pd
 import numpy as np
+from collections import deque
 
-def generate_signals(df_d1, df_h4, df_h1):
+from indicators.zones import SRLevelIndex, add_clustered_level, cluster_levels, get_support_resistance
+from core.feature_store import bars_key
+from core.mtf import SRTimeline, close_times
+
+# Entry thresholds (tunable through core/optimizer.py)
+SCORE_THRESHOLD = 5
+RETEST_TOLERANCE = 0.003
+FIB_TOLERANCE = 0.01
+SR_TOLERANCE = 0.01
+SR_WINDOW = 5
+ATR_WINDOW = 14
+
+# Threshold-free columns score_signals reads (what the feature store keeps)
+FEATURE_COLUMNS = [
+    'trend_up', 'trend_down', 'is_strong_body', 'CHOCH_long', 'CHOCH_short', 'MSS_long', 'MSS_short',
+    'retest_long_dist', 'retest_short_dist', 'fib_dist', 'sr_dist'
+]
+
+
+def atr_feature(df_h1, store=None, symbol=None):
+    # Simplified ATR shared by the volatility filter and the backtest SL distance;
+    # with a store, build_features caches it and the backtest reads it back
+    if store is None:
+        return df_h1['close'].rolling(ATR_WINDOW).std()
+    key = store.key(symbol, 'H1', df_h1, 'atr', (ATR_WINDOW,))
+    cols = store.get_or_compute(key, lambda: {'atr': df_h1['close'].rolling(ATR_WINDOW).std().to_numpy()})
+    return pd.Series(cols['atr'], index=df_h1.index, name='close')
+
+
+# point_in_time=True scores each H1 bar against only the H4 levels confirmed
+# by its close (no look-ahead; see core/mtf.py). The default keeps levels
+# from the whole H4 history, which is what SignalEngine reproduces live.
+def build_features(df_h4, df_h1, store=None, symbol=None, point_in_time=False):
+    if store is None:
+        return _build_features(df_h4, df_h1, point_in_time)
+
+    # Memoized per (symbol, H1 window, H4 window); see core/feature_store.py
+    atr = atr_feature(df_h1, store, symbol)
+
+    def compute():
+        df, sr_index = _build_features(df_h4, df_h1, point_in_time, atr)
+        columns = {name: df[name].to_numpy() for name in FEATURE_COLUMNS}
+        columns['kept'] = df_h1.index.isin(df.index)
+        columns['level_values'] = np.array([level for _, level in sr_index.levels], dtype=np.float64)
+        columns['level_is_support'] = np.array([t == 'support' for t, _ in sr_index.levels], dtype=bool)
+        if point_in_time:
+            columns['level_known_at'] = sr_index.known_at
+        return columns
+
+    key = store.key(symbol, 'H1', df_h1, 'signal_features', (*bars_key(df_h4), SR_WINDOW, point_in_time))
+    cols = store.get_or_compute(key, compute)
+
+    df = df_h1[cols.pop('kept')].copy()
+    levels = list(zip(np.where(cols.pop('level_is_support'), 'support', 'resistance').tolist(),
+                      cols.pop('level_values').tolist()))
+    if point_in_time:
+        sr_index = SRTimeline.from_levels(levels, cols.pop('level_known_at'), SR_WINDOW)
+        df['close_time'] = pd.to_datetime(close_times(df, 'H1'))
+    else:
+        sr_index = SRLevelIndex(levels)
+    for name, values in cols.items():
+        df[name] = values
+    return df, sr_index
+
+
+def _build_features(df_h4, df_h1, point_in_time=False, atr=None):
     df = df_h1.copy()
 
     # === ATR-Based Volatility Filter ===
-    df['atr'] = df['close'].rolling(14).std()
+    df['atr'] = atr_feature(df_h1) if atr is None else atr
     df = df[df['atr'] > df['atr'].rolling(50).mean()]
 
     # === EMA Trend Filter ===
@@ -37,51 +103,41 @@ def generate_signals(df_d1, df_h4, df_h1):
     df['MSS_long'] = df['high'] > df['last_hh'].shift(1)
     df['MSS_short'] = df['low'] < df['last_ll'].shift(1)
 
-    # === Retest Entry Logic ===
-    df['retest_long'] = (abs(df['low'] - df['last_hh']) / df['low'] < 0.003) & df['CHOCH_long']
-    df['retest_short'] = (abs(df['high'] - df['last_ll']) / df['high'] < 0.003) & df['CHOCH_short']
+    # === Retest Distances (tolerance applied in score_signals) ===
+    df['retest_long_dist'] = abs(df['low'] - df['last_hh']) / df['low']
+    df['retest_short_dist'] = abs(df['high'] - df['last_ll']) / df['high']
 
     # === Fibonacci Levels ===
     df['fib_high'] = df['high'].rolling(20).max()
     df['fib_low'] = df['low'].rolling(20).min()
     df['fib_50'] = df['fib_high'] - (df['fib_high'] - df['fib_low']) * 0.5
-    df['near_fib'] = abs(df['close'] - df['fib_50']) / df['close'] < 0.01
+    df['fib_dist'] = abs(df['close'] - df['fib_50']) / df['close']
 
     # === Support/Resistance from H4 ===
-    sr_levels = []
-    for i in range(5, len(df_h4) - 5):
-        low = df_h4['low']
-        high = df_h4['high']
-        if low[i] < low[i - 5:i].min() and low[i] < low[i + 1:i + 6].min():
-            sr_levels.append(('support', low[i]))
-        if high[i] > high[i - 5:i].max() and high[i] > high[i + 1:i + 6].max():
-            sr_levels.append(('resistance', high[i]))
-
-    # === Cluster SR Levels ===
-    clustered_levels = []
-    for zone_type, level in sr_levels:
-        if not any(abs(level - l) / l < 0.002 for _, l in clustered_levels):
-            clustered_levels.append((zone_type, level))
-
-    def is_near_sr(price):
-        return any(abs(price - level) / price < 0.01 for _, level in clustered_levels)
-
-    def get_tp_level(price, direction):
-        candidates = []
-        if direction == 'long':
-            candidates = [level for t, level in clustered_levels if t == 'resistance' and level > price]
-        elif direction == 'short':
-            candidates = [level for t, level in clustered_levels if t == 'support' and level < price]
-        if not candidates:
-            return np.nan
-        return min(candidates, key=lambda l: abs(l - price))
-
-    df['near_sr'] = df['close'].apply(is_near_sr)
+    if point_in_time:
+        sr_index = SRTimeline(SR_WINDOW)
+        sr_index.update(df_h4)
+        df['close_time'] = pd.to_datetime(close_times(df, 'H1'))
+        df['sr_dist'] = sr_index.nearest_dist(df['close'].to_numpy(), df['close_time'])
+    else:
+        sr_index = SRLevelIndex(cluster_levels(get_support_resistance(df_h4, SR_WINDOW)))
+        df['sr_dist'] = sr_index.nearest_dist(df['close'].to_numpy())
 
     # === Time Filter (IST 9:00 to 18:00 → UTC 3 to 12) ===
     # df['hour_utc'] = df['time'].dt.hour
     # df = df[(df['hour_utc'] >= 3) & (df['hour_utc'] <= 12)]
 
+    return df, sr_index
+
+
+def score_signals(df, sr_index, score_threshold=SCORE_THRESHOLD, retest_tol=RETEST_TOLERANCE,
+                  fib_tol=FIB_TOLERANCE, sr_tol=SR_TOLERANCE):
+    df = df.copy()
+    df['retest_long'] = (df['retest_long_dist'] < retest_tol) & df['CHOCH_long']
+    df['retest_short'] = (df['retest_short_dist'] < retest_tol) & df['CHOCH_short']
+    df['near_fib'] = df['fib_dist'] < fib_tol
+    df['near_sr'] = df['sr_dist'] < sr_tol
+
     # === Confluence Scoring ===
     df['score_long'] = (
         df['trend_up'].astype(int) +
@@ -103,16 +159,304 @@ def generate_signals(df_d1, df_h4, df_h1):
     )
 
     # === Entry Criteria ===
-    df['long_entry'] = df['score_long'] >= 5
-    df['short_entry'] = df['score_short'] >= 5
+    df['long_entry'] = df['score_long'] >= score_threshold
+    df['short_entry'] = df['score_short'] >= score_threshold
 
     # === Final Signal Extraction ===
     signals = df[df['long_entry'] | df['short_entry']].copy()
     signals['direction'] = np.where(signals['long_entry'], 'long', 'short')
-    signals['tp_level'] = signals.apply(lambda x: get_tp_level(x['close'], x['direction']), axis=1)
+    close, is_long = signals['close'].to_numpy(), signals['long_entry'].to_numpy()
+    if 'close_time' in signals:  # point-in-time levels: TP from the levels known at the signal bar
+        signals['tp_level'] = sr_index.tp_levels(close, is_long, signals['close_time'])
+    else:
+        signals['tp_level'] = sr_index.tp_levels(close, is_long)
 
     return signals[['time', 'close', 'direction', 'tp_level']]
 
 
+def generate_signals(df_d1, df_h4, df_h1, store=None, symbol=None, point_in_time=False, **params):
+    df, sr_index = build_features(df_h4, df_h1, store, symbol, point_in_time)
+    return score_signals(df, sr_index, **params)
+
+
+# === Incremental Signal Engine ===
+# Streaming counterpart of generate_signals for the live loop. Each new H1 bar
+# advances the ATR filter, EMA21 and fib range in O(1), and only the bar that
+# just gained its 5 right-hand neighbours is checked for a swing high/low.
+# The newest H1/H4 bar is treated as still forming: it is rolled back and
+# re-applied when the next update brings a bar with the same timestamp.
+# Signals match generate_signals run over every bar fed to the engine.
+ATR_PERIOD = 14
+ATR_MEAN_PERIOD = 50
+EMA_SPAN = 21
+FIB_PERIOD = 20
+SWING_LOOKBACK = 5
+
+ROW_FIELDS = ('label', 'time', 'open', 'high', 'low', 'close', 'atr', 'ema21', 'fib_dist', 'sr_dist',
+              'last_hh', 'last_ll')
+TAIL_FIELDS = ('last_hh', 'last_ll')
+
+
+class SignalEngine:
+    def __init__(self, score_threshold=SCORE_THRESHOLD, retest_tol=RETEST_TOLERANCE,
+                 fib_tol=FIB_TOLERANCE, sr_tol=SR_TOLERANCE):
+        self.score_threshold = score_threshold
+        self.retest_tol = retest_tol
+        self.fib_tol = fib_tol
+        self.sr_tol = sr_tol
+
+        # Raw H1 state (ATR filter)
+        self._closes = deque(maxlen=ATR_PERIOD)
+        self._atrs = deque(maxlen=ATR_MEAN_PERIOD)
+        self._raw_count = 0
+        self._committed_time = None
+
+        # Rows that passed the ATR filter
+        self._rows = {field: [] for field in ROW_FIELDS}
+        self._ema = None
+        self._fib_highs = deque(maxlen=FIB_PERIOD)
+        self._fib_lows = deque(maxlen=FIB_PERIOD)
+        self._signals = {}
+        self._checkpoint = None
+
+        # H4 support/resistance state
+        self._h4_time = []
+        self._h4_high = []
+        self._h4_low = []
+        self._h4_checked = SR_WINDOW
+        self._confirmed_levels = []
+        self._confirmed_kept = []
+        self.levels = []
+        self._sr_index = SRLevelIndex([])
+
+    # === Public API ===
+    def update(self, h1_bars, h4_bars=None):
+        self._rollback()
+        touched = len(self._rows['close'])
+
+        if h4_bars is not None and self._update_h4(h4_bars):
+            self._refresh_sr()
+            touched = 0
+
+        bars = list(zip(*_columns_after(h1_bars, self._committed_time, ('open', 'high', 'low', 'close'))))
+        if not bars:
+            return self._frame(touched)
+
+        start = len(self._rows['close'])
+        for bar in bars[:-1]:
+            start = min(start, self._apply_bar(bar))
+        self._score_rows(start)
+        touched = min(touched, start)
+        self._committed_time = bars[-2][0] if len(bars) > 1 else self._committed_time
+
+        # Newest bar may still be forming: keep enough state to undo it
+        self._save_checkpoint()
+        start = self._apply_bar(bars[-1])
+        self._score_rows(start)
+        touched = min(touched, start)
+        return self._frame(touched)
+
+    def signals(self):
+        return self._frame(0)
+
+    def latest_signal(self):
+        if not self._signals:
+            return None
+        # atr is the signal bar's ATR, which live orders size their stop from
+        label, time_, close, direction, tp_level, atr = self._signals[max(self._signals)]
+        return pd.Series({'time': pd.Timestamp(time_), 'close': close, 'direction': direction, 'tp_level': tp_level,
+                          'atr': atr}, name=label)
+
+    # === H1 Bar Processing ===
+    def _apply_bar(self, bar):
+        time_, open_, high, low, close = bar
+        label = self._raw_count
+        self._raw_count += 1
+
+        self._closes.append(close)
+        self._atrs.append(_sample_std(self._closes) if len(self._closes) == ATR_PERIOD else np.nan)
+        n = len(self._rows['close'])
+        if len(self._atrs) < ATR_MEAN_PERIOD or not self._atrs[-1] > sum(self._atrs) / ATR_MEAN_PERIOD:
+            return n
+
+        # EMA21 with pandas' adjusted ewm recursion
+        if self._ema is None:
+            self._ema = (close, 1.0)
+        else:
+            weighted, old_wt = self._ema
+            old_wt *= 1.0 - 1.0 / (1.0 + (EMA_SPAN - 1) / 2.0)
+            if weighted != close:
+                weighted = (old_wt * weighted + close) / (old_wt + 1.0)
+            self._ema = (weighted, old_wt + 1.0)
+
+        self._fib_highs.append(high)
+        self._fib_lows.append(low)
+        if len(self._fib_highs) == FIB_PERIOD:
+            fib_high, fib_low = max(self._fib_highs), min(self._fib_lows)
+            fib_50 = fib_high - (fib_high - fib_low) * 0.5
+            fib_dist = abs(close - fib_50) / close
+        else:
+            fib_dist = np.nan
+
+        rows = self._rows
+        row = {
+            'label': label, 'time': time_, 'open': open_, 'high': high, 'low': low, 'close': close,
+            'atr': self._atrs[-1], 'ema21': self._ema[0], 'fib_dist': fib_dist,
+            'sr_dist': float(self._sr_index.nearest_dist([close])[0]),
+            'last_hh': rows['last_hh'][-1] if n else np.nan,
+            'last_ll': rows['last_ll'][-1] if n else np.nan,
+        }
+        for field in ROW_FIELDS:
+            rows[field].append(row[field])
+
+        # Swing at n - 5 now has its right-hand neighbours
+        start = n
+        i = n - SWING_LOOKBACK
+        if i >= SWING_LOOKBACK:
+            highs, lows = rows['high'], rows['low']
+            h = highs[i]
+            if h > highs[i - 1] and h > highs[i + 1] and h > highs[i - SWING_LOOKBACK] and h > highs[i + SWING_LOOKBACK]:
+                rows['last_hh'][i:] = [h] * (n + 1 - i)
+                start = i
+            l = lows[i]
+            if l < lows[i - 1] and l < lows[i + 1] and l < lows[i - SWING_LOOKBACK] and l < lows[i + SWING_LOOKBACK]:
+                rows['last_ll'][i:] = [l] * (n + 1 - i)
+                start = i
+        return start
+
+    def _score_rows(self, start):
+        rows = self._rows
+        n = len(rows['close'])
+        if start >= n:
+            return
+        lo = max(start - 1, 0)
+
+        def col(field):
+            return np.asarray(rows[field][lo:n], dtype=np.float64)
+
+        close, high, low, ema = col('close'), col('high'), col('low'), col('ema21')
+        last_hh, last_ll = col('last_hh'), col('last_ll')
+        prev_hh = np.concatenate(([np.nan], last_hh[:-1]))
+        prev_ll = np.concatenate(([np.nan], last_ll[:-1]))
+
+        strong = np.abs(close - np.asarray(rows['open'][lo:n], dtype=np.float64)) > 0.5 * (high - low)
+        choch_long, choch_short = close > prev_hh, close < prev_ll
+        near_fib = col('fib_dist') < self.fib_tol
+        near_sr = col('sr_dist') < self.sr_tol
+        with np.errstate(invalid='ignore'):
+            retest_long = (np.abs(low - last_hh) / low < self.retest_tol) & choch_long
+            retest_short = (np.abs(high - last_ll) / high < self.retest_tol) & choch_short
+
+        score_long = ((close > ema).astype(int) + strong + choch_long + (high > prev_hh) +
+                      retest_long + near_fib + near_sr)
+        score_short = ((close < ema).astype(int) + strong + choch_short + (low < prev_ll) +
+                       retest_short + near_fib + near_sr)
+        long_entry = score_long >= self.score_threshold
+        short_entry = score_short >= self.score_threshold
+
+        for k in range(start - lo, n - lo):
+            pos = lo + k
+            if long_entry[k] or short_entry[k]:
+                direction = 'long' if long_entry[k] else 'short'
+                self._signals[pos] = (rows['label'][pos], rows['time'][pos], rows['close'][pos], direction,
+                                      float(self._sr_index.tp_levels([rows['close'][pos]], [direction == 'long'])[0]),
+                                      rows['atr'][pos])
+            else:
+                self._signals.pop(pos, None)
+
+    def _save_checkpoint(self):
+        n = len(self._rows['close'])
+        tail = max(n - SWING_LOOKBACK - 1, 0)
+        self._checkpoint = {
+            'n': n,
+            'tail': tail,
+            'tail_rows': {field: self._rows[field][tail:] for field in TAIL_FIELDS},
+            'signals': {pos: sig for pos, sig in self._signals.items() if pos >= tail},
+            'closes': list(self._closes),
+            'atrs': list(self._atrs),
+            'fib_highs': list(self._fib_highs),
+            'fib_lows': list(self._fib_lows),
+            'ema': self._ema,
+            'raw_count': self._raw_count,
+        }
+
+    def _rollback(self):
+        cp = self._checkpoint
+        if cp is None:
+            return
+        n, tail = cp['n'], cp['tail']
+        for field in ROW_FIELDS:
+            del self._rows[field][n:]
+        for field in TAIL_FIELDS:
+            self._rows[field][tail:] = cp['tail_rows'][field]
+        for pos in [pos for pos in self._signals if pos >= tail]:
+            del self._signals[pos]
+        self._signals.update(cp['signals'])
+        self._closes = deque(cp['closes'], maxlen=ATR_PERIOD)
+        self._atrs = deque(cp['atrs'], maxlen=ATR_MEAN_PERIOD)
+        self._fib_highs = deque(cp['fib_highs'], maxlen=FIB_PERIOD)
+        self._fib_lows = deque(cp['fib_lows'], maxlen=FIB_PERIOD)
+        self._ema = cp['ema']
+        self._raw_count = cp['raw_count']
+        self._checkpoint = None
+
+    # === H4 Support/Resistance ===
+    def _update_h4(self, h4_bars):
+        last_time = self._h4_time[-1] if self._h4_time else None
+        for time_, high, low in zip(*_columns_after(h4_bars, last_time, ('high', 'low'), inclusive=True)):
+            if self._h4_time and time_ == self._h4_time[-1]:
+                self._h4_high[-1], self._h4_low[-1] = high, low
+            else:
+                self._h4_time.append(time_)
+                self._h4_high.append(high)
+                self._h4_low.append(low)
+
+        # Pivots whose right-hand window excludes the (possibly forming) last bar are final
+        last = len(self._h4_time) - 1
+        while self._h4_checked + SR_WINDOW < last:
+            self._add_pivot(self._confirmed_levels, self._confirmed_kept, self._h4_checked)
+            self._h4_checked += 1
+
+        levels = list(self._confirmed_levels)
+        if self._h4_checked + SR_WINDOW == last:
+            self._add_pivot(levels, list(self._confirmed_kept), self._h4_checked)
+
+        if levels == self.levels:
+            return False
+        self.levels = levels
+        self._sr_index = SRLevelIndex(levels)
+        return True
+
+    def _add_pivot(self, levels, kept, i):
+        lows, highs = self._h4_low, self._h4_high
+        if lows[i] < min(lows[i - SR_WINDOW:i]) and lows[i] < min(lows[i + 1:i + 1 + SR_WINDOW]):
+            add_clustered_level(levels, kept, 'support', lows[i])
+        if highs[i] > max(highs[i - SR_WINDOW:i]) and highs[i] > max(highs[i + 1:i + 1 + SR_WINDOW]):
+            add_clustered_level(levels, kept, 'resistance', highs[i])
+
+    def _refresh_sr(self):
+        self._rows['sr_dist'] = self._sr_index.nearest_dist(self._rows['close']).tolist()
+        self._score_rows(0)
+
+    def _frame(self, start):
+        rows = [self._signals[pos] for pos in sorted(pos for pos in self._signals if pos >= start)]
+        return pd.DataFrame(
+            {'time': np.array([row[1] for row in rows], dtype='datetime64[ns]'),
+             'close': np.array([row[2] for row in rows], dtype=np.float64),
+             'direction': np.array([row[3] for row in rows], dtype=object),
+             'tp_level': np.array([row[4] for row in rows], dtype=np.float64)},
+            index=np.array([row[0] for row in rows], dtype=np.int64)
+        )
+
+
+def _columns_after(bars, after, fields, inclusive=False):
+    # Only the rows past the last seen timestamp are pulled out of the frame
+    times = bars['time'].to_numpy()
+    start = 0 if after is None else int(np.searchsorted(times, after, side='left' if inclusive else 'right'))
+    return ([list(times[start:].astype('datetime64[ns]'))] +
+            [bars[field].to_numpy()[start:].astype(np.float64).tolist() for field in fields])
 
 
+def _sample_std(values):
+    mean = sum(values) / len(values)
+    return (sum((v - mean) ** 2 for v in values) / (len(values) - 1)) ** 0.5
@@ -0,0 +1,4 @@
+# core/symbols.py
+
+# Broker-corrected symbols used for research runs (main.py, optimize.py)
+RESEARCH_SYMBOLS = ['XAUUSDm', 'US500m', 'USDJPYm', 'GBPUSDm', 'GBPJPYm', 'USDCHFm', 'AUDUSDm', 'EURJPYm', 'BTCUSDm', 'US30m', 'EURUSDm']
@@ -0,0 +1,49 @@
+# core/synthetic.py
+
+import numpy as np
+import pandas as pd
+
+from core.bar_store import TIMEFRAME_SECONDS
+
+SYNTHETIC_START = '2020-01-06'  # a Monday
+START_PRICE = 1800.0
+VOLATILITY = 0.002  # stdev of per-bar log returns
+
+
+# === Synthetic OHLCV ===
+# Deterministic geometric random walk with MT5-shaped columns, so the signal,
+# backtest and benchmark code can run without a terminal. The same (n, seed)
+# always gives the same bars.
+def synthetic_bars(n, timeframe='H1', seed=0, start=SYNTHETIC_START, start_price=START_PRICE,
+                   volatility=VOLATILITY):
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    open_ = np.r_[start_price, close[:-1]]
+    wick = np.abs(rng.normal(0, 0.75 * volatility, n)) * close
+    high = np.maximum(open_, close) + wick * rng.random(n)
+    low = np.minimum(open_, close) - wick * rng.random(n)
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=n, freq=pd.Timedelta(seconds=TIMEFRAME_SECONDS[timeframe])),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'tick_volume': rng.integers(1, 1000, n).astype(np.uint64),
+        'spread': rng.integers(5, 40, n).astype(np.int32),
+        'real_volume': np.zeros(n, dtype=np.uint64),
+    })
+
+
+def resample_bars(bars, timeframe):
+    # Higher-timeframe bars built from lower-timeframe ones (consistent OHLC)
+    bucket = bars['time'].dt.floor(pd.Timedelta(seconds=TIMEFRAME_SECONDS[timeframe]))
+    grouped = bars.groupby(bucket, sort=True)
+    out = grouped.agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'), close=('close', 'last'),
+                      tick_volume=('tick_volume', 'sum'), spread=('spread', 'max'), real_volume=('real_volume', 'sum'))
+    return out.rename_axis('time').reset_index()
+
+
+def synthetic_mtf(n_h1, seed=0, **kwargs):
+    # (d1, h4, h1) frames describing the same synthetic price path
+    h1 = synthetic_bars(n_h1, 'H1', seed, **kwargs)
+    return resample_bars(h1, 'D1'), resample_bars(h1, 'H4'), h1
@@ -0,0 +1,278 @@
+# core/telegram_notifier.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+MAX_MESSAGE_LENGTH = 4096
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Telegram allows roughly one message per second per chat and 20 per minute
+# in groups; staying under both avoids 429s in the first place.
+MIN_SEND_INTERVAL = 1.0
+MAX_PER_MINUTE = 20
+
+_STOP = object()
+
+
+class _Coalesced:
+    def __init__(self, key):
+        self.key = key
+
+
+# === Background Notifier ===
+# send() only enqueues, so the trading loop never waits on the network. A
+# worker thread drains the queue, joins queued alerts into as few messages
+# as the length limit allows, and posts them over one pooled session with
+# timeouts, retry/backoff and rate limiting. A batch Telegram cannot parse
+# is resent alert by alert, with plain text for any alert that still fails,
+# and oversized messages are split on line boundaries. Messages sent with a
+# key (e.g. live prices) replace any still-pending message with the same key.
+class TelegramNotifier:
+    def __init__(self, token, chat_id, api_url=TELEGRAM_API_URL, parse_mode='Markdown',
+                 min_interval=MIN_SEND_INTERVAL, max_per_minute=MAX_PER_MINUTE,
+                 max_retries=MAX_RETRIES, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), metrics=None):
+        self.enabled = bool(token and chat_id)
+        self.chat_id = chat_id
+        self.url = f"{api_url}/bot{token}/sendMessage"
+        self.parse_mode = parse_mode
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self.metrics = metrics  # optional core.metrics.Metrics
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._queue = queue.Queue()
+        self._coalesced = {}
+        self._lock = threading.Lock()
+        self._carry = None
+        self._taken = 0
+        self._sent_times = deque()
+        self._thread = threading.Thread(target=self._run, name='telegram-notifier', daemon=True)
+        if self.enabled:
+            self._thread.start()
+
+    # === Public API ===
+    def send(self, message, key=None):
+        if not self.enabled:
+            return
+        if key is None:
+            self._queue.put(message)
+        else:
+            with self._lock:
+                fresh = key not in self._coalesced
+                self._coalesced[key] = message
+            if fresh:
+                self._queue.put(_Coalesced(key))
+        self._record_depth()
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.enabled and self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=10):
+        if self.enabled and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self.session.close()
+
+    # === Worker ===
+    def _run(self):
+        while True:
+            item = self._carry if self._carry is not None else self._queue.get()
+            self._carry = None
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            # Every item taken off the queue is marked done, even when the
+            # batch fails, so flush() cannot wait on a dead worker
+            self._taken = 1
+            try:
+                batch = self._next_batch(item)
+                self._deliver(batch)
+                self._record_depth()
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Telegram notifier error: {type(e).__name__}: {e}")
+            finally:
+                for _ in range(self._taken):
+                    self._queue.task_done()
+
+    def _record_depth(self):
+        if self.metrics is not None:
+            self.metrics.set('telegram_queue_depth', self._queue.qsize())
+
+    def _record(self, status, elapsed=None):
+        if self.metrics is None:
+            return
+        if elapsed is not None:
+            self.metrics.observe('telegram_post_seconds', elapsed)
+        self.metrics.inc('telegram_messages_total', status=status)
+
+    def _resolve(self, item):
+        if isinstance(item, _Coalesced):
+            with self._lock:
+                return self._coalesced.pop(item.key)
+        return item
+
+    def _next_batch(self, first):
+        # Texts that joined fit one message (unless the first alone does not);
+        # self._taken counts the queue items they came from
+        texts = [self._resolve(first)]
+        size = len(texts[0])
+        while size < MAX_MESSAGE_LENGTH:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._carry = item
+                break
+            self._taken += 1
+            next_text = self._resolve(item)
+            if size + 2 + len(next_text) > MAX_MESSAGE_LENGTH:
+                # Send it on its own next round; it is still counted as pending
+                self._carry = next_text
+                self._taken -= 1
+                break
+            texts.append(next_text)
+            size += 2 + len(next_text)
+        return texts
+
+    def _deliver(self, texts):
+        # One message for the batch; when Telegram cannot parse its Markdown,
+        # each alert goes again on its own so one stray '_' or '*' only costs
+        # that alert its formatting instead of dropping the whole batch
+        status = self._send_text("\n\n".join(texts), self.parse_mode)
+        if status != 'parse_error':
+            return
+        for text in texts:
+            if len(texts) == 1 or self._send_text(text, self.parse_mode) == 'parse_error':
+                self._send_text(text, None)
+
+    def _send_text(self, text, parse_mode):
+        status = 'sent'
+        for chunk in _split_message(text):
+            chunk_status = self._post(chunk, parse_mode)
+            if chunk_status != 'sent':
+                status = chunk_status
+        return status
+
+    def _throttle(self):
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] >= 60:
+            self._sent_times.popleft()
+        wait = 0.0
+        if self._sent_times:
+            wait = max(wait, self._sent_times[-1] + self.min_interval - now)
+        if len(self._sent_times) >= self.max_per_minute:
+            wait = max(wait, self._sent_times[0] + 60 - now)
+        if wait > 0:
+            time.sleep(wait)
+        self._sent_times.append(time.monotonic())
+
+    def _post(self, text, parse_mode=None):
+        # -> 'sent', 'parse_error' or 'failed'
+        payload = {'chat_id': self.chat_id, 'text': text}
+        if parse_mode:
+            payload['parse_mode'] = parse_mode
+        for attempt in range(self.max_retries + 1):
+            self._throttle()
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                # The exception text embeds the request URL, which contains the bot token
+                self._record('exception', time.perf_counter() - start)
+                print(f"❌ Telegram exception: {type(e).__name__}")
+            else:
+                elapsed = time.perf_counter() - start
+                if response.status_code == 200:
+                    self.sent += 1
+                    self._record('sent', elapsed)
+                    print("✅ Telegram message sent.")
+                    return 'sent'
+                if response.status_code == 429:
+                    self._record('rate_limited', elapsed)
+                    delay = _retry_after(response, delay)
+                elif response.status_code < 500:
+                    if parse_mode and _is_parse_error(response):
+                        self._record('parse_error', elapsed)
+                        print(f"⚠️ Telegram could not parse the {parse_mode} entities")
+                        return 'parse_error'
+                    self.failed += 1
+                    self._record('rejected', elapsed)
+                    print(f"❌ Telegram error: {response.text}")
+                    return 'failed'
+                else:
+                    self._record('server_error', elapsed)
+                print(f"⚠️ Telegram returned {response.status_code}, retrying in {delay:.1f}s")
+            if attempt < self.max_retries:
+                time.sleep(delay)
+
+        self.failed += 1
+        self._record('dropped')
+        print(f"❌ Telegram message dropped after {self.max_retries + 1} attempts")
+        return 'failed'
+
+
+def _split_message(text, limit=MAX_MESSAGE_LENGTH):
+    # Chunks of whole lines, so a cut never lands inside a Markdown entity;
+    # only a single line longer than the limit is sliced
+    if len(text) <= limit:
+        return [text]
+    chunks, current = [], ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _is_parse_error(response):
+    if response.status_code != 400:
+        return False
+    try:
+        description = response.json().get('description', '')
+    except (ValueError, AttributeError):
+        description = response.text
+    return 'parse' in str(description).lower()
+
+
+def _retry_after(response, default):
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        return default
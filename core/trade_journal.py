@@ -0,0 +1,244 @@
+# core/trade_journal.py
+
+import atexit
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+BACKTEST_JOURNAL_DIR = "reports/trade_journal"
+LIVE_JOURNAL_DIR = "logs/trade_journal"
+MANIFEST_FILE = "manifest.json"
+FLUSH_ROWS = 500
+FLUSH_INTERVAL = 5.0  # seconds between background flushes
+
+# One schema for live and backtest trades. Strings are fixed-width so every
+# column is a plain numpy array; open live trades have NaT/NaN exit fields.
+JOURNAL_SCHEMA = {
+    'source': 'U8',           # 'live' or 'backtest'
+    'run_id': 'U32',
+    'symbol': 'U16',
+    'direction': 'U5',        # 'long' or 'short'
+    'entry_time': 'datetime64[ns]',
+    'exit_time': 'datetime64[ns]',
+    'entry_price': 'float64',
+    'stop_loss': 'float64',
+    'take_profit': 'float64',
+    'exit_price': 'float64',
+    'lot_size': 'float64',
+    'sl_pips': 'float64',
+    'pnl_pips': 'float64',
+    'pnl_usd': 'float64',
+    'result': 'U4',           # 'win', 'loss', 'flat' (break-even) or 'open'
+    'ticket': 'int64',        # -1 when there is no broker order
+}
+JOURNAL_COLUMNS = list(JOURNAL_SCHEMA)
+
+_DEFAULTS = {'U': '', 'M': np.datetime64('NaT'), 'f': np.nan, 'i': -1}
+
+# backtest_signals column -> journal column
+BACKTEST_COLUMN_MAP = {'PnL_pips': 'pnl_pips', 'PnL_$': 'pnl_usd'}
+
+
+def to_columns(rows, schema=JOURNAL_SCHEMA):
+    # rows: DataFrame or list of dicts -> {column: array} in schema order
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    columns = {}
+    for name, dtype in schema.items():
+        dtype = np.dtype(dtype)
+        if name not in frame:
+            columns[name] = np.full(len(frame), _DEFAULTS[dtype.kind], dtype=dtype)
+        elif dtype.kind == 'M':
+            columns[name] = pd.to_datetime(frame[name]).to_numpy(dtype=dtype)
+        elif dtype.kind == 'U':
+            columns[name] = frame[name].fillna('').astype(str).to_numpy(dtype=dtype)
+        else:
+            columns[name] = frame[name].fillna(_DEFAULTS[dtype.kind]).to_numpy(dtype=dtype)
+    return columns
+
+
+# === Segmented Journal ===
+# append() only buffers; a background thread writes the buffer as one
+# columnar segment (an uncompressed .npz holding one array per column) every
+# FLUSH_INTERVAL seconds or once FLUSH_ROWS rows are pending. The manifest
+# keeps each segment's symbols, results and time range, so query() skips
+# segments that cannot match and reads only the columns it needs from the
+# rest. Segments and the manifest are written to temp files and renamed into
+# place. One writer process per directory. Other logs can reuse it with their
+# own schema, as long as it has symbol/result/source columns for pruning.
+class TradeJournal:
+    def __init__(self, root=BACKTEST_JOURNAL_DIR, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL,
+                 schema=JOURNAL_SCHEMA, time_column='entry_time'):
+        self.root = root
+        self.schema = schema
+        self.columns = list(schema)
+        self.time_column = time_column
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.manifest = self._load_manifest()
+
+        self._buffer = []
+        self._buffered_rows = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='trade-journal', daemon=True)
+        self._thread.start()
+
+    # === Writes ===
+    def append(self, rows):
+        columns = to_columns(rows, self.schema)
+        n = len(columns['symbol'])
+        if n == 0:
+            return
+        with self._lock:
+            self._buffer.append(columns)
+            self._buffered_rows += n
+            full = self._buffered_rows >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def append_backtest(self, trades, run_id=''):
+        frame = trades.rename(columns=BACKTEST_COLUMN_MAP).assign(source='backtest', run_id=run_id)
+        self.append(frame)
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                chunks, self._buffer, self._buffered_rows = self._buffer, [], 0
+            if not chunks:
+                return
+            columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in self.columns}
+            self._write_segment(columns)
+            self._save_manifest()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"❌ Trade journal flush failed: {e}")
+
+    def _write_segment(self, columns):
+        os.makedirs(self.root, exist_ok=True)
+        name = f"segment_{self.manifest['next_segment']:06d}.npz"
+        tmp_path = os.path.join(self.root, name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(tmp_path, os.path.join(self.root, name))
+
+        times = columns[self.time_column][~np.isnat(columns[self.time_column])]
+        self.manifest['next_segment'] += 1
+        self.manifest['segments'].append({
+            'file': name,
+            'rows': len(columns['symbol']),
+            'symbols': sorted(set(columns['symbol'].tolist())),
+            'results': sorted(set(columns['result'].tolist())),
+            'sources': sorted(set(columns['source'].tolist())),
+            'start': str(times.min()) if len(times) else None,
+            'end': str(times.max()) if len(times) else None,
+        })
+
+    def _load_manifest(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+        return {'next_segment': 0, 'segments': []}
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def compact(self):
+        # Merge everything into one segment (live flushes leave many small ones)
+        self.flush()
+        with self._write_lock:
+            old = self.manifest['segments']
+            if len(old) < 2:
+                return
+            frames = [self._read_segment(segment, self.columns) for segment in old]
+            columns = {name: np.concatenate([frame[name] for frame in frames]) for name in self.columns}
+            self.manifest['segments'] = []
+            self._write_segment(columns)
+            self._save_manifest()
+            for segment in old:
+                os.remove(os.path.join(self.root, segment['file']))
+
+    # === Queries ===
+    def _read_segment(self, segment, names):
+        with np.load(os.path.join(self.root, segment['file'])) as data:
+            return {name: data[name] for name in names}
+
+    def query(self, symbols=None, start=None, end=None, result=None, source=None, columns=None):
+        self.flush()
+        symbols = [symbols] if isinstance(symbols, str) else symbols
+        results = [result] if isinstance(result, str) else result
+        sources = [source] if isinstance(source, str) else source
+        start = None if start is None else np.datetime64(pd.Timestamp(start).to_datetime64(), 'ns')
+        end = None if end is None else np.datetime64(pd.Timestamp(end).to_datetime64(), 'ns')
+        columns = self.columns if columns is None else list(columns)
+
+        parts = []
+        for segment in self.manifest['segments']:
+            # Prune on the manifest before touching the file
+            if symbols is not None and not set(symbols) & set(segment['symbols']):
+                continue
+            if results is not None and not set(results) & set(segment['results']):
+                continue
+            if sources is not None and not set(sources) & set(segment['sources']):
+                continue
+            if start is not None and (segment['end'] is None or np.datetime64(segment['end'], 'ns') < start):
+                continue
+            if end is not None and (segment['start'] is None or np.datetime64(segment['start'], 'ns') > end):
+                continue
+
+            with np.load(os.path.join(self.root, segment['file'])) as data:
+                mask = np.ones(segment['rows'], dtype=bool)
+                if symbols is not None:
+                    mask &= np.isin(data['symbol'], symbols)
+                if results is not None:
+                    mask &= np.isin(data['result'], results)
+                if sources is not None:
+                    mask &= np.isin(data['source'], sources)
+                if start is not None or end is not None:
+                    times = data[self.time_column]
+                    if start is not None:
+                        mask &= times >= start
+                    if end is not None:
+                        mask &= times <= end
+                if mask.any():
+                    parts.append({name: data[name][mask] for name in columns})
+
+        if not parts:
+            return pd.DataFrame({name: np.array([], dtype=self.schema[name]) for name in columns})
+        return pd.DataFrame({name: np.concatenate([part[name] for part in parts]) for name in columns})
+
+
+_open_journals = {}
+
+
+def get_journal(root, **kwargs):
+    # Shared per-directory journal, flushed at interpreter exit
+    if root not in _open_journals:
+        _open_journals[root] = TradeJournal(root, **kwargs)
+    return _open_journals[root]
+
+
+@atexit.register
+def _close_journals():
+    for journal in _open_journals.values():
+        journal.close()
@@ -1,5 +1,8 @@
 # indicators/candlestick.py
 
+import numpy as np
+import pandas as pd
+
 def is_bullish_engulfing(df):
     return (
         (df['close'].shift(1) < df['open'].shift(1)) &
@@ -50,3 +53,62 @@ def is_shooting_star(df):
 
 def is_doji(df):
     return abs(df['close'] - df['open']) / (df['high'] - df['low']) < 0.1
+
+
+# === Single-Pass Pattern Scanner ===
+# Shifted OHLC arrays and body/shadow arithmetic are computed once and every
+# pattern above is evaluated from them. The result packs one bit per pattern
+# into a uint16 per bar (see PATTERN_BITS / decode_patterns).
+PATTERNS = (
+    'bullish_engulfing',
+    'bearish_engulfing',
+    'morning_star',
+    'evening_star',
+    'hammer',
+    'shooting_star',
+    'doji',
+)
+PATTERN_BITS = {name: np.uint16(1 << i) for i, name in enumerate(PATTERNS)}
+
+
+def _shift(values, periods):
+    return np.concatenate((np.full(periods, np.nan), values[:-periods])) if len(values) > periods else np.full(len(values), np.nan)
+
+
+def scan_patterns(df):
+    o = df['open'].to_numpy(dtype=np.float64)
+    h = df['high'].to_numpy(dtype=np.float64)
+    l = df['low'].to_numpy(dtype=np.float64)
+    c = df['close'].to_numpy(dtype=np.float64)
+    o1, c1 = _shift(o, 1), _shift(c, 1)
+    o2, c2 = _shift(o, 2), _shift(c, 2)
+
+    bull, bear = c > o, c < o
+    bull1, bear1 = c1 > o1, c1 < o1
+    body = np.abs(c - o)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        doji = body / (h - l) < 0.1
+
+    masks = {
+        'bullish_engulfing': bear1 & bull & (c > o1) & (o < c1),
+        'bearish_engulfing': bull1 & bear & (c < o1) & (o > c1),
+        'morning_star': (c2 < o2) & bear1 & bull & (c > o2),
+        'evening_star': (c2 > o2) & bull1 & bear & (c < o2),
+        'hammer': bull & (o - l > 2 * body),
+        'shooting_star': bear & (h - c > 2 * body),
+        'doji': doji,
+    }
+
+    bits = np.zeros(len(c), dtype=np.uint16)
+    for name in PATTERNS:
+        bits |= masks[name].astype(np.uint16) * PATTERN_BITS[name]
+    return bits
+
+
+def has_pattern(bits, name):
+    return (np.asarray(bits) & PATTERN_BITS[name]) != 0
+
+
+def decode_patterns(bits, index=None, patterns=PATTERNS):
+    return pd.DataFrame({name: has_pattern(bits, name) for name in patterns}, index=index)
+
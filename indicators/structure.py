@@ -1,50 +1,75 @@
 # indicators/structure.py
 
+import numpy as np
+
+# Each detector returns a boolean mask over the bars of df. lookback and
+# threshold may also be lists (broadcast against each other like numpy
+# arrays); the mask then has one row per (lookback, threshold) pair, so a
+# sweep over lookbacks is a single 2-D computation.
+
+def _params(lookback, threshold):
+    lookbacks, thresholds = np.broadcast_arrays(np.atleast_1d(lookback), np.atleast_1d(threshold))
+    return lookbacks.astype(np.int64), thresholds.astype(np.float64)
+
+
+def _shifted(values, offsets):
+    # values[i - offset] for every (offset row, bar i); NaN before the first bar
+    idx = np.arange(len(values))[None, :] - offsets[:, None]
+    out = values[np.clip(idx, 0, None)]
+    out[idx < 0] = np.nan
+    return out
+
+
+def _close_change(df):
+    close = df['close'].to_numpy(dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return close, prev_close
+
+
+def _finish(mask, lookback, threshold):
+    return mask[0] if np.ndim(lookback) == 0 and np.ndim(threshold) == 0 else mask
+
+
+def _double(df, col, lookback, threshold):
+    lookbacks, thresholds = _params(lookback, threshold)
+    values = df[col].to_numpy(dtype=np.float64)
+    earlier = _shifted(values, lookbacks)
+    with np.errstate(invalid='ignore'):
+        return np.abs(earlier - values) / values < thresholds[:, None]
+
+
+def _triple(df, col, lookback, threshold):
+    lookbacks, thresholds = _params(lookback, threshold)
+    values = df[col].to_numpy(dtype=np.float64)
+    first = _shifted(values, lookbacks)
+    middle = _shifted(values, lookbacks // 2)
+    avg = (first + middle + values) / 3
+    thr = thresholds[:, None]
+    with np.errstate(invalid='ignore'):
+        return ((np.abs(first - avg) / avg < thr) &
+                (np.abs(middle - avg) / avg < thr) &
+                (np.abs(values - avg) / avg < thr))
+
+
 def detect_double_bottom(df, lookback=20, threshold=0.005):
-    bottoms = []
-    for i in range(lookback, len(df)):
-        low1 = df['low'].iloc[i - lookback]
-        low2 = df['low'].iloc[i]
-        diff = abs(low1 - low2) / df['low'].iloc[i]
-        if diff < threshold and df['close'].iloc[i] > df['close'].iloc[i - 1]:
-            bottoms.append(i)
-    return df.index.isin(bottoms)
+    close, prev_close = _close_change(df)
+    mask = _double(df, 'low', lookback, threshold) & (close > prev_close)
+    return _finish(mask, lookback, threshold)
+
 
 def detect_double_top(df, lookback=20, threshold=0.005):
-    tops = []
-    for i in range(lookback, len(df)):
-        high1 = df['high'].iloc[i - lookback]
-        high2 = df['high'].iloc[i]
-        diff = abs(high1 - high2) / df['high'].iloc[i]
-        if diff < threshold and df['close'].iloc[i] < df['close'].iloc[i - 1]:
-            tops.append(i)
-    return df.index.isin(tops)
+    close, prev_close = _close_change(df)
+    mask = _double(df, 'high', lookback, threshold) & (close < prev_close)
+    return _finish(mask, lookback, threshold)
+
+
 def detect_triple_bottom(df, lookback=30, threshold=0.005):
-    bottoms = []
-    for i in range(lookback, len(df)):
-        low1 = df['low'].iloc[i - lookback]
-        low2 = df['low'].iloc[i - lookback // 2]
-        low3 = df['low'].iloc[i]
-        avg = (low1 + low2 + low3) / 3
-        diff1 = abs(low1 - avg) / avg
-        diff2 = abs(low2 - avg) / avg
-        diff3 = abs(low3 - avg) / avg
-        if diff1 < threshold and diff2 < threshold and diff3 < threshold:
-            if df['close'].iloc[i] > df['close'].iloc[i - 1]:
-                bottoms.append(i)
-    return df.index.isin(bottoms)
+    close, prev_close = _close_change(df)
+    mask = _triple(df, 'low', lookback, threshold) & (close > prev_close)
+    return _finish(mask, lookback, threshold)
+
 
 def detect_triple_top(df, lookback=30, threshold=0.005):
-    tops = []
-    for i in range(lookback, len(df)):
-        high1 = df['high'].iloc[i - lookback]
-        high2 = df['high'].iloc[i - lookback // 2]
-        high3 = df['high'].iloc[i]
-        avg = (high1 + high2 + high3) / 3
-        diff1 = abs(high1 - avg) / avg
-        diff2 = abs(high2 - avg) / avg
-        diff3 = abs(high3 - avg) / avg
-        if diff1 < threshold and diff2 < threshold and diff3 < threshold:
-            if df['close'].iloc[i] < df['close'].iloc[i - 1]:
-                tops.append(i)
-    return df.index.isin(tops)
+    close, prev_close = _close_change(df)
+    mask = _triple(df, 'high', lookback, threshold) & (close < prev_close)
+    return _finish(mask, lookback, threshold)
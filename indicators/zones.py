@@ -1,15 +1,105 @@
+import bisect
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SR_CLUSTER_TOLERANCE = 0.002
+
+
+def find_pivots(df, swing_window=5):
+    # Pivot at i: strictly below (above) every low (high) in the swing_window
+    # bars on each side. Window minima/maxima come from one sliding view.
+    low = df['low'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64)
+    n = len(low)
+    is_support = np.zeros(n, dtype=bool)
+    is_resistance = np.zeros(n, dtype=bool)
+    if n < 2 * swing_window + 1:
+        return is_support, is_resistance
+
+    low_min = sliding_window_view(low, swing_window).min(axis=1)
+    high_max = sliding_window_view(high, swing_window).max(axis=1)
+    centre = slice(swing_window, n - swing_window)
+    left = slice(0, n - 2 * swing_window)
+    right = slice(swing_window + 1, n - swing_window + 1)
+    is_support[centre] = (low[centre] < low_min[left]) & (low[centre] < low_min[right])
+    is_resistance[centre] = (high[centre] > high_max[left]) & (high[centre] > high_max[right])
+    return is_support, is_resistance
+
 
 def get_support_resistance(df, swing_window=5):
-    sr_levels = []
-    for i in range(swing_window, len(df) - swing_window):
-        is_support = df['low'][i] < df['low'][i - swing_window:i].min() and df['low'][i] < df['low'][i + 1:i + 1 + swing_window].min()
-        is_resistance = df['high'][i] > df['high'][i - swing_window:i].max() and df['high'][i] > df['high'][i + 1:i + 1 + swing_window].max()
-        if is_support:
-            sr_levels.append(('support', df['low'][i]))
-        if is_resistance:
-            sr_levels.append(('resistance', df['high'][i]))
-    return sr_levels
+    is_support, is_resistance = find_pivots(df, swing_window)
+    low = df['low'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64)
+    # Bar order, support before resistance on the same bar
+    support_idx = np.flatnonzero(is_support)
+    resistance_idx = np.flatnonzero(is_resistance)
+    order = np.argsort(np.concatenate([support_idx * 2, resistance_idx * 2 + 1]), kind='stable')
+    types = np.array(['support'] * len(support_idx) + ['resistance'] * len(resistance_idx))[order]
+    levels = np.concatenate([low[support_idx], high[resistance_idx]])[order]
+    return list(zip(types.tolist(), levels.tolist()))
+
+
+def add_clustered_level(clustered, kept, zone_type, level, tolerance=SR_CLUSTER_TOLERANCE):
+    # kept is the sorted list of clustered level values. The relative distance
+    # abs(level - l) / l only grows moving away from level, so checking the
+    # neighbours around the insertion point replaces a scan of every level.
+    pos = bisect.bisect_left(kept, level)
+    for l in kept[max(pos - 2, 0):pos + 2]:
+        if abs(level - l) / l < tolerance:
+            return False
+    kept.insert(pos, level)
+    clustered.append((zone_type, level))
+    return True
+
+
+def cluster_levels(levels, tolerance=SR_CLUSTER_TOLERANCE):
+    clustered, kept = [], []
+    for zone_type, level in levels:
+        add_clustered_level(clustered, kept, zone_type, level, tolerance)
+    return clustered
+
+
+# === Sorted Level Index ===
+# Proximity and next-TP lookups for whole price arrays via searchsorted.
+class SRLevelIndex:
+    def __init__(self, levels):
+        self.levels = list(levels)
+        self.values = np.sort(np.array([level for _, level in self.levels], dtype=np.float64))
+        self.supports = np.sort(np.array([level for t, level in self.levels if t == 'support'], dtype=np.float64))
+        self.resistances = np.sort(np.array([level for t, level in self.levels if t == 'resistance'], dtype=np.float64))
+
+    def nearest_dist(self, prices):
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(self.values) == 0:
+            return np.full(prices.shape, np.inf)
+        pos = np.searchsorted(self.values, prices)
+        left = self.values[np.clip(pos - 1, 0, len(self.values) - 1)]
+        right = self.values[np.clip(pos, 0, len(self.values) - 1)]
+        return np.minimum(np.abs(prices - left) / prices, np.abs(prices - right) / prices)
+
+    def near(self, prices, tolerance=0.01):
+        return self.nearest_dist(prices) < tolerance
+
+    def tp_levels(self, prices, is_long):
+        # Long: closest resistance above price; short: closest support below
+        prices = np.asarray(prices, dtype=np.float64)
+        is_long = np.asarray(is_long, dtype=bool)
+        valid = ~np.isnan(prices)
+        tp = np.full(prices.shape, np.nan)
+
+        res = self.resistances
+        if len(res):
+            pos = np.searchsorted(res, prices, side='right')
+            found = valid & is_long & (pos < len(res))
+            tp[found] = res[pos[found]]
+
+        sup = self.supports
+        if len(sup):
+            pos = np.searchsorted(sup, prices, side='left') - 1
+            found = valid & ~is_long & (pos >= 0)
+            tp[found] = sup[pos[found]]
+        return tp
 
 
 def is_near_level(price, levels, tolerance=0.01):
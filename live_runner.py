@@ -1,14 +1,21 @@
+import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 import os
 import pandas as pd
-import requests
-import MetaTrader5 as mt5
 from dotenv import load_dotenv
 
-from core.mt5_connector import connect_to_mt5, get_data
-from core.signal_engine import generate_signals
+from core.backtest_engine import ACCOUNT_BALANCE, RISK_PCT
+from core.bar_store import TIMEFRAME_SECONDS
+from core.clock import SystemClock, SimulatedClock
+from core.data_provider import MT5DataProvider, ReplayDataProvider, TickDataProvider
+from core.metrics import METRICS, METRICS_FILE, MetricsFile, serve_metrics
+from core.portfolio_risk import LOT_STEP, MIN_LOT, risk_per_lot
+from core.scheduler import BarCloseScheduler
+from core.signal_engine import SignalEngine
 from core.memory_tracker import MemoryTracker
+from core.telegram_notifier import TelegramNotifier
 
 # === Load environment variables ===
 load_dotenv()
@@ -16,109 +23,301 @@ TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
 # === Config ===
-CHECK_INTERVAL_MINUTES = 15
+SIGNAL_TIMEFRAME = 'H1'  # wake at each close of this timeframe (see core/scheduler.py)
 PRICE_UPDATE_INTERVAL = 15  # Send price update every X minutes
+SCAN_WORKERS = 4  # signal workers per cycle; 0 scans symbols one after another
+REPLAY_MEMORY_FILE = "live_trading/replay_memory.jsonl"
+REPLAY_ALERTS_FILE = "reports/replay_alerts.csv"
+METRICS_PORT = 9108  # local Prometheus endpoint; 0 disables it
+SERVER_UTC_OFFSET_HOURS = 0  # broker server time minus UTC (MT5 bar times are server time)
 
 symbols = ['XAUUSDm', 'USDJPYm', 'US500m']
-last_price_alert_time = None
-
-# === Telegram Messaging ===
-def send_telegram_message(message):
-    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
-        return
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {
-        'chat_id': TELEGRAM_CHAT_ID,
-        'text': message,
-        'parse_mode': 'Markdown'
-    }
-    try:
-        response = requests.post(url, data=payload)
-        if response.status_code == 200:
-            print("✅ Telegram message sent.")
-        else:
-            print(f"❌ Telegram error: {response.text}")
-    except Exception as e:
-        print(f"❌ Telegram exception: {e}")
 
 # === Send Live Prices to Telegram ===
-def send_live_prices():
-    message = f"📡 *Live Prices* @ {datetime.utcnow().strftime('%H:%M:%S')} UTC\n"
+def send_live_prices(provider, clock, notify):
+    message = f"📡 *Live Prices* @ {clock.now().strftime('%H:%M:%S')} UTC\n"
     for symbol in symbols:
-        tick = mt5.symbol_info_tick(symbol)
+        tick = provider.symbol_info_tick(symbol)
         if tick:
             message += f"\n*{symbol}*\nBid: `{tick.bid}`\nAsk: `{tick.ask}`"
         else:
             message += f"\n*{symbol}* ❌ No tick data"
-    send_telegram_message(message)
-
-# === MT5 Initialization ===
-if not connect_to_mt5():
-    raise RuntimeError("❌ Could not connect to MetaTrader 5.")
-
-tracker = MemoryTracker()
-send_telegram_message("🟢 *Live Engine Started*\nMonitoring markets...")
-
-print("🚀 Live engine initialized.")
-
-# === Live Loop ===
-while True:
-    now = datetime.utcnow()
-
-    if now.weekday() >= 5:
-        print("⏸ Market closed (weekend). Sleeping...")
-        time.sleep(60 * 15)
-        continue
+    notify(message, key='live_prices')  # a newer snapshot replaces one still queued
+
+# === Per-Symbol Stages ===
+def fetch_symbol_data(provider, symbol, seen=None):
+    # H1 first: if its newest bar is still `seen`, skip the rest (d1 and h4 come back as None)
+    start = time.perf_counter()
+    frames = {}
+    for timeframe, bars in (("H1", 1000), ("D1", 200), ("H4", 500)):
+        with METRICS.timer('get_data_seconds', symbol=symbol, timeframe=timeframe):
+            frames[timeframe] = provider.get_data(symbol, timeframe, bars)
+        h1 = frames["H1"]
+        if seen is not None and not h1.empty and h1['time'].iat[-1] == seen:
+            break
+    elapsed = time.perf_counter() - start
+    METRICS.observe('stage_seconds', elapsed, stage='fetch', symbol=symbol)
+    return frames.get("D1"), frames.get("H4"), frames["H1"], elapsed
+
+def accept_bars(symbol, d1, h4, h1, scheduler):
+    # Decides whether this wake-up computes, and books the symbol's next one
+    if d1 is None:
+        METRICS.inc('skipped_symbols_total', symbol=symbol, reason='no_new_bar')
+        retrying = scheduler.retry(symbol)
+        print(f"⏩ No new bar for {symbol} yet" + (", checking again shortly" if retrying else ""))
+        return False
+    if d1.empty or h4.empty or h1.empty:
+        METRICS.inc('skipped_symbols_total', symbol=symbol, reason='missing_data')
+        print(f"⚠️ Skipping {symbol}: Missing candle data.")
+        scheduler.retry(symbol)
+        return False
+    scheduler.complete(symbol, h1['time'].iat[-1])
+    return True
+
+def compute_signal(engine, h1, h4, symbol=None):
+    start = time.perf_counter()
+    engine.update(h1, h4)
+    latest = engine.latest_signal()
+    elapsed = time.perf_counter() - start
+    METRICS.observe('stage_seconds', elapsed, stage='signals', symbol=symbol)
+    return latest, elapsed
+
+def record_alert_lag(symbol, signal_time, now):
+    # Signal times are H1 bar opens in server time; the alert can only go out after that bar closed
+    bar_close = (pd.Timestamp(signal_time) + pd.Timedelta(seconds=TIMEFRAME_SECONDS['H1'])
+                 - pd.Timedelta(hours=SERVER_UTC_OFFSET_HOURS))
+    lag = (pd.Timestamp(now) - bar_close).total_seconds()
+    METRICS.observe('alert_lag_seconds', lag, symbol=symbol)
+    METRICS.set('last_alert_lag_seconds', lag, symbol=symbol)
+
+# === Order Placement ===
+# Same stop and target as the backtest: SL one ATR from entry, TP at the
+# signal's level (else 2x ATR), RISK_PCT of the balance lost at the stop.
+# The pipeline validates and sends on its own thread, so the scan loop only
+# enqueues the order and never waits on order_send.
+def submit_order(symbol, latest, orders):
+    entry, atr = latest['close'], latest['atr']
+    direction = 'buy' if latest['direction'] == 'long' else 'sell'
+    sign = 1 if direction == 'buy' else -1
+    sl = entry - sign * atr
+    tp = latest['tp_level'] if not pd.isna(latest['tp_level']) else entry + sign * 2 * atr
+    raw_lot = ACCOUNT_BALANCE * RISK_PCT / risk_per_lot([symbol], [entry], [sl])[0]
+    lot = max(int(raw_lot / LOT_STEP) * LOT_STEP, MIN_LOT)
+
+    print(f"📈 {symbol} | {direction.upper()} | Entry: {entry:.2f} | SL: {sl:.2f} | TP: {tp:.2f} | Lot: {lot:.2f}")
+    orders.submit(symbol, direction, lot, sl, tp, entry, latest['time'])
+    METRICS.inc('orders_submitted_total', symbol=symbol, direction=direction)
+
+def handle_signal(symbol, latest, tracker, notify, now=None, orders=None):
+    direction = latest['direction']
+    entry_price = latest['close']
+    signal_time = latest['time']
+    tp_level = latest['tp_level']
+    METRICS.inc('signals_total', symbol=symbol, direction=direction)
+
+    if tracker.already_traded(symbol, signal_time, direction):
+        METRICS.inc('duplicate_signals_total', symbol=symbol)
+        print(f"⏩ Already alerted for this signal: {symbol} | {signal_time}")
+        return
 
-    # Live price update every PRICE_UPDATE_INTERVAL
-    if not last_price_alert_time or (now - last_price_alert_time).seconds > PRICE_UPDATE_INTERVAL * 60:
-        send_live_prices()
-        last_price_alert_time = now
+    print(f"📡 Sending signal: {symbol} | {direction.upper()} @ {entry_price:.2f}")
+
+    message = (
+        f"📊 *NEW SIGNAL ALERT*\n"
+        f"🕒 Time: {signal_time}\n"
+        f"💹 Symbol: `{symbol}`\n"
+        f"📈 Direction: *{direction.upper()}*\n"
+        f"💰 Entry: `{entry_price:.2f}`\n"
+        f"🎯 TP Level: `{tp_level:.2f}`" if not pd.isna(tp_level) else "🎯 TP Level: `Not defined`"
+    )
+    with METRICS.timer('stage_seconds', stage='alert', symbol=symbol):
+        notify(message)
+        if orders is not None:
+            submit_order(symbol, latest, orders)
 
-    for symbol in symbols:
+        # Mark as sent
+        tracker.mark_traded(symbol, signal_time, direction)
+    METRICS.inc('alerts_total', symbol=symbol)
+    if now is not None:
+        record_alert_lag(symbol, signal_time, now)
+
+# === One Pass Over All Symbols ===
+def scan_symbols(provider, clock, tracker, engines, notify, scheduler, scan, orders=None):
+    now = clock.now()
+    for symbol in scan:
         print(f"\n🔍 Checking {symbol} @ {now.strftime('%Y-%m-%d %H:%M:%S')}")
 
-        d1 = get_data(symbol, "D1", 200)
-        h4 = get_data(symbol, "H4", 500)
-        h1 = get_data(symbol, "H1", 1000)
+        d1, h4, h1, _ = fetch_symbol_data(provider, symbol, scheduler.last_bar(symbol))
 
-        if d1.empty or h4.empty or h1.empty:
-            print(f"⚠️ Skipping {symbol}: Missing candle data.")
+        if not accept_bars(symbol, d1, h4, h1, scheduler):
             continue
 
-        signals = generate_signals(d1, h4, h1)
+        latest, _ = compute_signal(engines[symbol], h1, h4, symbol)
 
-        if signals.empty:
+        if latest is None:
             print(f"📭 No signals for {symbol}")
             continue
 
-        latest = signals.iloc[-1]
-        direction = latest['direction']
-        entry_price = latest['close']
-        signal_time = latest['time']
-        tp_level = latest['tp_level']
-
-        if tracker.already_traded(symbol, signal_time, direction):
-            print(f"⏩ Already alerted for this signal: {symbol} | {signal_time}")
-            continue
-
-        print(f"📡 Sending signal: {symbol} | {direction.upper()} @ {entry_price:.2f}")
+        handle_signal(symbol, latest, tracker, notify, clock.now(), orders)
+
+# === Concurrent Pass ===
+# Terminal calls stay on a single fetch thread (the MT5 API is not safe to
+# call from several threads), signal updates run on a worker pool, and each
+# symbol's alert goes out as soon as its own update finishes. Alerts and the
+# tracker are only touched from this thread.
+def scan_symbols_concurrent(provider, clock, tracker, engines, notify, scheduler, scan, fetch_pool, compute_pool,
+                            orders=None):
+    cycle_start = time.perf_counter()
+    now = clock.now()
+    print(f"\n🔍 Scanning {len(scan)} symbols @ {now.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    pending = {fetch_pool.submit(fetch_symbol_data, provider, symbol, scheduler.last_bar(symbol)): ('fetch', symbol)
+               for symbol in scan}
+    fetch_times = {}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, symbol = pending.pop(future)
+            if stage == 'fetch':
+                d1, h4, h1, fetch_times[symbol] = future.result()
+                if not accept_bars(symbol, d1, h4, h1, scheduler):
+                    continue
+                pending[compute_pool.submit(compute_signal, engines[symbol], h1, h4, symbol)] = ('compute', symbol)
+                continue
+
+            latest, compute_time = future.result()
+            print(f"⏱ {symbol}: fetch {fetch_times[symbol]:.3f}s | signals {compute_time:.3f}s | "
+                  f"done after {time.perf_counter() - cycle_start:.3f}s")
+            if latest is None:
+                print(f"📭 No signals for {symbol}")
+                continue
+            handle_signal(symbol, latest, tracker, notify, clock.now(), orders)
+
+    print(f"⏱ Cycle finished in {time.perf_counter() - cycle_start:.3f}s "
+          f"(fetch total {sum(fetch_times.values()):.3f}s)")
 
-        message = (
-            f"📊 *NEW SIGNAL ALERT*\n"
-            f"🕒 Time: {signal_time}\n"
-            f"💹 Symbol: `{symbol}`\n"
-            f"📈 Direction: *{direction.upper()}*\n"
-            f"💰 Entry: `{entry_price:.2f}`\n"
-            f"🎯 TP Level: `{tp_level:.2f}`" if not pd.isna(tp_level) else "🎯 TP Level: `Not defined`"
-        )
-        send_telegram_message(message)
-
-        # Mark as sent
-        tracker.mark_traded(symbol, signal_time, direction)
+# === Live Loop ===
+def run(provider, clock, tracker, notify, until=None, workers=SCAN_WORKERS, metrics_file=None, scheduler=None,
+        orders=None):
+    # orders: an OrderPipeline to trade new signals through; None only sends alerts
+    engines = {symbol: SignalEngine() for symbol in symbols}  # each cycle only advances the new bars
+    if scheduler is None:
+        scheduler = BarCloseScheduler(clock, symbols, SIGNAL_TIMEFRAME, PRICE_UPDATE_INTERVAL * 60,
+                                      server_offset_hours=SERVER_UTC_OFFSET_HOURS)
+    if isinstance(provider, TickDataProvider):
+        provider.subscribe(scheduler.on_bar_close)  # scan each symbol as its streamed bar closes
+    fetch_pool = ThreadPoolExecutor(max_workers=1) if workers else None
+    compute_pool = ThreadPoolExecutor(max_workers=workers) if workers else None
 
-    print(f"\n⏳ Sleeping for {CHECK_INTERVAL_MINUTES} minutes...\n")
-    time.sleep(CHECK_INTERVAL_MINUTES * 60)
+    try:
+        while until is None or clock.now() < until:
+            # Sessions and weekends are handled by the scheduler: it only wakes for bars that trade
+            due = scheduler.wait(until)
+            now = clock.now()
+            for _, _, planned in due:
+                METRICS.observe('wake_delay_seconds', (now - planned).total_seconds())
+
+            # Live prices run on their own timer
+            if any(kind == 'prices' for kind, _, _ in due):
+                with METRICS.timer('stage_seconds', stage='prices', symbol='all'):
+                    send_live_prices(provider, clock, notify)
+
+            scan = [symbol for kind, symbol, _ in due if kind == 'bar']
+            if not scan:
+                continue
+
+            with METRICS.timer('cycle_seconds'):
+                if workers:
+                    scan_symbols_concurrent(provider, clock, tracker, engines, notify, scheduler, scan,
+                                            fetch_pool, compute_pool, orders)
+                else:
+                    scan_symbols(provider, clock, tracker, engines, notify, scheduler, scan, orders)
+                tracker.flush()  # one journal append per cycle
+            METRICS.inc('cycles_total')
+            METRICS.set('last_cycle_timestamp_seconds', time.time())
+            if metrics_file is not None:
+                metrics_file.write(METRICS)
+    finally:
+        tracker.flush()
+        if workers:
+            fetch_pool.shutdown()
+            compute_pool.shutdown()
+
+# === Historical Replay ===
+# Runs the same loop over stored bars (see backfill.py) on a simulated clock.
+# Alerts are collected instead of sent, and dedupe state lives in its own file.
+def run_replay(start, end, store_dir=None, workers=SCAN_WORKERS, metrics_file=None):
+    from core.bar_store import BarStore
+
+    clock = SimulatedClock(pd.Timestamp(start).to_pydatetime())
+    provider = ReplayDataProvider(clock, BarStore(store_dir) if store_dir else None)
+    if os.path.exists(REPLAY_MEMORY_FILE):
+        os.remove(REPLAY_MEMORY_FILE)
+    tracker = MemoryTracker(REPLAY_MEMORY_FILE, now=clock.now)
+
+    alerts = []
+    def record_alert(message, key=None):
+        alerts.append({'time': clock.now(), 'message': message})
+
+    run(provider, clock, tracker, record_alert, until=pd.Timestamp(end).to_pydatetime(), workers=workers,
+        metrics_file=metrics_file)
+
+    os.makedirs(os.path.dirname(REPLAY_ALERTS_FILE), exist_ok=True)
+    pd.DataFrame(alerts, columns=['time', 'message']).to_csv(REPLAY_ALERTS_FILE, index=False)
+    print(f"📤 Replay finished: {len(alerts)} messages exported to {REPLAY_ALERTS_FILE}")
+    return alerts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Live signal engine")
+    parser.add_argument('--replay', action='store_true', help="replay stored history instead of trading live")
+    parser.add_argument('--start', help="replay start time, e.g. 2025-01-01")
+    parser.add_argument('--end', help="replay end time")
+    parser.add_argument('--store', default=None, help="bar store directory for replay")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS, help="signal workers (0 = sequential scan)")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="local metrics HTTP port (0 = off)")
+    parser.add_argument('--metrics-file', nargs='?', const=METRICS_FILE, default=None,
+                        help=f"also append metrics snapshots to a rotating file (default {METRICS_FILE})")
+    parser.add_argument('--tick-bars', action='store_true', help="build bars from streamed ticks and scan on each bar close")
+    parser.add_argument('--trade', action='store_true', help="place orders for new signals, not just alerts")
+    args = parser.parse_args()
+
+    metrics_file = MetricsFile(args.metrics_file) if args.metrics_file else None
+    if args.metrics_port and not args.replay:
+        serve_metrics(METRICS, args.metrics_port)
+
+    if args.replay:
+        run_replay(args.start, args.end or datetime.utcnow(), args.store, args.workers, metrics_file)
+    else:
+        # === MT5 Initialization ===
+        provider = MT5DataProvider()
+        if args.tick_bars:
+            provider = TickDataProvider(provider, symbols)
+            provider.subscribe(lambda event: METRICS.inc('bar_closes_total', symbol=event.symbol,
+                                                         timeframe=event.timeframe))
+        if not provider.connect():
+            raise RuntimeError("❌ Could not connect to MetaTrader 5.")
+
+        tracker = MemoryTracker()
+        notifier = TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, metrics=METRICS)
+        notifier.send("🟢 *Live Engine Started*\nMonitoring markets...")
+
+        orders = None
+        if args.trade:
+            from live_trading.order_pipeline import OrderPipeline
+
+            orders = OrderPipeline(metrics=METRICS)
+            orders.warm(symbols)
+
+        print("🚀 Live engine initialized." + (" Trading enabled." if orders else ""))
+        try:
+            run(provider, SystemClock(), tracker, notifier.send, workers=args.workers, metrics_file=metrics_file,
+                orders=orders)
+        finally:
+            if orders is not None:
+                orders.close()
+            notifier.close()
+            provider.close()
 
 
 
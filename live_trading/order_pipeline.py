@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import MetaTrader5 as mt5
+import numpy as np
+
+from core.mt5_session import SESSION
+from core.trade_journal import TradeJournal
+from live_trading.order_validation import check_stops, validate_order
+from live_trading.trade_executor import build_request
+
+EXECUTION_LOG_DIR = "logs/executions"
+
+# One row per order, whatever happened to it
+EXECUTION_SCHEMA = {
+    'source': 'U8',            # 'live'
+    'symbol': 'U16',
+    'direction': 'U4',         # 'buy' or 'sell'
+    'result': 'U8',            # 'filled', 'rejected', 'invalid' or 'error'
+    'reason': 'U64',
+    'retcode': 'int64',        # -1 when order_send was never called or returned nothing
+    'signal_time': 'datetime64[ns]',
+    'queued_at': 'datetime64[ns]',
+    'sent_at': 'datetime64[ns]',
+    'lot_size': 'float64',     # as requested
+    'volume': 'float64',       # after volume step/limits
+    'signal_price': 'float64',
+    'quote_price': 'float64',  # live quote SL/TP were re-checked against
+    'fill_price': 'float64',
+    'stop_loss': 'float64',
+    'take_profit': 'float64',
+    'slippage_points': 'float64',  # fill vs signal price, positive = worse for us
+    'queue_ms': 'float64',     # submit() -> order_send
+    'send_ms': 'float64',      # order_send round-trip
+    'ticket': 'int64',
+}
+
+_STOP = object()
+
+Order = namedtuple('Order', ['symbol', 'direction', 'lot_size', 'sl', 'tp', 'signal_price', 'signal_time',
+                             'comment', 'queued_at', 'queued_clock'])
+
+
+# === Order Pipeline ===
+# submit() validates nothing and never touches the terminal: it only queues,
+# so the scan loop keeps going while orders go out. A single worker thread
+# (the terminal serializes calls anyway) validates, sends and times each
+# order, and appends one row per order to a columnar execution log (the
+# TradeJournal format) that can be queried by symbol, result and time.
+class OrderPipeline:
+    def __init__(self, session=SESSION, log_root=EXECUTION_LOG_DIR, magic=20250701, deviation=30,
+                 on_result=None, metrics=None):
+        self.session = session
+        self.magic = magic
+        self.deviation = deviation
+        self.on_result = on_result  # callback(row dict), e.g. to log fills to the trade journal
+        self.metrics = metrics  # optional core.metrics.Metrics
+        self.log = TradeJournal(log_root, schema=EXECUTION_SCHEMA, time_column='queued_at')
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='order-pipeline', daemon=True)
+        self._thread.start()
+
+    # === Public API ===
+    def warm(self, symbols):
+        # Load symbol metadata up front so the first order does not pay for it
+        for symbol in symbols:
+            self.session.symbol(symbol)
+
+    def submit(self, symbol, direction, lot_size, sl, tp, signal_price, signal_time=None, comment="CryptoBot"):
+        self._queue.put(Order(symbol, direction, lot_size, sl, tp, signal_price, signal_time, comment,
+                              datetime.utcnow(), time.perf_counter()))
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=30):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self.log.close()
+
+    def executions(self, **query):
+        # Same filters as TradeJournal.query (symbols, start, end, result, columns)
+        return self.log.query(**query)
+
+    # === Worker ===
+    def _run(self):
+        while True:
+            order = self._queue.get()
+            try:
+                if order is _STOP:
+                    return
+                self._execute(order)
+            except Exception as e:
+                print(f"❌ Order pipeline error for {order.symbol}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, order):
+        row = {
+            'source': 'live', 'symbol': order.symbol, 'direction': order.direction, 'result': 'invalid',
+            'signal_time': order.signal_time, 'queued_at': order.queued_at, 'lot_size': order.lot_size,
+            'signal_price': order.signal_price, 'stop_loss': order.sl, 'take_profit': order.tp,
+        }
+
+        meta = self.session.symbol(order.symbol)
+        if meta is None:
+            return self._finish(row, reason="symbol unavailable")
+
+        volume, sl, tp, reason = validate_order(meta, order.direction, order.lot_size, order.sl, order.tp,
+                                                order.signal_price)
+        row.update(volume=volume, stop_loss=sl, take_profit=tp)
+        if reason is not None:
+            return self._finish(row, reason=reason)
+
+        request, quote = build_request(meta, order.direction, volume, sl, tp, self.magic, order.comment,
+                                       self.deviation, self.session)
+        if request is None:
+            return self._finish(row, result='error', reason="no quote")
+
+        # The order fills at the live price, which may have moved since the signal
+        row['quote_price'] = quote
+        reason = check_stops(meta, order.direction, sl, tp, quote)
+        if reason is not None:
+            return self._finish(row, reason=f"{reason} (quote {quote})")
+
+        row['sent_at'] = datetime.utcnow()
+        sent = time.perf_counter()
+        result = self.session.call('order_send', request)
+        done = time.perf_counter()
+        row.update(quote_price=quote, queue_ms=(sent - order.queued_clock) * 1000, send_ms=(done - sent) * 1000)
+
+        if result is None:
+            return self._finish(row, result='error', reason=str(mt5.last_error()))
+        row['retcode'] = result.retcode
+        if result.retcode != mt5.TRADE_RETCODE_DONE:
+            return self._finish(row, result='rejected', reason=result.comment)
+
+        sign = 1 if order.direction == 'buy' else -1
+        row.update(result='filled', fill_price=result.price, ticket=result.order,
+                   slippage_points=sign * (result.price - order.signal_price) / meta.point)
+        return self._finish(row)
+
+    def _finish(self, row, **updates):
+        row.update(updates)
+        self.log.append([row])
+
+        status = row['result']
+        if status == 'filled':
+            print(f"✅ {row['symbol']} {row['direction'].upper()} {row['volume']} filled @ {row['fill_price']} | "
+                  f"slippage {row['slippage_points']:+.1f} pts | queue {row['queue_ms']:.0f}ms | "
+                  f"send {row['send_ms']:.0f}ms")
+        else:
+            print(f"❌ {row['symbol']} order {status}: {row.get('reason', '')}")
+
+        if self.metrics is not None:
+            self.metrics.inc('orders_total', symbol=row['symbol'], result=status)
+            if 'send_ms' in row:
+                self.metrics.observe('order_queue_seconds', row['queue_ms'] / 1000, symbol=row['symbol'])
+                self.metrics.observe('order_send_seconds', row['send_ms'] / 1000, symbol=row['symbol'])
+            if status == 'filled' and not np.isnan(row['slippage_points']):
+                self.metrics.set('last_slippage_points', row['slippage_points'], symbol=row['symbol'])
+        if self.on_result is not None:
+            self.on_result(row)
+        return row
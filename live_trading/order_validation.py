@@ -0,0 +1,29 @@
+# live_trading/order_validation.py
+
+import math
+
+
+# === Pre-Validation ===
+# Checks against cached symbol metadata only (no terminal call), so orders the
+# broker would bounce never reach order_send. SL/TP are checked against the
+# signal price first and again against the live quote before order_send.
+# Plain arithmetic on meta's fields, so this imports without MetaTrader5.
+def check_stops(meta, direction, sl, tp, price):
+    # Reason SL/TP are unusable at this price (None when they are fine)
+    if direction == 'buy' and not sl < price < tp or direction == 'sell' and not tp < price < sl:
+        return "SL/TP on the wrong side of price"
+    min_distance = max(meta.stops_level, meta.freeze_level) * meta.point
+    if abs(price - sl) < min_distance or abs(tp - price) < min_distance:
+        return f"SL/TP closer than {min_distance:.5f}"
+    return None
+
+
+def validate_order(meta, direction, lot_size, sl, tp, price):
+    # -> (volume, sl, tp, reason); reason is None when the order can be sent
+    step = meta.volume_step or 0.01
+    volume = round(math.floor(lot_size / step + 1e-9) * step, 8)
+    sl, tp = round(sl, meta.digits), round(tp, meta.digits)
+    if volume < meta.volume_min:
+        return volume, sl, tp, f"volume {lot_size} below minimum {meta.volume_min}"
+    volume = min(volume, meta.volume_max)
+    return volume, sl, tp, check_stops(meta, direction, sl, tp, price)
@@ -1,5 +1,8 @@
-import MetaTrader5 as mt5
+from core.mt5_session import SESSION
 
-def is_position_open(symbol):
-    positions = mt5.positions_get(symbol=symbol)
+def is_position_open(symbol, session=SESSION, tracker=None):
+    # With a PositionTracker the answer comes from its last bulk snapshot (no terminal call)
+    if tracker is not None:
+        return tracker.is_open(symbol)
+    positions = session.call('positions_get', symbol=symbol)
     return positions is not None and len(positions) > 0
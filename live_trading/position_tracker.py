@@ -0,0 +1,176 @@
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import MetaTrader5 as mt5
+import numpy as np
+
+from core.backtest_engine import pip_settings
+from core.mt5_session import SESSION
+
+CLOSE_RESOLVE_RETRIES = 5  # refreshes to wait for a closed position's deals to show up
+DEAL_WINDOW_MARGIN = 2 * 86400  # deal times are server time; widen the query to cover the offset
+
+PositionEvent = namedtuple('PositionEvent', [
+    'kind',          # 'open', 'modify' or 'close'
+    'ticket', 'symbol', 'magic', 'direction', 'volume', 'price_open', 'sl', 'tp',
+    'open_time', 'close_time', 'close_price',
+    'profit',        # floating for open/modify, realised (incl. swap/commission/fee) for close
+    'changes',       # modify: {field: (old, new)}
+])
+
+MODIFY_FIELDS = ('sl', 'tp', 'volume')
+
+
+def _direction(position):
+    return 'long' if position.type == mt5.POSITION_TYPE_BUY else 'short'
+
+
+def _event(kind, position, **fields):
+    values = dict(
+        kind=kind, ticket=position.ticket, symbol=position.symbol, magic=position.magic,
+        direction=_direction(position), volume=position.volume, price_open=position.price_open,
+        sl=position.sl, tp=position.tp, open_time=datetime.utcfromtimestamp(position.time), close_time=None,
+        close_price=np.nan, profit=position.profit, changes=None,
+    )
+    values.update(fields)
+    return PositionEvent(**values)
+
+
+def trade_result(profit):
+    if profit > 0:
+        return 'win'
+    return 'loss' if profit < 0 else 'flat'
+
+
+def to_journal_row(event, pip_size=None, open_sl=None):
+    # Closed position -> trade journal row (see core/trade_journal.py). Pips
+    # use the backtest's pip size so live and backtest R multiples compare;
+    # the stop distance is the one the position opened with (open_sl), not a
+    # stop trailed to break-even later.
+    sign = 1 if event.direction == 'long' else -1
+    open_sl = event.sl if open_sl is None else open_sl
+    pnl_pips = sl_pips = np.nan
+    if pip_size:
+        pnl_pips = sign * (event.close_price - event.price_open) / pip_size
+        if open_sl:
+            sl_pips = abs(event.price_open - open_sl) / pip_size
+    return {
+        'source': 'live', 'symbol': event.symbol, 'direction': event.direction, 'entry_time': event.open_time,
+        'exit_time': event.close_time, 'entry_price': event.price_open, 'stop_loss': event.sl,
+        'take_profit': event.tp, 'exit_price': event.close_price, 'lot_size': event.volume,
+        'sl_pips': sl_pips, 'pnl_pips': pnl_pips, 'pnl_usd': event.profit, 'result': trade_result(event.profit),
+        'ticket': event.ticket,
+    }
+
+
+# === Position Tracker ===
+# One positions_get() per refresh for every symbol, indexed by ticket,
+# symbol and (symbol, magic), and diffed against the previous snapshot.
+# Closed tickets are resolved with a single history_deals_get() over the
+# window they could have traded in; a position whose deals are not in the
+# history yet is retried on the next refresh. A failed terminal call keeps
+# the old snapshot, so an outage never reads as "everything closed".
+class PositionTracker:
+    def __init__(self, session=SESSION, magic=None, on_event=None, journal=None):
+        self.session = session
+        self.magic = magic  # only track positions with this magic number (None = all)
+        self.on_event = on_event  # callback(PositionEvent)
+        self.journal = journal  # TradeJournal that receives closed positions
+        self.positions = {}  # ticket -> TradePosition
+        self.by_symbol = {}
+        self.by_key = {}
+        self.refreshed_at = None
+        self._pending_close = {}  # ticket -> (position, tries)
+        self._open_sl = {}  # ticket -> stop loss when the position was first seen
+
+    # === Queries (no terminal call) ===
+    def is_open(self, symbol, magic=None):
+        if magic is None:
+            return bool(self.by_symbol.get(symbol))
+        return bool(self.by_key.get((symbol, magic)))
+
+    def open_positions(self, symbol=None, magic=None):
+        if symbol is None:
+            return list(self.positions.values())
+        if magic is None:
+            return list(self.by_symbol.get(symbol, ()))
+        return list(self.by_key.get((symbol, magic), ()))
+
+    def pip_size(self, symbol):
+        # Backtest pip size where configured, else the broker's point
+        if symbol in pip_settings:
+            return pip_settings[symbol]['pip_size']
+        meta = self.session.symbol(symbol)
+        return meta.point if meta is not None else None
+
+    # === Refresh ===
+    def refresh(self):
+        snapshot = self.session.call('positions_get')
+        if snapshot is None:
+            print(f"⚠️ positions_get failed: {mt5.last_error()}")
+            return []
+        if self.magic is not None:
+            snapshot = [p for p in snapshot if p.magic == self.magic]
+        current = {p.ticket: p for p in snapshot}
+
+        events = []
+        for ticket, position in current.items():
+            before = self.positions.get(ticket)
+            if before is None:
+                self._open_sl.setdefault(ticket, position.sl)
+                events.append(_event('open', position))
+                continue
+            changes = {f: (getattr(before, f), getattr(position, f)) for f in MODIFY_FIELDS
+                       if getattr(before, f) != getattr(position, f)}
+            if changes:
+                events.append(_event('modify', position, changes=changes))
+
+        for ticket in self.positions.keys() - current.keys():
+            self._pending_close[ticket] = (self.positions[ticket], 0)
+        if self._pending_close:
+            events += self._resolve_closes()
+
+        self.positions = current
+        self.by_symbol, self.by_key = {}, {}
+        for position in current.values():
+            self.by_symbol.setdefault(position.symbol, []).append(position)
+            self.by_key.setdefault((position.symbol, position.magic), []).append(position)
+        self.refreshed_at = time.time()
+
+        for event in events:
+            if event.kind == 'close':
+                open_sl = self._open_sl.pop(event.ticket, None)
+                if self.journal is not None:
+                    self.journal.append([to_journal_row(event, self.pip_size(event.symbol), open_sl)])
+            if self.on_event is not None:
+                self.on_event(event)
+        return events
+
+    def _resolve_closes(self):
+        start = min(position.time for position, _ in self._pending_close.values())
+        deals = self.session.call('history_deals_get', start - DEAL_WINDOW_MARGIN, int(time.time()) + DEAL_WINDOW_MARGIN)
+        by_position = {}
+        for deal in deals or ():
+            if deal.position_id in self._pending_close:
+                by_position.setdefault(deal.position_id, []).append(deal)
+
+        events = []
+        for ticket, (position, tries) in list(self._pending_close.items()):
+            exits = [d for d in by_position.get(ticket, ()) if d.entry != mt5.DEAL_ENTRY_IN]
+            if not exits and tries + 1 < CLOSE_RESOLVE_RETRIES:
+                self._pending_close[ticket] = (position, tries + 1)
+                continue
+            del self._pending_close[ticket]
+            if not exits:
+                print(f"⚠️ No closing deal found for position {ticket} ({position.symbol}); using last floating PnL")
+                events.append(_event('close', position))
+                continue
+            last = max(exits, key=lambda d: d.time_msc)
+            volume = sum(d.volume for d in exits)
+            # Partial closes: the volume-weighted exit price
+            close_price = sum(d.price * d.volume for d in exits) / volume if volume else last.price
+            realised = sum(d.profit + d.swap + d.commission + getattr(d, 'fee', 0.0) for d in by_position[ticket])
+            events.append(_event('close', position, close_time=datetime.utcfromtimestamp(last.time),
+                                 close_price=close_price, profit=realised))
+        return events
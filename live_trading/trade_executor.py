@@ -1,44 +1,55 @@
 import MetaTrader5 as mt5
 
-def place_trade(symbol, direction, lot_size, sl, tp, magic=20250701, comment="CryptoBot", deviation=30):
-    if not mt5.initialize():
-        raise RuntimeError("❌ Could not connect to MetaTrader 5")
-
-    symbol_info = mt5.symbol_info(symbol)
-    if symbol_info is None:
-        print(f"⚠️ Symbol {symbol} not found.")
-        return None
-
-    if not symbol_info.visible:
-        mt5.symbol_select(symbol, True)
-
-    tick = mt5.symbol_info_tick(symbol)
-    if tick is None:
-        print(f"⚠️ No live tick data for {symbol}")
-        return None
+from core.mt5_session import SESSION, filling_type
 
-    price = tick.ask if direction == 'buy' else tick.bid
+def build_request(meta, direction, lot_size, sl, tp, magic=20250701, comment="CryptoBot", deviation=30, session=SESSION):
+    # -> (request, quoted price); (None, None) when there is no quote
     order_type = mt5.ORDER_TYPE_BUY if direction == 'buy' else mt5.ORDER_TYPE_SELL
-
-    print(f"🧪 Attempting {direction.upper()} | Price: {price} | SL: {sl} | TP: {tp} | Lot: {lot_size}")
-
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
-        "symbol": symbol,
+        "symbol": meta.symbol,
         "volume": lot_size,
         "type": order_type,
-        "price": price,
         "sl": sl,
         "tp": tp,
         "deviation": deviation,
         "magic": magic,
         "comment": comment,
         "type_time": mt5.ORDER_TIME_GTC,
-        "type_filling": mt5.ORDER_FILLING_IOC 
+        "type_filling": filling_type(meta)
     }
 
-    result = mt5.order_send(request)
-    mt5.shutdown()
+    # The quote is always fetched so SL/TP can be checked against the live
+    # price; market execution fills at the market whatever price is sent, so
+    # only the other modes put it in the request
+    tick = session.call('symbol_info_tick', meta.symbol)
+    if tick is None:
+        print(f"⚠️ No live tick data for {meta.symbol}")
+        return None, None
+    price = tick.ask if direction == 'buy' else tick.bid
+    if meta.execution_mode != mt5.SYMBOL_TRADE_EXECUTION_MARKET:
+        request["price"] = price
+    return request, price
+
+def place_trade(symbol, direction, lot_size, sl, tp, magic=20250701, comment="CryptoBot", deviation=30, session=SESSION):
+    # Uses the shared session: no initialize/shutdown per order, symbol metadata from cache
+    if not session.ensure():
+        raise RuntimeError("❌ Could not connect to MetaTrader 5")
+
+    meta = session.symbol(symbol)
+    if meta is None:
+        return None
+
+    request, price = build_request(meta, direction, lot_size, sl, tp, magic, comment, deviation, session)
+    if request is None:
+        return None
+
+    print(f"🧪 Attempting {direction.upper()} | Price: {price} | SL: {sl} | TP: {tp} | Lot: {lot_size}")
+
+    result = session.call('order_send', request)
+    if result is None:
+        print(f"❌ Trade failed for {symbol}: order_send returned nothing ({mt5.last_error()})")
+        return None
 
     if result.retcode != mt5.TRADE_RETCODE_DONE:
         print(f"❌ Trade failed for {symbol}: {result.retcode}")
@@ -1,11 +1,11 @@
-import csv
-import os
+from core.trade_journal import LIVE_JOURNAL_DIR, get_journal
 
-def log_trade(trade_data, path='logs/live_trades.csv'):
-    file_exists = os.path.isfile(path)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, mode='a', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=trade_data.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(trade_data)
+# log_trade field -> journal column
+LIVE_FIELD_MAP = {'time': 'entry_time', 'lot': 'lot_size', 'sl': 'stop_loss', 'tp': 'take_profit'}
+
+def log_trade(trade_data, path=LIVE_JOURNAL_DIR):
+    # Buffered; the journal writes a segment in the background
+    row = {LIVE_FIELD_MAP.get(k, k): v for k, v in trade_data.items()}
+    row.setdefault('source', 'live')
+    row.setdefault('result', 'open')
+    get_journal(path).append([row])
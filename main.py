@@ -43,18 +43,41 @@
 #     print(trades[['time', 'direction', 'result', 'PnL']].tail())
 
 
+import argparse
+
 from core.mt5_connector import connect_to_mt5, get_data
-from core.signal_engine import generate_signals
+from core.mt5_session import SESSION
+from core.bar_store import BAR_STORE_DIR, BarStore
+from core.exit_engine import INTRABAR_SOURCES, load_intrabar
+from core.signal_engine import generate_signals, atr_feature
+from core.feature_store import FEATURE_STORE
 from core.backtest_engine import backtest_signals
+from core.symbols import RESEARCH_SYMBOLS
+from core.trade_journal import TradeJournal
+from core.analytics import trade_metrics, symbol_breakdown, direction_breakdown, time_buckets
+from core.monte_carlo import simulate, summarize
+from core.portfolio_risk import size_portfolio
+from datetime import datetime
+import pandas as pd
+
+parser = argparse.ArgumentParser(description="Backtest the research symbols")
+parser.add_argument('--intrabar', choices=INTRABAR_SOURCES, default=None,
+                    help="resolve exits on stored ticks or M1 bars (see backfill.py) instead of H1")
+parser.add_argument('--store-dir', default=BAR_STORE_DIR)
+args = parser.parse_args()
 
 # Step 1: Connect to MetaTrader 5
 if not connect_to_mt5():
     raise Exception("❌ Could not connect to MetaTrader 5. Please ensure it's open and logged in.")
 
 # Step 2: Define broker-corrected symbols
-symbols = ['XAUUSDm', 'US500m', 'USDJPYm', 'GBPUSDm', 'GBPJPYm', 'USDCHFm', 'AUDUSDm', 'EURJPYm', 'BTCUSDm','US30m','EURUSDm']
+symbols = RESEARCH_SYMBOLS
 
 # Step 3: Loop through each symbol
+journal = TradeJournal()
+run_id = datetime.now().strftime('%Y%m%d-%H%M%S')  # groups this run's trades in the journal
+all_trades = []
+closes = {}  # H1 closes per symbol, for the cross-symbol correlation
 for symbol in symbols:
     print(f"\n🔍 Checking data for {symbol}")
 
@@ -68,9 +91,10 @@ for symbol in symbols:
         continue
 
     print(f"✅ Data loaded for {symbol} | D1: {len(d1)} bars | H4: {len(h4)} bars | H1: {len(h1)} bars")
+    closes[symbol] = h1.set_index('time')['close']
 
     # Step 4: Generate entry signals
-    signals = generate_signals(d1, h4, h1)
+    signals = generate_signals(d1, h4, h1, store=FEATURE_STORE, symbol=symbol, point_in_time=True)  # no SR look-ahead
 
     if signals.empty:
         print(f"📭 No signals generated for {symbol}")
@@ -79,10 +103,43 @@ for symbol in symbols:
     print(f"📈 Running backtest for {symbol} with {len(signals)} signals")
 
     # Step 5: Calculate ATR and run backtest
-    atr_series = h1['close'].rolling(14).std()
-    trades = backtest_signals(signals, h1, symbol, atr_series)  # ✅ Pass h1 as price_data
+    atr_series = atr_feature(h1, FEATURE_STORE, symbol)  # the column generate_signals already cached
+    intrabar = None
+    if args.intrabar:
+        meta = SESSION.symbol(symbol) if args.intrabar == 'M1' else None  # M1 spreads are in points
+        if args.intrabar == 'ticks' or meta is not None:
+            intrabar = load_intrabar(BarStore(args.store_dir), symbol, args.intrabar, meta.point if meta else None)
+        if intrabar is None:
+            print(f"⚠️ No stored {args.intrabar} for {symbol}; using H1 exits")
+    trades = backtest_signals(signals, h1, symbol, atr_series, journal=journal, run_id=run_id,
+                              intrabar=intrabar)  # ✅ Pass h1 as price_data
 
     # Step 6: Print summary
     print(f"📊 {symbol} Results:")
     print(f"Total Trades: {len(trades)}")
     print(trades[['entry_time', 'exit_time', 'direction', 'result', 'PnL_$']].tail())  # ✅ Updated columns
+    all_trades.append(trades)
+
+journal.close()
+
+# Step 7: Portfolio analytics
+if all_trades:
+    portfolio = pd.concat(all_trades, ignore_index=True)
+    summary_cols = ['trades', 'win_rate', 'net_pnl', 'profit_factor', 'expectancy', 'max_drawdown_pct', 'sharpe']
+    print("\n📊 Portfolio:")
+    print(trade_metrics(portfolio)[summary_cols].to_string(index=False))
+    print("\n📊 By symbol:")
+    print(symbol_breakdown(portfolio)[summary_cols].to_string())
+    print("\n📊 By direction:")
+    print(direction_breakdown(portfolio)[summary_cols].to_string())
+    print("\n📊 Monthly PnL:")
+    print(time_buckets(portfolio, 'M', by='symbol').round(2).to_string())
+
+    # Step 8: Same trades sized as one book (total and correlated exposure caps)
+    capped = size_portfolio(portfolio, pd.DataFrame(closes))
+    print("\n📊 Portfolio with correlation-capped sizing:")
+    print(trade_metrics(capped)[summary_cols].to_string(index=False))
+
+    # Step 9: Sensitivity of drawdown and ruin to trade ordering and risk size
+    print("\n🎲 Monte Carlo (bootstrap, 100k paths):")
+    print(summarize(simulate(portfolio, seed=0)).round(4).to_string(index=False))
@@ -0,0 +1,72 @@
+import argparse
+import os
+
+from core.bar_store import BAR_STORE_DIR
+from core.exit_engine import INTRABAR_SOURCES
+from core.mt5_connector import connect_to_mt5, get_data
+from core.mt5_session import SESSION
+from core.optimizer import DEFAULT_GRID, grid_params, random_params, run_sweep
+from core.symbols import RESEARCH_SYMBOLS
+
+
+def load_data(symbols, h4_bars, h1_bars):
+    data = {}
+    for symbol in symbols:
+        h4 = get_data(symbol, "H4", h4_bars)
+        h1 = get_data(symbol, "H1", h1_bars)
+        if h4.empty or h1.empty:
+            print(f"⚠️ Skipping {symbol} due to missing data")
+            continue
+        print(f"✅ Data loaded for {symbol} | H4: {len(h4)} bars | H1: {len(h1)} bars")
+        data[symbol] = (h4, h1)
+    return data
+
+
+def intrabar_specs(symbols, source):
+    # symbol -> (source, point); M1 spreads are stored in points
+    specs = {}
+    for symbol in symbols:
+        meta = SESSION.symbol(symbol)
+        if source == 'M1' and meta is None:
+            print(f"⚠️ No symbol info for {symbol}; using H1 exits")
+            continue
+        specs[symbol] = (source, meta.point if meta else None)
+    return specs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parameter sweep over rr_ratio, stop_atr and entry thresholds")
+    parser.add_argument('--random', type=int, default=0, help="number of random samples (default: full grid)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--rank-by', default='pnl')
+    parser.add_argument('--h4-bars', type=int, default=500)
+    parser.add_argument('--h1-bars', type=int, default=1000)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', default='reports/sweep_results.csv')
+    parser.add_argument('--intrabar', choices=INTRABAR_SOURCES, default=None,
+                        help="resolve exits on stored ticks or M1 bars (see backfill.py) instead of H1")
+    parser.add_argument('--store-dir', default=BAR_STORE_DIR)
+    args = parser.parse_args()
+
+    if not connect_to_mt5():
+        raise Exception("❌ Could not connect to MetaTrader 5. Please ensure it's open and logged in.")
+
+    data = load_data(RESEARCH_SYMBOLS, args.h4_bars, args.h1_bars)
+    intrabar = intrabar_specs(data, args.intrabar) if args.intrabar else None
+    if args.random:
+        param_sets = random_params(DEFAULT_GRID, args.random, args.seed)
+    else:
+        param_sets = grid_params(DEFAULT_GRID)
+
+    print(f"\n🧪 Sweeping {len(param_sets)} parameter sets over {len(data)} symbols")
+    ranked, per_symbol = run_sweep(data, param_sets, processes=args.processes, rank_by=args.rank_by,
+                                   intrabar=intrabar, store_dir=args.store_dir)
+
+    if ranked.empty:
+        print("📭 No results")
+    else:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        ranked.to_csv(args.output, index=False)
+        print(f"📤 Exported sweep results to {args.output}")
+        print(ranked.head(args.top).to_string(index=False))
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from live_trading.order_validation import check_stops, validate_order
+
+
+def meta(**overrides):
+    # The SymbolMeta fields the checks read
+    fields = dict(symbol='XAUUSDm', point=0.01, digits=2, stops_level=50, freeze_level=0, volume_min=0.01,
+                  volume_max=5.0, volume_step=0.01)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+# === Volume ===
+def test_volume_is_floored_to_the_step():
+    volume, sl, tp, reason = validate_order(meta(volume_step=0.1), 'buy', 0.37, 1990.0, 2020.0, 2000.0)
+    assert volume == pytest.approx(0.3) and reason is None
+
+
+def test_volume_below_minimum_is_rejected():
+    volume, _, _, reason = validate_order(meta(volume_min=0.1), 'buy', 0.05, 1990.0, 2020.0, 2000.0)
+    assert volume == pytest.approx(0.05) and "below minimum" in reason
+
+
+def test_volume_is_capped_at_maximum():
+    volume, _, _, reason = validate_order(meta(volume_max=2.0), 'sell', 7.5, 2010.0, 1980.0, 2000.0)
+    assert volume == 2.0 and reason is None
+
+
+def test_prices_are_rounded_to_symbol_digits():
+    _, sl, tp, _ = validate_order(meta(), 'buy', 0.1, 1990.123456, 2020.987654, 2000.0)
+    assert (sl, tp) == (1990.12, 2020.99)
+
+
+# === SL/TP ===
+@pytest.mark.parametrize('direction, sl, tp', [
+    ('buy', 2010.0, 2020.0),   # stop above price
+    ('buy', 1990.0, 1995.0),   # target below price
+    ('sell', 1990.0, 1980.0),  # stop below price
+    ('sell', 2010.0, 2005.0),  # target above price
+])
+def test_wrong_side_sl_tp_is_rejected(direction, sl, tp):
+    *_, reason = validate_order(meta(), direction, 0.1, sl, tp, 2000.0)
+    assert reason == "SL/TP on the wrong side of price"
+
+
+def test_stops_level_distance():
+    # 50 points of 0.01 = 0.50 minimum distance
+    assert check_stops(meta(), 'buy', 1999.6, 2010.0, 2000.0).startswith("SL/TP closer than")
+    assert check_stops(meta(), 'buy', 1990.0, 2000.4, 2000.0).startswith("SL/TP closer than")
+    assert check_stops(meta(), 'buy', 1999.5, 2000.5, 2000.0) is None
+
+
+def test_freeze_level_counts_when_wider_than_stops_level():
+    assert check_stops(meta(stops_level=0, freeze_level=100), 'sell', 2000.8, 1990.0, 2000.0) is not None
+    assert check_stops(meta(stops_level=0, freeze_level=100), 'sell', 2001.0, 1990.0, 2000.0) is None
+
+
+def test_stops_valid_at_signal_can_be_invalid_at_quote():
+    # What _execute re-checks once build_request has fetched the live quote
+    assert validate_order(meta(), 'buy', 0.1, 1995.0, 2010.0, 2000.0)[3] is None
+    assert check_stops(meta(), 'buy', 1995.0, 2010.0, 1995.3) is not None
+    assert check_stops(meta(), 'buy', 1995.0, 2010.0, 2011.0) == "SL/TP on the wrong side of price"
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from core.telegram_notifier import MAX_MESSAGE_LENGTH, TelegramNotifier, _split_message
+
+
+# === Stub Bot API ===
+# Records every sendMessage form and answers with whatever `reply` returns
+# for it: (status, json body). Requests wait on `gate` so tests can queue
+# several alerts while the first post is still in flight.
+class StubTelegram:
+    def __init__(self, reply):
+        self.reply = reply
+        self.posts = []
+        self.gate = threading.Event()
+        self.gate.set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                form = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+                stub.gate.wait(5)
+                stub.posts.append(form)
+                status, payload = stub.reply(form, len(stub.posts))
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def wait_until_taken(notifier):
+    # The worker took the last queued alert and is blocked in its post
+    deadline = time.monotonic() + 5
+    while notifier._queue.qsize() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def ok(form, n):
+    return 200, {'ok': True, 'result': {}}
+
+
+@pytest.fixture
+def make_notifier():
+    created = []
+
+    def make(reply=ok):
+        stub = StubTelegram(reply)
+        notifier = TelegramNotifier('TOKEN', 'CHAT', api_url=stub.url, min_interval=0, max_per_minute=1000,
+                                    max_retries=2)
+        created.append((stub, notifier))
+        return stub, notifier
+
+    yield make
+    for stub, notifier in created:
+        notifier.close()
+        stub.close()
+
+
+def test_queued_alerts_are_batched_into_one_message(make_notifier):
+    stub, notifier = make_notifier()
+    stub.gate.clear()
+    notifier.send("first")
+    wait_until_taken(notifier)
+    for text in ("second", "third", "fourth"):
+        notifier.send(text)
+    stub.gate.set()
+    assert notifier.flush(5)
+
+    assert [p['text'] for p in stub.posts] == ["first", "second\n\nthird\n\nfourth"]
+    assert all(p['parse_mode'] == 'Markdown' for p in stub.posts)
+    assert notifier.sent == 2
+
+
+def test_429_waits_for_retry_after_and_resends(make_notifier):
+    def reply(form, n):
+        if n == 1:
+            return 429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.2}}
+        return ok(form, n)
+
+    stub, notifier = make_notifier(reply)
+    notifier.send("alert")
+    assert notifier.flush(5)
+
+    assert [p['text'] for p in stub.posts] == ["alert", "alert"]
+    assert notifier.sent == 1 and notifier.failed == 0
+
+
+def test_markdown_parse_error_resends_items_one_by_one(make_notifier):
+    def reply(form, n):
+        if form.get('parse_mode') and '_' in form['text']:
+            return 400, {'ok': False, 'error_code': 400,
+                         'description': "Bad Request: can't parse entities: Can't find end of the entity"}
+        return ok(form, n)
+
+    stub, notifier = make_notifier(reply)
+    stub.gate.clear()
+    notifier.send("warm-up")
+    wait_until_taken(notifier)
+    for text in ("*GOOD* one", "BAD_SYMBOL", "*GOOD* two"):
+        notifier.send(text)
+    stub.gate.set()
+    assert notifier.flush(5)
+
+    sent = [(p['text'], p.get('parse_mode')) for p in stub.posts]
+    assert sent == [
+        ("warm-up", 'Markdown'),
+        ("*GOOD* one\n\nBAD_SYMBOL\n\n*GOOD* two", 'Markdown'),  # rejected as a whole
+        ("*GOOD* one", 'Markdown'),
+        ("BAD_SYMBOL", 'Markdown'),  # rejected on its own
+        ("BAD_SYMBOL", None),  # plain text fallback
+        ("*GOOD* two", 'Markdown'),
+    ]
+    assert notifier.sent == 4 and notifier.failed == 0
+
+
+def test_other_4xx_is_not_retried(make_notifier):
+    stub, notifier = make_notifier(lambda form, n: (403, {'ok': False, 'description': "Forbidden"}))
+    notifier.send("alert")
+    assert notifier.flush(5)
+    assert len(stub.posts) == 1 and notifier.failed == 1
+
+
+def test_oversized_message_is_split_on_line_boundaries():
+    lines = [f"*line {i}* `{i * 1.5:.2f}`" for i in range(1000)]
+    chunks = _split_message("\n".join(lines))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == lines
+    assert _split_message("x" * (MAX_MESSAGE_LENGTH + 10)) == ["x" * MAX_MESSAGE_LENGTH, "x" * 10]
+
+
+def test_worker_survives_errors_and_flush_returns(make_notifier):
+    class BrokenMetrics:
+        calls = 0
+
+        def set(self, *args, **kwargs):
+            pass
+
+        def observe(self, *args, **kwargs):
+            pass
+
+        def inc(self, *args, **kwargs):
+            BrokenMetrics.calls += 1
+            if BrokenMetrics.calls == 1:
+                raise RuntimeError("metrics backend down")
+
+    stub, notifier = make_notifier()
+    notifier.metrics = BrokenMetrics()
+    notifier.send("first")
+    assert notifier.flush(5)
+    notifier.send("second")
+    assert notifier.flush(5)
+
+    assert [p['text'] for p in stub.posts] == ["first", "second"]
+    assert notifier._thread.is_alive()